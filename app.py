@@ -4,6 +4,32 @@ import numpy as np
 import altair as alt
 import os
 import json
+import logging
+import time
+import functools
+import threading
+
+from himalaya import stages
+from himalaya.aggregates import termination_evolution
+from himalaya.buckets import BUCKET_WIDTHS, DURATION_WIDTHS, DurationBins, TimeBuckets, parse_edges
+from himalaya.bundle import BUNDLE_DIR, load_bundle, resolve_bundle
+from himalaya.charts import RENDER_MODE, ChartSpecCache, binned_rows, nice_bin_edges, spec_limit
+from himalaya.cube import BUCKET, rollup, slice_cube
+from himalaya.diagnostics import DIAGNOSTICS, DIAGNOSTICS_LOG, CacheCounters, Profiler, append_log, rss_mb
+from himalaya.intervals import CONFIDENCE, add_intervals
+from himalaya.peak_index import YearPrefixSums
+from himalaya.precompute import log_timings, run_stages
+from himalaya.shared import freeze
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+if not BUNDLE_DIR:
+    # El pipeline de los CSV solo se importa si no se sirve un paquete precalculado (HIMALAYA_BUNDLE)
+    from himalaya import snapshot
+    from himalaya.pipeline import DATA_DIR
+    from himalaya.sql_backend import backend_count_tables
+
+# Inicio de esta ejecución (para medir la latencia de cada rerun)
+run_started = time.perf_counter()
 
 # Configurar el título y descripción de la aplicación
 st.set_page_config(
@@ -21,197 +47,277 @@ peaks, success rates, countries, and expedition characteristics. Use the control
 and interact with the visualizations to discover interesting patterns.
 """)
 
-# Desactivar el límite de filas para Altair
+# Desactivar el límite de filas para Altair (el tamaño se controla con spec_limit)
 alt.data_transformers.disable_max_rows()
 
-# Función para cargar datos
-@st.cache_data
-def load_data():
-    # Rutas para los archivos de datos
-    data_dir = "input_data"
-    
-    # Cargar datos principal
-    exped_path = os.path.join(data_dir, "exped_tidy.csv")
-    peaks_path = os.path.join(data_dir, "peaks_tidy.csv")
-    coords_path = os.path.join(data_dir, "unique_peaks_coords.csv")
-    
-    exped_df = pd.read_csv(exped_path)
-    peaks_df = pd.read_csv(peaks_path)
-    coords_df = pd.read_csv(coords_path)
-    
-    return exped_df, peaks_df, coords_df
+# Registro del tamaño de cada gráfico (nivel configurable con HIMALAYA_LOG_LEVEL)
+logging.basicConfig(level=os.environ.get('HIMALAYA_LOG_LEVEL', 'INFO'))
+logger = logging.getLogger('himalaya.app')
+chart_payloads = {}
 
-# Cargar los datos
-with st.spinner("Loading data..."):
-    exped_df, peaks_df, coords_df = load_data()
+@st.cache_resource
+def get_chart_cache():
+    # Una sola caché por proceso: todas las sesiones comparten las especificaciones serializadas
+    return ChartSpecCache()
 
-# Función para limpiar y procesar los datos
-@st.cache_data
-def process_data(exped_df, peaks_df, coords_df):
-    # Limpieza del dataset de expediciones
-    df_clean = exped_df.copy()
-    
-    # Unificar valores nulos para rutas
-    route_columns = ['ROUTE1', 'ROUTE2', 'ROUTE3', 'ROUTE4']
-    for col in route_columns:
-        df_clean[col] = df_clean[col].replace('NA', np.nan).replace('', np.nan)
-    
-    # Convertir columnas de éxito en booleanas explícitas
-    success_columns = ['SUCCESS1', 'SUCCESS2', 'SUCCESS3', 'SUCCESS4']
-    for col in success_columns:
-        df_clean[col] = df_clean[col].fillna(False).astype(bool)
-    
-    # Asegurarse de que TOTDAYS sea numérico
-    df_clean['TOTDAYS'] = pd.to_numeric(df_clean['TOTDAYS'], errors='coerce')
-    
-    # Crear año como entero para facilitar filtrado
-    df_clean['YEAR_INT'] = pd.to_numeric(df_clean['YEAR'], errors='coerce')
-    
-    # Verificar que al menos tengamos PEAKID y YEAR en todos los registros
-    df_clean = df_clean.dropna(subset=['PEAKID', 'YEAR_INT'])
-    
-    # Crear un indicador de éxito general para la expedición
-    df_clean['ANY_SUCCESS'] = df_clean[success_columns].any(axis=1)
-    
-    # Merge con datos de picos y coordenadas
-    df_merged = pd.merge(df_clean, peaks_df[['PEAKID', 'PKNAME', 'HEIGHTM', 'HIMAL_FACTOR', 'REGION_FACTOR']], 
-                         on='PEAKID', how='left')
-    df_merged = pd.merge(df_merged, coords_df, on='PEAKID', how='left')
-    
-    # Crear una versión filtrada con solo los picos más populares
-    peak_counts = df_merged['PEAKID'].value_counts()
-    top_peaks = peak_counts[peak_counts >= 30].index.tolist()
-    df_top_peaks = df_merged[df_merged['PEAKID'].isin(top_peaks)]
-    
-    # Crear bins para décadas
-    df_merged['decade'] = (df_merged['YEAR_INT'] // 10) * 10
-    df_merged['decade'] = df_merged['decade'].astype(str) + 's'
-    
-    # Crear períodos de tiempo (cada 5 años)
-    df_merged['period'] = (df_merged['YEAR_INT'] // 5) * 5
-    df_merged['period'] = df_merged['period'].astype(str) + '-' + (df_merged['period'] + 4).astype(str)
-    
-    return df_merged, top_peaks
+chart_cache = get_chart_cache()
 
-# Procesar los datos
-with st.spinner("Processing data..."):
-    df_merged, top_peaks = process_data(exped_df, peaks_df, coords_df)
+@st.cache_resource
+def get_cache_counters():
+    # Llamadas, aciertos y fallos de cada función en caché (para el modo de diagnóstico)
+    return CacheCounters()
 
-# Preparar datos para visualizaciones específicas
-@st.cache_data
-def prepare_route_success_data(df_merged):
-    # Expandir datos para pares ruta-éxito
-    route_success_pairs = []
-    
-    for _, row in df_merged.iterrows():
-        for i in range(1, 5):  # Para ROUTE1-4 y SUCCESS1-4
-            route_col = f'ROUTE{i}'
-            success_col = f'SUCCESS{i}'
-            
-            if pd.notna(row[route_col]):
-                route_success_pairs.append({
-                    'EXPID': row['EXPID'],
-                    'PEAKID': row['PEAKID'],
-                    'PKNAME': row['PKNAME'],
-                    'YEAR': row['YEAR'],
-                    'SEASON_FACTOR': row['SEASON_FACTOR'],
-                    'ROUTE': row[route_col],
-                    'SUCCESS': row[success_col],
-                    'HEIGHTM': row['HEIGHTM']
-                })
-    
-    routes_df = pd.DataFrame(route_success_pairs)
-    
-    # Calcular tasas de éxito por ruta y pico
-    route_success_rates = routes_df.groupby(['PEAKID', 'PKNAME', 'ROUTE']).agg(
-        total_attempts=('SUCCESS', 'count'),
-        successful_attempts=('SUCCESS', 'sum'),
-        height=('HEIGHTM', 'first')
-    ).reset_index()
-    
-    route_success_rates['success_rate'] = route_success_rates['successful_attempts'] / route_success_rates['total_attempts']
-    
-    # Filtrar rutas con al menos 5 intentos
-    route_success_rates = route_success_rates[route_success_rates['total_attempts'] >= 5]
-    
-    return route_success_rates
+def session_scope():
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx else None
 
-@st.cache_data
-def prepare_country_data(df_merged):
-    # Contar expediciones por país y década
-    country_expeditions = df_merged.groupby(['HOST_FACTOR', 'decade']).size().reset_index(name='count')
-    
-    # Identificar los países más activos
-    top_countries = df_merged['HOST_FACTOR'].value_counts().head(10).index.tolist()
-    
-    # Filtrar para los países más activos
-    country_expeditions_top = country_expeditions[country_expeditions['HOST_FACTOR'].isin(top_countries)]
-    
-    # Expediciones por país para cada pico
-    country_exped_by_peak = df_merged.groupby(['PEAKID', 'PKNAME', 'HOST_FACTOR']).size().reset_index(name='count')
-    country_exped_by_peak = country_exped_by_peak.sort_values('count', ascending=False)
-    
-    return country_expeditions_top, country_exped_by_peak
+# st.cache_data con contadores por función y por sesión
+cache_data = get_cache_counters().track(st.cache_data, scope=session_scope)
 
-@st.cache_data
-def prepare_duration_data(df_merged):
-    # Filtrar registros con información de duración válida
-    duration_df = df_merged.dropna(subset=['TOTDAYS', 'ANY_SUCCESS'])
-    duration_df = duration_df[duration_df['TOTDAYS'] > 0]
-    
-    # Crear bins para duración
-    duration_bins = [0, 15, 30, 45, 60, 75, 90, 365]
-    duration_labels = ['1-15', '16-30', '31-45', '46-60', '61-75', '76-90', '90+'] 
-    duration_df['duration_bin'] = pd.cut(duration_df['TOTDAYS'], bins=duration_bins, labels=duration_labels, right=False)
-    
-    # Calcular tasas de éxito por pico, temporada y bin de duración
-    duration_success = duration_df.groupby(['PEAKID', 'PKNAME', 'SEASON_FACTOR', 'duration_bin']).agg(
-        total=('EXPID', 'count'),
-        success=('ANY_SUCCESS', 'sum')
-    ).reset_index()
-    
-    duration_success['success_rate'] = duration_success['success'] / duration_success['total']
-    
-    # Filtrar para tener al menos 3 expediciones en cada bin
-    duration_success = duration_success[duration_success['total'] >= 3]
-    
-    # Preparar datos para la visualización general
-    duration_avg = duration_df.groupby(['PEAKID', 'PKNAME', 'ANY_SUCCESS']).agg(
-        avg_duration=('TOTDAYS', 'mean'),
-        count=('EXPID', 'count')
-    ).reset_index()
-    
-    return duration_success, duration_avg, duration_df
+def shared_resource(func):
+    # Resultado compartido por todas las sesiones del proceso: st.cache_resource devuelve
+    # siempre el mismo objeto (sin serializar ni copiar) y freeze() lo hace de solo lectura
+    @functools.wraps(func)
+    def frozen(*args):
+        return freeze(func(*args))
+    return get_cache_counters().track(st.cache_resource, scope=session_scope)(frozen)
 
-@st.cache_data
-def prepare_termination_data(df_merged):
-    # Filtrar registros con razones de terminación conocidas
-    termination_df = df_merged.dropna(subset=['TERMREASON_FACTOR'])
-    
-    # Agrupar las razones menos comunes como "Other"
-    reason_counts = termination_df['TERMREASON_FACTOR'].value_counts()
-    common_reasons = reason_counts[reason_counts >= 100].index.tolist()
-    termination_df['reason_grouped'] = termination_df['TERMREASON_FACTOR'].apply(
-        lambda x: x if x in common_reasons else 'Other reasons')
-    
-    # Calcular distribución de razones por pico y período
-    term_evolution = termination_df.groupby(['PEAKID', 'PKNAME', 'period', 'reason_grouped']).size().reset_index(name='count')
-    
-    # Calcular porcentajes dentro de cada pico y período
-    term_evolution = term_evolution.merge(
-        term_evolution.groupby(['PEAKID', 'period'])['count'].sum().reset_index(name='total'),
-        on=['PEAKID', 'period']
-    )
-    term_evolution['percentage'] = term_evolution['count'] / term_evolution['total'] * 100
-    
-    return term_evolution, termination_df
+# Modo de diagnóstico: HIMALAYA_DIAGNOSTICS=1 o ?diagnostics=1
+diagnostics = DIAGNOSTICS or st.query_params.get('diagnostics') == '1'
+profiler = Profiler(diagnostics)
+
+def write_diagnostics(run_profiler, run, **extra):
+    # Una línea JSON por ejecución (completa o solo de un fragmento) en HIMALAYA_DIAGNOSTICS_LOG
+    record = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'session': session_scope(),
+        'run': run,
+        **extra,
+        'rss_mb': round(rss_mb(), 1),
+        'measurements': run_profiler.records,
+        'caches': get_cache_counters().pop(session_scope()),
+        'chart_cache': chart_cache.stats(),
+    }
+    append_log(record)
+    return record
+
+def show_chart(build, *depends_on):
+    # La clave contiene solo las entradas de las que depende el gráfico (más la versión de los
+    # datos y el modo de render); el gráfico solo se construye y serializa si no está en caché
+    name = build.__name__
+    key = (name, data_version, RENDER_MODE) + depends_on
+    with profiler.measure('chart', name):
+        text, size = chart_cache.get_or_build(key, build)
+    chart_payloads[name] = size
+    logger.info("chart %s: %d bytes", name, size)
+
+    if size > spec_limit(name):
+        st.warning(f"Chart '{name}' was not rendered: its specification ({size:,} bytes) "
+                   f"exceeds the {spec_limit(name):,}-byte limit.")
+        return
+    # st.vega_lite_chart modifica el diccionario recibido: cada ejecución usa su propia copia
+    st.vega_lite_chart(json.loads(text), use_container_width=True)
+
+# Límites del intervalo de confianza de las tasas de éxito (columnas ci_low y ci_high)
+CI_LABEL = f"{CONFIDENCE:.0%} CI"
+
+# Picos con intervalo de confianza bajo el mapa
+MAP_INTERVAL_PEAKS = 15
+
+def interval_tooltips(format='.1%'):
+    return [alt.Tooltip('ci_low:Q', title=f'{CI_LABEL} Low', format=format),
+            alt.Tooltip('ci_high:Q', title=f'{CI_LABEL} High', format=format)]
+
+# Contenidos de pestaña guardados (todas las pestañas y sesiones del proceso)
+PANEL_CACHE_SIZE = int(os.environ.get('HIMALAYA_PANEL_CACHE_SIZE', 64))
+
+# st.cache_data guarda los elementos que emite la función y los repite en cada acierto: el
+# contenido de una pestaña se repite sin volver a ejecutarla. Los cortes se comparan por su clave
+panel_cache = get_cache_counters().track(functools.partial(
+    st.cache_data, max_entries=PANEL_CACHE_SIZE, show_spinner=False,
+    hash_funcs={TimeBuckets: lambda buckets: buckets.key, DurationBins: lambda bins: bins.key}
+), scope=session_scope)
+
+def panel(name, header=None):
+    # Cada pestaña es un fragmento: sus argumentos son las dependencias declaradas y un
+    # widget dentro del fragmento solo vuelve a ejecutar ese fragmento, no toda la app. En un
+    # rerun completo, una pestaña cuyas dependencias no han cambiado repite sus elementos
+    # desde panel_cache sin ejecutarse. Los widgets no pueden ir en una función en caché:
+    # `header` los muestra y devuelve sus valores, que se añaden a las dependencias
+    def decorate(render):
+        @panel_cache
+        @functools.wraps(render)
+        def replay(version, *depends_on):
+            render(*depends_on)
 
-# Preparar datos para las visualizaciones
-with st.spinner("Preparing visualization data..."):
-    route_success_rates = prepare_route_success_data(df_merged)
-    country_expeditions_top, country_exped_by_peak = prepare_country_data(df_merged)
-    duration_success, duration_avg, duration_df = prepare_duration_data(df_merged)
-    term_evolution, termination_df = prepare_termination_data(df_merged)
+        @st.fragment
+        @functools.wraps(render)
+        def run(*depends_on):
+            # Si solo se vuelve a ejecutar este fragmento, sus mediciones se registran aparte
+            ctx = get_script_run_ctx()
+            fragment_run = bool(ctx and ctx.fragment_ids_this_run)
+            run_profiler = Profiler(diagnostics) if fragment_run else profiler
+
+            started = time.perf_counter()
+            with run_profiler.measure('tab', name):
+                widgets = header() if header else ()
+                replay(data_version, *depends_on, *widgets)
+            elapsed = (time.perf_counter() - started) * 1000
+            st.session_state.setdefault('panel_timings', {})[name] = elapsed
+            logger.info("panel %s: %.1f ms", name, elapsed)
+            if fragment_run and diagnostics:
+                write_diagnostics(run_profiler, 'fragment', fragment=name, total_ms=round(elapsed, 2))
+        return run
+    return decorate
+
+# Versión de los datos de entrada: huella de los CSV y de la versión del pipeline, calculada una
+# sola vez por proceso. Es la clave de la caché de los datos procesados, de cada etapa y de cada
+# gráfico: las tablas se pasan como argumentos con `_` (excluidos de la clave), así que un acierto
+# no recorre ningún DataFrame y su coste no depende del tamaño de los datos
+@cache_data
+def load_data_version():
+    return snapshot.input_fingerprint(DATA_DIR)
+
+# Función para cargar y procesar los datos (desde la instantánea en disco si existe)
+@shared_resource
+def load_processed_data(data_version, _stage):
+    # `_stage` mide cada paso en el modo de diagnóstico
+    return snapshot.load_or_build(DATA_DIR, stage=_stage, key=data_version)
+
+# Paquete precalculado con todas las tablas (modo "solo servir"), por directorio de versión
+@shared_resource
+def load_served_bundle(version_dir):
+    return load_bundle(version_dir)
+
+# Preparar datos para visualizaciones específicas (las etapas están en himalaya/stages.py)
+@shared_resource
+def prepare_aggregate_counts(data_version, _df_merged):
+    # Tablas de conteos aditivas de las que salen los agregados de rutas, países, duración y
+    # terminación (himalaya.incremental las actualiza por lotes de expediciones). Con
+    # HIMALAYA_QUERY_BACKEND=sql se calculan con DuckDB sobre el Parquet de la instantánea
+    return backend_count_tables(_df_merged, snapshot.table_path(data_version, 'df_merged'))
+
+@shared_resource
+def prepare_route_success_data(data_version, _counts, _peak_heights):
+    return stages.route_success_data(_counts, _peak_heights)
+
+@shared_resource
+def prepare_country_data(data_version, _counts):
+    return stages.country_data(_counts)
+
+@shared_resource
+def prepare_duration_data(data_version, _counts):
+    return stages.duration_data(_counts)
+
+@shared_resource
+def prepare_termination_data(data_version, _counts):
+    return stages.termination_data(_counts)
+
+@shared_resource
+def prepare_expedition_cube(data_version, _df_merged):
+    return stages.expedition_cube(_df_merged)
+
+@shared_resource
+def prepare_peak_partitions(data_version, _df_merged, _route_success_rates, _country_data, _duration_data,
+                            _term_evolution):
+    return stages.peak_partitions(_df_merged, _route_success_rates, _country_data, _duration_data, _term_evolution)
+
+@shared_resource
+def prepare_year_prefix_sums(data_version, _df_merged):
+    return stages.year_prefix_sums(_df_merged)
+
+@shared_resource
+def prepare_duration_index(data_version, _df_merged):
+    return stages.duration_index(_df_merged)
+
+@shared_resource
+def prepare_peak_locations(data_version, _coords_df, _peaks_df):
+    return stages.peak_locations(_coords_df, _peaks_df)
+
+@shared_resource
+def prepare_route_comparison(data_version, _route_success_rates):
+    return stages.route_comparison(_route_success_rates)
+
+@shared_resource
+def prepare_duration_comparison(data_version, _expedition_cube):
+    return stages.duration_comparison(_expedition_cube)
+
+@shared_resource
+def prepare_termination_comparison(data_version, _expedition_cube, _top_peaks):
+    return stages.termination_comparison(_expedition_cube, _top_peaks)
+
+# Etapas del precálculo y sus entradas (la versión de los datos y stages.STAGE_INPUTS): las que
+# no dependen entre sí se ejecutan a la vez (HIMALAYA_PRECOMPUTE_WORKERS hilos)
+PRECOMPUTE_STAGES = {name: (func, ['data_version'] + stages.STAGE_INPUTS[name]) for name, func in {
+    'aggregate_counts': prepare_aggregate_counts,
+    'expedition_cube': prepare_expedition_cube,
+    'year_prefix_sums': prepare_year_prefix_sums,
+    'duration_index': prepare_duration_index,
+    'peak_locations': prepare_peak_locations,
+    'route_success_data': prepare_route_success_data,
+    'country_data': prepare_country_data,
+    'duration_data': prepare_duration_data,
+    'termination_data': prepare_termination_data,
+    'peak_partitions': prepare_peak_partitions,
+    'route_comparison': prepare_route_comparison,
+    'duration_comparison': prepare_duration_comparison,
+    'termination_comparison': prepare_termination_comparison,
+}.items()}
+
+def with_script_context(func):
+    # Los hilos del pool usan el contexto de esta ejecución (necesario para las cachés de Streamlit)
+    ctx = get_script_run_ctx()
+    def run(*args):
+        add_script_run_ctx(threading.current_thread(), ctx)
+        return func(*args)
+    return run
+
+if BUNDLE_DIR:
+    # Modo "solo servir": todas las tablas salen del paquete generado con `python -m himalaya.build`
+    with st.spinner("Loading data bundle..."):
+        with profiler.stage('load_bundle'):
+            bundle_manifest, prepared, df_merged, peaks_df, coords_df = load_served_bundle(resolve_bundle(BUNDLE_DIR))
+        top_peaks = bundle_manifest['top_peaks']
+        data_version = bundle_manifest['input_fingerprint']
+    peak_heights = stages.peak_heights(peaks_df)
+else:
+    # Cargar los datos
+    with st.spinner("Loading data..."):
+        with profiler.stage('load_data_version'):
+            data_version = load_data_version()
+        with profiler.stage('load_processed_data'):
+            df_merged, top_peaks, peaks_df, coords_df = load_processed_data(data_version, profiler.stage)
+
+    # Altura de cada pico (para las tasas por ruta y la comparación entre picos)
+    peak_heights = stages.peak_heights(peaks_df)
+
+    # Preparar datos para las visualizaciones
+    with st.spinner("Preparing visualization data..."):
+        precompute_started = time.perf_counter()
+        precompute_stages = PRECOMPUTE_STAGES
+        if diagnostics:
+            precompute_stages = {name: (profiler.measured('stage', name, func), needs)
+                                 for name, (func, needs) in precompute_stages.items()}
+        prepared, stage_timings = run_stages(
+            precompute_stages,
+            {'data_version': data_version, 'df_merged': df_merged, 'peak_heights': peak_heights,
+             'top_peaks': top_peaks, 'peaks_df': peaks_df, 'coords_df': coords_df},
+            wrap=with_script_context)
+        log_timings(stage_timings, (time.perf_counter() - precompute_started) * 1000)
+        st.session_state['stage_timings'] = stage_timings
+
+route_success_rates = prepared['route_success_data']
+country_expeditions_top, country_exped_by_peak = prepared['country_data']
+duration_success, duration_avg = prepared['duration_data']
+term_evolution = prepared['termination_data']
+expedition_cube = prepared['expedition_cube']
+peak_partitions, peak_metadata = prepared['peak_partitions']
+peak_years, all_years = prepared['year_prefix_sums']
+duration_index = prepared['duration_index']
+peak_locations, peak_grid = prepared['peak_locations']
+common_route_data = prepared['route_comparison']
+duration_comparison = prepared['duration_comparison']
+term_comparison = prepared['termination_comparison']
 
 # Sidebar para filtros y controles
 st.sidebar.header("Filters and Controls")
@@ -220,7 +326,7 @@ st.sidebar.header("Filters and Controls")
 selected_peak = st.sidebar.selectbox(
     "Select Mountain Peak", 
     options=top_peaks,
-    format_func=lambda x: f"{x} - {df_merged[df_merged['PEAKID'] == x]['PKNAME'].iloc[0]}"
+    format_func=lambda x: f"{x} - {peak_metadata[x]['PKNAME']}"
 )
 
 # Selector de rango de años
@@ -233,26 +339,65 @@ year_range = st.sidebar.slider(
     value=(min_year, max_year)
 )
 
-# Selector de temporada para algunas visualizaciones
-all_seasons = sorted(df_merged['SEASON_FACTOR'].dropna().unique().tolist())
-selected_season = st.sidebar.selectbox(
-    "Season (for duration analysis)",
-    options=['All'] + all_seasons
+# Radio alrededor del pico seleccionado: el mapa y la comparación entre picos muestran solo los
+# picos a esa distancia o menos (0: todos los picos)
+nearby_km = st.sidebar.slider(
+    "Nearby Peaks (km)",
+    min_value=0,
+    max_value=500,
+    value=0,
+    step=10,
+    help="Show only the peaks within this distance of the selected peak on the map and in the comparison (0: all peaks)"
 )
 
-# Aplicar filtros al dataset principal
-filtered_df = df_merged[
-    (df_merged['YEAR_INT'] >= year_range[0]) & 
-    (df_merged['YEAR_INT'] <= year_range[1])
-]
+# Intervalos de tiempo de los gráficos de países y de razones de terminación. Por defecto son
+# décadas y períodos de 5 años; un ancho fijo o unos años de corte propios se aplican a ambos
+DEFAULT_BUCKETS = "Decades / 5-year periods"
+bucket_choice = st.sidebar.selectbox(
+    "Time Buckets",
+    options=[DEFAULT_BUCKETS, *BUCKET_WIDTHS, "Custom edges"]
+)
+if bucket_choice == "Custom edges":
+    bucket_edges = parse_edges(st.sidebar.text_input("Bucket Edges (years)", value="1960, 1980, 2000"))
+    country_buckets = term_buckets = TimeBuckets.custom(bucket_edges, min_year, max_year)
+elif bucket_choice in BUCKET_WIDTHS:
+    country_buckets = term_buckets = TimeBuckets.fixed(BUCKET_WIDTHS[bucket_choice], min_year, max_year)
+else:
+    country_buckets = TimeBuckets.fixed(10, min_year, max_year)
+    term_buckets = TimeBuckets.fixed(5, min_year, max_year)
 
-if selected_season != 'All':
-    season_filter_df = filtered_df[filtered_df['SEASON_FACTOR'] == selected_season]
+# Bins de duración de la pestaña "Duration & Success". Por defecto, la tasa de éxito usa los
+# bins de 15 días hasta 90+ y el histograma, bins "redondos" (30 como máximo); un ancho fijo o
+# unos cortes propios se aplican a los dos
+DEFAULT_DURATION_BINS = "15-day bins / automatic histogram"
+duration_choice = st.sidebar.selectbox(
+    "Duration Bins",
+    options=[DEFAULT_DURATION_BINS, *DURATION_WIDTHS, "Custom edges"]
+)
+if duration_choice == "Custom edges":
+    duration_cuts = parse_edges(st.sidebar.text_input("Duration Edges (days)", value="7, 14, 30, 60"), digits=None)
+    duration_bins = DurationBins.custom(duration_cuts)
+elif duration_choice in DURATION_WIDTHS:
+    duration_bins = DurationBins.fixed(DURATION_WIDTHS[duration_choice])
 else:
-    season_filter_df = filtered_df
+    duration_bins = None
+
+# Picos cercanos al seleccionado (consulta a la rejilla espacial) con su distancia en km
+nearby_peaks = None
+if nearby_km:
+    location = peak_grid.location(selected_peak)
+    if location is None:
+        st.sidebar.info("The selected peak has no coordinates; showing all peaks.")
+        nearby_km = 0
+    else:
+        peaks_in_radius, distances = peak_grid.radius(*location, nearby_km)
+        nearby_peaks = pd.Series(distances, index=peaks_in_radius, name='distance_km')
+
+# Temporadas disponibles (el selector está en la pestaña de duración, que es la única que lo usa)
+all_seasons = sorted(df_merged['SEASON_FACTOR'].dropna().unique().tolist())
 
 # Información básica sobre el pico seleccionado
-peak_info = df_merged[df_merged['PEAKID'] == selected_peak].iloc[0]
+peak_info = peak_metadata[selected_peak]
 
 # Panel de información sobre el pico seleccionado
 st.sidebar.markdown("---")
@@ -268,9 +413,10 @@ st.sidebar.markdown(f"""
 # Panel de estadísticas generales
 st.sidebar.markdown("---")
 st.sidebar.header("Overall Statistics")
-total_expeditions = filtered_df[filtered_df['PEAKID'] == selected_peak].shape[0]
-success_rate = filtered_df[(filtered_df['PEAKID'] == selected_peak) & (filtered_df['ANY_SUCCESS'])].shape[0] / total_expeditions if total_expeditions > 0 else 0
-avg_duration = filtered_df[filtered_df['PEAKID'] == selected_peak]['TOTDAYS'].mean()
+peak_totals = peak_years.totals(selected_peak, year_range)
+total_expeditions = peak_totals['expeditions']
+success_rate = peak_totals['success_rate']
+avg_duration = peak_totals['avg_duration']
 
 st.sidebar.markdown(f"""
 **Total Expeditions**: {total_expeditions}  
@@ -291,7 +437,20 @@ tab1, tab2, tab3, tab4, tab5 = st.tabs([
 ])
 
 # Tab 1: Overview --------------------------------------------------------
-with tab1:
+@panel('overview')
+def overview_panel(year_range, selected_peak, nearby_km, nearby_peaks):
+    peak_info = peak_metadata[selected_peak]
+
+    # Aplicar el filtro de años sobre las celdas del cubo (no sobre las expediciones)
+    filtered_cube = slice_cube(expedition_cube, year_range)
+
+    # Con el filtro de picos cercanos, el mapa y la comparación solo usan esos picos
+    if nearby_km:
+        peaks_cube = filtered_cube[filtered_cube['PEAKID'].isin(nearby_peaks.index)]
+        map_locations = peak_locations[peak_locations['PEAKID'].isin(nearby_peaks.index)]
+    else:
+        peaks_cube, map_locations = filtered_cube, peak_locations
+    
     st.markdown("### Overview of Himalayan Expeditions")
     
     col1, col2 = st.columns(2)
@@ -300,161 +459,228 @@ with tab1:
         # Mapa de picos con datos de expediciones
         st.markdown("#### Geographic Distribution of Peaks")
         
-        # Preparar datos para el mapa
-        peak_counts = filtered_df.groupby('PEAKID').size().reset_index(name='expeditions')
-        peak_success = filtered_df.groupby('PEAKID')['ANY_SUCCESS'].mean().reset_index(name='success_rate')
-        peak_data = pd.merge(coords_df, peak_counts, on='PEAKID', how='inner')
-        peak_data = pd.merge(peak_data, peak_success, on='PEAKID', how='inner')
-        peak_data = pd.merge(peak_data, peaks_df[['PEAKID', 'PKNAME', 'HEIGHTM']], on='PEAKID', how='inner')
-        
-        # Destacar el pico seleccionado
-        peak_data['selected'] = peak_data['PEAKID'] == selected_peak
-        
-        # Crear el mapa
-        peaks_map = alt.Chart(peak_data).mark_circle().encode(
-            longitude='LONGITUDE:Q',
-            latitude='LATITUDE:Q',
-            size=alt.Size('expeditions:Q', 
-                         scale=alt.Scale(range=[100, 1000]), 
-                         legend=alt.Legend(title="Number of Expeditions")),
-            color=alt.Color('success_rate:Q', 
-                          scale=alt.Scale(domain=[0, 0.5, 1], range=['#c22d2d', '#f7db4f', '#48c13d']), 
-                          legend=alt.Legend(title="Success Rate")),
-            tooltip=[
+        def peaks_map():
+            # Preparar datos para el mapa
+            peak_counts = rollup(peaks_cube, ['PEAKID'])
+            peak_counts = add_intervals(peak_counts, 'successes', 'expeditions')[
+                ['PEAKID', 'expeditions', 'success_rate', 'ci_low', 'ci_high']]
+            peak_data = pd.merge(map_locations, peak_counts, on='PEAKID', how='inner')
+            
+            # Destacar el pico seleccionado
+            peak_data['selected'] = peak_data['PEAKID'] == selected_peak
+            
+            tooltip = [
                 alt.Tooltip('PKNAME:N', title='Peak'),
                 alt.Tooltip('HEIGHTM:Q', title='Height (m)'),
                 alt.Tooltip('expeditions:Q', title='Expeditions'),
-                alt.Tooltip('success_rate:Q', title='Success Rate', format='.1%')
-            ],
-            stroke=alt.condition(
-                alt.datum.selected,
-                alt.value('black'),
-                alt.value(None)
-            ),
-            strokeWidth=alt.condition(
-                alt.datum.selected,
-                alt.value(2),
-                alt.value(0)
+                alt.Tooltip('success_rate:Q', title='Success Rate', format='.1%'),
+                *interval_tooltips()
+            ]
+            
+            # Crear el mapa
+            peak_map = alt.Chart(peak_data).mark_circle().encode(
+                longitude='LONGITUDE:Q',
+                latitude='LATITUDE:Q',
+                size=alt.Size('expeditions:Q', 
+                             scale=alt.Scale(range=[100, 1000]), 
+                             legend=alt.Legend(title="Number of Expeditions")),
+                color=alt.Color('success_rate:Q', 
+                              scale=alt.Scale(domain=[0, 0.5, 1], range=['#c22d2d', '#f7db4f', '#48c13d']), 
+                              legend=alt.Legend(title="Success Rate")),
+                tooltip=tooltip,
+                stroke=alt.condition(
+                    alt.datum.selected,
+                    alt.value('black'),
+                    alt.value(None)
+                ),
+                strokeWidth=alt.condition(
+                    alt.datum.selected,
+                    alt.value(2),
+                    alt.value(0)
+                )
+            ).properties(
+                width=500,
+                height=400
+            ).project('mercator')
+            
+            # Bajo el mapa, tasa de éxito e intervalo de confianza de los picos con más
+            # expediciones (y del seleccionado)
+            ranked = peak_data.sort_values('expeditions', ascending=False, kind='stable')
+            ranked = ranked[(np.arange(len(ranked)) < MAP_INTERVAL_PEAKS) | ranked['selected']]
+            base = alt.Chart(ranked).encode(
+                y=alt.Y('PKNAME:N', sort=alt.EncodingSortField('expeditions', order='descending'),
+                        axis=alt.Axis(title='Peak')),
+                tooltip=tooltip
             )
-        ).properties(
-            width=500,
-            height=400
-        ).project('mercator')
-        
-        st.altair_chart(peaks_map, use_container_width=True)
+            peak_intervals = alt.layer(
+                base.mark_rule(color='gray').encode(
+                    x=alt.X('ci_low:Q', axis=alt.Axis(title=f'Success Rate ({CI_LABEL})', format='.0%'),
+                            scale=alt.Scale(domain=[0, 1])),
+                    x2='ci_high:Q'
+                ),
+                base.mark_point(filled=True, size=60).encode(
+                    x='success_rate:Q',
+                    color=alt.Color('success_rate:Q',
+                                  scale=alt.Scale(domain=[0, 0.5, 1], range=['#c22d2d', '#f7db4f', '#48c13d']),
+                                  legend=None),
+                    stroke=alt.condition(alt.datum.selected, alt.value('black'), alt.value(None))
+                )
+            ).properties(
+                width=500
+            )
+            
+            return alt.vconcat(peak_map, peak_intervals)
+
+        show_chart(peaks_map, year_range, selected_peak, nearby_km)
         
     with col2:
         # Evolución histórica de expediciones y tasas de éxito
         st.markdown("#### Historical Trends")
         
-        # Preparar datos anuales
-        yearly_data = filtered_df.groupby(['YEAR_INT']).agg(
-            expeditions=('EXPID', 'count'),
-            successes=('ANY_SUCCESS', 'sum')
-        ).reset_index()
-        yearly_data['success_rate'] = yearly_data['successes'] / yearly_data['expeditions']
-        
-        # Datos anuales para el pico seleccionado
-        peak_yearly = filtered_df[filtered_df['PEAKID'] == selected_peak].groupby(['YEAR_INT']).agg(
-            expeditions=('EXPID', 'count'),
-            successes=('ANY_SUCCESS', 'sum')
-        ).reset_index()
-        peak_yearly['success_rate'] = peak_yearly['successes'] / peak_yearly['expeditions']
-        
-        # Doble eje Y para expediciones y tasa de éxito
-        base = alt.Chart(yearly_data).encode(
-            x=alt.X('YEAR_INT:O', axis=alt.Axis(title='Year'))
-        )
-        
-        # Línea de expediciones
-        line1 = base.mark_line(color='steelblue').encode(
-            y=alt.Y('expeditions:Q', 
-                   axis=alt.Axis(title='Number of Expeditions', titleColor='steelblue'))
-        )
-        
-        # Línea de tasa de éxito
-        line2 = base.mark_line(color='orange').encode(
-            y=alt.Y('success_rate:Q', 
-                   axis=alt.Axis(title='Success Rate', titleColor='orange', format='.0%'))
-        )
-        
-        # Gráfico combinado
-        historical_chart = alt.layer(line1, line2).resolve_scale(
-            y='independent'
-        ).properties(
-            width=500,
-            height=300,
-            title='Overall Expeditions and Success Rates by Year'
-        )
-        
-        # Gráfico para el pico seleccionado
-        base_peak = alt.Chart(peak_yearly).encode(
-            x=alt.X('YEAR_INT:O', axis=alt.Axis(title='Year'))
-        )
-        
-        # Línea de expediciones para el pico seleccionado
-        peak_line1 = base_peak.mark_line(color='steelblue').encode(
-            y=alt.Y('expeditions:Q', 
-                   axis=alt.Axis(title='Number of Expeditions', titleColor='steelblue'))
-        )
-        
-        # Línea de tasa de éxito para el pico seleccionado
-        peak_line2 = base_peak.mark_line(color='orange').encode(
-            y=alt.Y('success_rate:Q', 
-                   axis=alt.Axis(title='Success Rate', titleColor='orange', format='.0%'))
-        )
+        def historical_chart():
+            # Preparar datos anuales
+            yearly_data = add_intervals(all_years.yearly(YearPrefixSums.ALL, year_range), 'successes', 'expeditions')
+            
+            # Doble eje Y para expediciones y tasa de éxito
+            base = alt.Chart(yearly_data).encode(
+                x=alt.X('YEAR_INT:O', axis=alt.Axis(title='Year'))
+            )
+            
+            # Línea de expediciones
+            line1 = base.mark_line(color='steelblue').encode(
+                y=alt.Y('expeditions:Q', 
+                       axis=alt.Axis(title='Number of Expeditions', titleColor='steelblue'))
+            )
+            
+            # Línea de tasa de éxito
+            line2 = base.mark_line(color='orange').encode(
+                y=alt.Y('success_rate:Q', 
+                       axis=alt.Axis(title='Success Rate', titleColor='orange', format='.0%'))
+            )
+            
+            # Intervalo de confianza de la tasa de éxito (comparte el eje de la tasa)
+            line2 = alt.layer(base.mark_area(color='orange', opacity=0.2).encode(
+                y=alt.Y('ci_low:Q', axis=alt.Axis(title='Success Rate', titleColor='orange', format='.0%')),
+                y2='ci_high:Q'
+            ), line2)
+            
+            # Gráfico combinado
+            return alt.layer(line1, line2).resolve_scale(
+                y='independent'
+            ).properties(
+                width=500,
+                height=300,
+                title='Overall Expeditions and Success Rates by Year'
+            )
         
-        # Gráfico combinado para el pico seleccionado
-        peak_chart = alt.layer(peak_line1, peak_line2).resolve_scale(
-            y='independent'
-        ).properties(
-            width=500,
-            height=300,
-            title=f'Expeditions and Success Rates for {peak_info["PKNAME"]} by Year'
-        )
+        def peak_chart():
+            # Datos anuales para el pico seleccionado
+            peak_yearly = add_intervals(peak_years.yearly(selected_peak, year_range), 'successes', 'expeditions')
+            
+            # Gráfico para el pico seleccionado
+            base_peak = alt.Chart(peak_yearly).encode(
+                x=alt.X('YEAR_INT:O', axis=alt.Axis(title='Year'))
+            )
+            
+            # Línea de expediciones para el pico seleccionado
+            peak_line1 = base_peak.mark_line(color='steelblue').encode(
+                y=alt.Y('expeditions:Q', 
+                       axis=alt.Axis(title='Number of Expeditions', titleColor='steelblue'))
+            )
+            
+            # Línea de tasa de éxito para el pico seleccionado
+            peak_line2 = base_peak.mark_line(color='orange').encode(
+                y=alt.Y('success_rate:Q', 
+                       axis=alt.Axis(title='Success Rate', titleColor='orange', format='.0%'))
+            )
+            
+            # Intervalo de confianza de la tasa de éxito (comparte el eje de la tasa)
+            peak_line2 = alt.layer(base_peak.mark_area(color='orange', opacity=0.2).encode(
+                y=alt.Y('ci_low:Q', axis=alt.Axis(title='Success Rate', titleColor='orange', format='.0%')),
+                y2='ci_high:Q'
+            ), peak_line2)
+            
+            # Gráfico combinado para el pico seleccionado
+            return alt.layer(peak_line1, peak_line2).resolve_scale(
+                y='independent'
+            ).properties(
+                width=500,
+                height=300,
+                title=f'Expeditions and Success Rates for {peak_info["PKNAME"]} by Year'
+            )
         
         # Mostrar los dos gráficos
-        st.altair_chart(historical_chart, use_container_width=True)
-        st.altair_chart(peak_chart, use_container_width=True)
+        show_chart(historical_chart, year_range)
+        show_chart(peak_chart, selected_peak, year_range)
     
     # Estadísticas comparativas entre picos
     st.markdown("### Comparative Statistics Across Peaks")
     
-    # Preparar datos para comparación
-    peak_stats = filtered_df.groupby(['PEAKID', 'PKNAME']).agg(
-        expeditions=('EXPID', 'count'),
-        success_rate=('ANY_SUCCESS', 'mean'),
-        avg_duration=('TOTDAYS', 'mean'),
-        height=('HEIGHTM', 'first')
-    ).reset_index()
-    
-    # Ordenar por número de expediciones
-    peak_stats = peak_stats.sort_values('expeditions', ascending=False).head(20)
-    
-    # Gráfico de barras para comparar expediciones y tasas de éxito
-    comparison_chart = alt.Chart(peak_stats).mark_bar().encode(
-        x=alt.X('PKNAME:N', sort='-y', axis=alt.Axis(title='Peak', labelAngle=-45)),
-        y=alt.Y('expeditions:Q', axis=alt.Axis(title='Number of Expeditions')),
-        color=alt.Color('success_rate:Q', 
-                       scale=alt.Scale(domain=[0, 0.5, 1], range=['#c22d2d', '#f7db4f', '#48c13d']),
-                       legend=alt.Legend(title="Success Rate")),
-        tooltip=[
+    def comparison_chart():
+        # Preparar datos para comparación
+        peak_stats = add_intervals(rollup(peaks_cube, ['PEAKID', 'PKNAME']), 'successes', 'expeditions')[
+            ['PEAKID', 'PKNAME', 'expeditions', 'success_rate', 'ci_low', 'ci_high', 'avg_duration']]
+        peak_stats['height'] = peak_stats['PEAKID'].map(peak_heights)
+        tooltip = [
             alt.Tooltip('PKNAME:N', title='Peak'),
             alt.Tooltip('height:Q', title='Height (m)'),
             alt.Tooltip('expeditions:Q', title='Expeditions'),
             alt.Tooltip('success_rate:Q', title='Success Rate', format='.1%'),
+            *interval_tooltips(),
             alt.Tooltip('avg_duration:Q', title='Avg. Duration (days)', format='.1f')
         ]
-    ).properties(
-        width=800,
-        height=400,
-        title='Top 20 Peaks by Number of Expeditions'
-    )
+        title = 'Top 20 Peaks by Number of Expeditions'
+        if nearby_km:
+            peak_stats['distance_km'] = peak_stats['PEAKID'].map(nearby_peaks)
+            tooltip.append(alt.Tooltip('distance_km:Q', title='Distance (km)', format='.0f'))
+            title = f'Top 20 Peaks within {nearby_km} km of {peak_info["PKNAME"]} by Number of Expeditions'
+        
+        # Ordenar por número de expediciones
+        peak_stats = peak_stats.sort_values('expeditions', ascending=False).head(20)
+        
+        # Gráfico de barras para comparar expediciones y tasas de éxito
+        x = alt.X('PKNAME:N', sort=alt.EncodingSortField('expeditions', order='descending'),
+                  axis=alt.Axis(title='Peak', labelAngle=-45))
+        bars = alt.Chart(peak_stats).mark_bar().encode(
+            x=x,
+            y=alt.Y('expeditions:Q', axis=alt.Axis(title='Number of Expeditions')),
+            color=alt.Color('success_rate:Q', 
+                           scale=alt.Scale(domain=[0, 0.5, 1], range=['#c22d2d', '#f7db4f', '#48c13d']),
+                           legend=alt.Legend(title="Success Rate")),
+            tooltip=tooltip
+        )
+        
+        # Tasa de éxito con su intervalo de confianza, en un segundo eje
+        rate_axis = alt.Axis(title=f'Success Rate ({CI_LABEL})', format='.0%')
+        rate = alt.Chart(peak_stats).encode(x=x, tooltip=tooltip)
+        rate = alt.layer(
+            rate.mark_rule(color='black').encode(
+                y=alt.Y('ci_low:Q', axis=rate_axis, scale=alt.Scale(domain=[0, 1])),
+                y2='ci_high:Q'
+            ),
+            rate.mark_point(color='black', filled=True).encode(
+                y=alt.Y('success_rate:Q', axis=rate_axis, scale=alt.Scale(domain=[0, 1]))
+            )
+        )
+        
+        return alt.layer(bars, rate).resolve_scale(
+            y='independent'
+        ).properties(
+            width=800,
+            height=400,
+            title=title
+        )
     
-    st.altair_chart(comparison_chart, use_container_width=True)
+    show_chart(comparison_chart, year_range, *((selected_peak, nearby_km) if nearby_km else ()))
+
+with tab1:
+    overview_panel(year_range, selected_peak, nearby_km, nearby_peaks)
 
 # Tab 2: Routes & Success Rates ------------------------------------------
-with tab2:
+@panel('routes')
+def routes_panel(selected_peak):
+    peak_info = peak_metadata[selected_peak]
+    
     st.markdown(f"### Success Rates by Route for {peak_info['PKNAME']}")
     st.markdown("""
     This visualization shows the success rates for different routes on the selected peak. The color of each bar indicates 
@@ -462,35 +688,50 @@ with tab2:
     """)
     
     # Filtrar datos de rutas para el pico seleccionado
-    peak_routes = route_success_rates[route_success_rates['PEAKID'] == selected_peak]
+    peak_routes = peak_partitions['routes'].get(selected_peak)
     
     if not peak_routes.empty:
-        # Ordenar rutas por tasa de éxito
-        peak_routes = peak_routes.sort_values('success_rate', ascending=False)
-        
-        # Gráfico de barras para tasas de éxito por ruta
-        route_chart = alt.Chart(peak_routes).mark_bar().encode(
-            y=alt.Y('ROUTE:N', sort='-x', axis=alt.Axis(title='Route')),
-            x=alt.X('success_rate:Q', 
-                   axis=alt.Axis(title='Success Rate', format='.0%'), 
-                   scale=alt.Scale(domain=[0, 1])),
-            color=alt.Color('success_rate:Q', 
-                          scale=alt.Scale(domain=[0, 0.25, 0.5, 0.75, 1.0], 
-                                         range=['#c22d2d', '#e77e16', '#ffb533', '#d9e03f', '#48c13d']),
-                          legend=alt.Legend(title='Success Rate')),
-            tooltip=[
-                alt.Tooltip('PKNAME:N', title='Peak'),
-                alt.Tooltip('ROUTE:N', title='Route'),
-                alt.Tooltip('success_rate:Q', title='Success Rate', format='.1%'),
-                alt.Tooltip('successful_attempts:Q', title='Successful Attempts'),
-                alt.Tooltip('total_attempts:Q', title='Total Attempts')
-            ]
-        ).properties(
-            width=700,
-            height=400
-        )
+        # Ordenar rutas por tasa de éxito (a igual tasa, por nombre de ruta)
+        peak_routes = peak_routes.sort_values(['success_rate', 'ROUTE'], ascending=[False, True], kind='stable')
+
+        def route_chart():
+            # Rutas ordenadas por tasa de éxito (el mismo orden en las barras y en los intervalos)
+            base = alt.Chart(peak_routes).encode(
+                y=alt.Y('ROUTE:N', sort=alt.EncodingSortField('success_rate', op='max', order='descending'),
+                        axis=alt.Axis(title='Route'))
+            )
+            
+            # Gráfico de barras para tasas de éxito por ruta
+            bars = base.mark_bar().encode(
+                x=alt.X('success_rate:Q', 
+                       axis=alt.Axis(title='Success Rate', format='.0%'), 
+                       scale=alt.Scale(domain=[0, 1])),
+                color=alt.Color('success_rate:Q', 
+                              scale=alt.Scale(domain=[0, 0.25, 0.5, 0.75, 1.0], 
+                                             range=['#c22d2d', '#e77e16', '#ffb533', '#d9e03f', '#48c13d']),
+                              legend=alt.Legend(title='Success Rate')),
+                tooltip=[
+                    alt.Tooltip('PKNAME:N', title='Peak'),
+                    alt.Tooltip('ROUTE:N', title='Route'),
+                    alt.Tooltip('success_rate:Q', title='Success Rate', format='.1%'),
+                    *interval_tooltips(),
+                    alt.Tooltip('successful_attempts:Q', title='Successful Attempts'),
+                    alt.Tooltip('total_attempts:Q', title='Total Attempts')
+                ]
+            )
+            
+            # Intervalo de confianza de cada tasa
+            error_bars = base.mark_rule(color='black', strokeWidth=2).encode(
+                x=alt.X('ci_low:Q', axis=alt.Axis(title='Success Rate', format='.0%'), scale=alt.Scale(domain=[0, 1])),
+                x2='ci_high:Q'
+            )
+            
+            return alt.layer(bars, error_bars).properties(
+                width=700,
+                height=400
+            )
         
-        st.altair_chart(route_chart, use_container_width=True)
+        show_chart(route_chart, selected_peak)
         
         # Tabla de datos detallados
         st.markdown("#### Detailed Route Data")
@@ -504,8 +745,9 @@ with tab2:
             }
         )
         
-        # Formatear la tasa de éxito
+        # Formatear la tasa de éxito y su intervalo de confianza
         route_table['Success Rate'] = route_table['Success Rate'].apply(lambda x: f"{x:.1%}")
+        route_table[CI_LABEL] = [f"{low:.1%} - {high:.1%}" for low, high in zip(peak_routes['ci_low'], peak_routes['ci_high'])]
         
         st.dataframe(route_table, use_container_width=True)
     else:
@@ -514,349 +756,477 @@ with tab2:
     # Comparación con otros picos
     st.markdown("### Route Success Comparison Across Peaks")
     
-    # Obtener las rutas más comunes
-    common_routes = route_success_rates['ROUTE'].value_counts().head(10).index.tolist()
-    
-    # Filtrar datos para las rutas comunes
-    common_route_data = route_success_rates[route_success_rates['ROUTE'].isin(common_routes)]
-    
     # Gráfico de barras agrupadas para comparar tasas de éxito por ruta y pico
     if not common_route_data.empty:
-        route_comparison = alt.Chart(common_route_data).mark_bar().encode(
-            x=alt.X('PKNAME:N', axis=alt.Axis(title='Peak', labelAngle=-45)),
-            y=alt.Y('success_rate:Q', 
-                   axis=alt.Axis(title='Success Rate', format='.0%'), 
-                   scale=alt.Scale(domain=[0, 1])),
-            color=alt.Color('ROUTE:N', legend=alt.Legend(title='Route')),
-            column=alt.Column('ROUTE:N', header=alt.Header(labelAngle=-45)),
-            tooltip=[
-                alt.Tooltip('PKNAME:N', title='Peak'),
-                alt.Tooltip('ROUTE:N', title='Route'),
-                alt.Tooltip('success_rate:Q', title='Success Rate', format='.1%'),
-                alt.Tooltip('total_attempts:Q', title='Total Attempts')
-            ]
-        ).properties(
-            width=120,
-            height=300
-        )
+        def route_comparison():
+            base = alt.Chart().encode(
+                x=alt.X('PKNAME:N', axis=alt.Axis(title='Peak', labelAngle=-45))
+            )
+            bars = base.mark_bar().encode(
+                y=alt.Y('success_rate:Q', 
+                       axis=alt.Axis(title='Success Rate', format='.0%'), 
+                       scale=alt.Scale(domain=[0, 1])),
+                color=alt.Color('ROUTE:N', legend=alt.Legend(title='Route')),
+                tooltip=[
+                    alt.Tooltip('PKNAME:N', title='Peak'),
+                    alt.Tooltip('ROUTE:N', title='Route'),
+                    alt.Tooltip('success_rate:Q', title='Success Rate', format='.1%'),
+                    *interval_tooltips(),
+                    alt.Tooltip('total_attempts:Q', title='Total Attempts')
+                ]
+            )
+            
+            # Intervalo de confianza de cada tasa
+            error_bars = base.mark_rule(color='black').encode(
+                y=alt.Y('ci_low:Q', axis=alt.Axis(title='Success Rate', format='.0%'), scale=alt.Scale(domain=[0, 1])),
+                y2='ci_high:Q'
+            )
+            
+            return alt.layer(bars, error_bars, data=common_route_data).properties(
+                width=120,
+                height=300
+            ).facet(
+                column=alt.Column('ROUTE:N', header=alt.Header(labelAngle=-45))
+            )
         
-        st.altair_chart(route_comparison, use_container_width=True)
+        show_chart(route_comparison)
     else:
         st.info("Not enough common route data available with the current filters.")
 
+with tab2:
+    routes_panel(selected_peak)
+
 # Tab 3: Countries -------------------------------------------------------
-with tab3:
+@panel('countries')
+def countries_panel(year_range, selected_peak, buckets):
+    peak_info = peak_metadata[selected_peak]
+
+    # Aplicar el filtro de años sobre las celdas del cubo (no sobre las expediciones)
+    filtered_cube = slice_cube(expedition_cube, year_range)
+    
     st.markdown("### Expeditions Led by Countries Over Time")
     st.markdown("""
     These visualizations show which countries have led the most expeditions in different time periods. The line chart shows 
-    trends over time, while the stacked bar chart shows the composition of expeditions by country in each decade.
+    trends over time, while the stacked bar chart shows the composition of expeditions by country in each time period.
     """)
     
     # Obtener los 10 países principales en general
-    top_countries = filtered_df['HOST_FACTOR'].value_counts().head(10).index.tolist()
-    
-    # Datos de país por década filtrados
-    country_decade_filtered = filtered_df[filtered_df['HOST_FACTOR'].isin(top_countries)].groupby(
-        ['HOST_FACTOR', 'decade']
-    ).size().reset_index(name='count')
-    
-    # Gráfico de líneas para la evolución de expediciones por país
-    countries_chart = alt.Chart(country_decade_filtered).mark_line(point=True).encode(
-        x=alt.X('decade:N', axis=alt.Axis(title='Decade')),
-        y=alt.Y('count:Q', axis=alt.Axis(title='Number of Expeditions')),
-        color=alt.Color('HOST_FACTOR:N', legend=alt.Legend(title='Host Country')),
-        strokeWidth=alt.value(3),
-        tooltip=[
-            alt.Tooltip('HOST_FACTOR:N', title='Country'),
-            alt.Tooltip('decade:N', title='Decade'),
-            alt.Tooltip('count:Q', title='Expeditions')
-        ]
-    ).properties(
-        width=700,
-        height=400,
-        title='Expeditions Led by Countries Over Time'
-    )
+    country_totals = rollup(filtered_cube, ['HOST_FACTOR'])
+    top_countries = country_totals.sort_values('expeditions', ascending=False, kind='stable')['HOST_FACTOR'].head(10).tolist()
+
+    # Datos de país por intervalo de tiempo filtrados (se agrupan por código y se etiquetan al final)
+    country_period_filtered = rollup(filtered_cube[filtered_cube['HOST_FACTOR'].isin(top_countries)], ['HOST_FACTOR', BUCKET], buckets)
+    country_period_filtered = country_period_filtered[['HOST_FACTOR', BUCKET, 'expeditions']].rename(columns={'expeditions': 'count'})
+    country_period_filtered = buckets.label(country_period_filtered, BUCKET, 'period')
+
+    def countries_chart():
+        # Gráfico de líneas para la evolución de expediciones por país
+        return alt.Chart(country_period_filtered).mark_line(point=True).encode(
+            x=alt.X('period:N', axis=alt.Axis(title=buckets.title)),
+            y=alt.Y('count:Q', axis=alt.Axis(title='Number of Expeditions')),
+            color=alt.Color('HOST_FACTOR:N', legend=alt.Legend(title='Host Country')),
+            strokeWidth=alt.value(3),
+            tooltip=[
+                alt.Tooltip('HOST_FACTOR:N', title='Country'),
+                alt.Tooltip('period:N', title=buckets.title),
+                alt.Tooltip('count:Q', title='Expeditions')
+            ]
+        ).properties(
+            width=700,
+            height=400,
+            title='Expeditions Led by Countries Over Time'
+        )
     
-    # Histograma apilado como complemento
-    countries_stacked = alt.Chart(country_decade_filtered).mark_bar().encode(
-        x=alt.X('decade:N', axis=alt.Axis(title='Decade')),
-        y=alt.Y('count:Q', axis=alt.Axis(title='Number of Expeditions')),
-        color=alt.Color('HOST_FACTOR:N', legend=None),
-        tooltip=[
-            alt.Tooltip('HOST_FACTOR:N', title='Country'),
-            alt.Tooltip('decade:N', title='Decade'),
-            alt.Tooltip('count:Q', title='Expeditions')
-        ]
-    ).properties(
-        width=700,
-        height=300,
-        title='Stacked View of Expeditions by Country'
-    )
+    def countries_stacked():
+        # Histograma apilado como complemento
+        return alt.Chart(country_period_filtered).mark_bar().encode(
+            x=alt.X('period:N', axis=alt.Axis(title=buckets.title)),
+            y=alt.Y('count:Q', axis=alt.Axis(title='Number of Expeditions')),
+            color=alt.Color('HOST_FACTOR:N', legend=None),
+            tooltip=[
+                alt.Tooltip('HOST_FACTOR:N', title='Country'),
+                alt.Tooltip('period:N', title=buckets.title),
+                alt.Tooltip('count:Q', title='Expeditions')
+            ]
+        ).properties(
+            width=700,
+            height=300,
+            title='Stacked View of Expeditions by Country'
+        )
     
     # Mostrar gráficos
-    st.altair_chart(countries_chart, use_container_width=True)
-    st.altair_chart(countries_stacked, use_container_width=True)
+    show_chart(countries_chart, year_range, buckets.key)
+    show_chart(countries_stacked, year_range, buckets.key)
     
     # Expediciones por país para el pico seleccionado
     st.markdown(f"### Countries Leading Expeditions to {peak_info['PKNAME']}")
     
     # Filtrar datos para el pico seleccionado
-    peak_countries = country_exped_by_peak[country_exped_by_peak['PEAKID'] == selected_peak].sort_values('count', ascending=False).head(10)
+    peak_countries = peak_partitions['countries'].get(selected_peak).sort_values('count', ascending=False).head(10)
     
     if not peak_countries.empty:
-        # Gráfico de barras para países con más expediciones al pico seleccionado
-        peak_countries_chart = alt.Chart(peak_countries).mark_bar().encode(
-            y=alt.Y('HOST_FACTOR:N', sort='-x', axis=alt.Axis(title='Country')),
-            x=alt.X('count:Q', axis=alt.Axis(title='Number of Expeditions')),
-            color=alt.Color('HOST_FACTOR:N', legend=None),
-            tooltip=[
-                alt.Tooltip('HOST_FACTOR:N', title='Country'),
-                alt.Tooltip('PKNAME:N', title='Peak'),
-                alt.Tooltip('count:Q', title='Expeditions')
-            ]
-        ).properties(
-            width=700,
-            height=400,
-            title=f'Top 10 Countries Leading Expeditions to {peak_info["PKNAME"]}'
-        )
+        def peak_countries_chart():
+            # Gráfico de barras para países con más expediciones al pico seleccionado
+            return alt.Chart(peak_countries).mark_bar().encode(
+                y=alt.Y('HOST_FACTOR:N', sort='-x', axis=alt.Axis(title='Country')),
+                x=alt.X('count:Q', axis=alt.Axis(title='Number of Expeditions')),
+                color=alt.Color('HOST_FACTOR:N', legend=None),
+                tooltip=[
+                    alt.Tooltip('HOST_FACTOR:N', title='Country'),
+                    alt.Tooltip('PKNAME:N', title='Peak'),
+                    alt.Tooltip('count:Q', title='Expeditions')
+                ]
+            ).properties(
+                width=700,
+                height=400,
+                title=f'Top 10 Countries Leading Expeditions to {peak_info["PKNAME"]}'
+            )
         
-        st.altair_chart(peak_countries_chart, use_container_width=True)
+        show_chart(peak_countries_chart, selected_peak)
     else:
         st.info(f"No country data available for {peak_info['PKNAME']} with the current filters.")
 
+with tab3:
+    countries_panel(year_range, selected_peak, country_buckets)
+
 # Tab 4: Duration & Success ---------------------------------------------
-with tab4:
+def duration_header():
     st.markdown("### Relationship Between Expedition Duration and Success Rate")
     st.markdown("""
     These visualizations explore whether longer expeditions have a higher chance of summiting successfully for each peak, 
     and how this relationship varies by season.
     """)
     
-    # Filtrar datos de duración para el pico seleccionado
-    peak_duration = duration_success[duration_success['PEAKID'] == selected_peak]
-    
-    # Aplicar filtro de temporada si está seleccionado
-    if selected_season != 'All':
-        peak_duration = peak_duration[peak_duration['SEASON_FACTOR'] == selected_season]
+    # Selector de temporada: al estar dentro del fragmento, cambiarlo solo recalcula esta pestaña
+    selected_season = st.selectbox(
+        "Season (for duration analysis)",
+        options=['All'] + all_seasons
+    )
+    return (selected_season,)
+
+@panel('duration', header=duration_header)
+def duration_panel(year_range, selected_peak, duration_bins, selected_season):
+    peak_info = peak_metadata[selected_peak]
+
+    # Tasa de éxito por bin de duración y temporada (todas las temporadas con 'All'), a partir
+    # de las duraciones ordenadas del pico: cualquier binning son unos searchsorted por temporada
+    season = None if selected_season == 'All' else selected_season
+    line_bins = duration_bins or DurationBins.default()
+    line_labels = line_bins.labels()
+    peak_duration = pd.DataFrame([
+        {'PEAKID': selected_peak, 'PKNAME': peak_info['PKNAME'], 'SEASON_FACTOR': bin_season,
+         'duration_bin': line_labels[i], 'total': int(totals[i]), 'success': int(successes[i])}
+        for bin_season, totals, successes in duration_index.by_season(selected_peak, line_bins.edges, season, line_bins.open_end)
+        for i in np.flatnonzero(totals >= 3)
+    ], columns=['PEAKID', 'PKNAME', 'SEASON_FACTOR', 'duration_bin', 'total', 'success'])
+    peak_duration['success_rate'] = peak_duration['success'] / peak_duration['total']
+    peak_duration = add_intervals(peak_duration, 'success', 'total')
     
     if not peak_duration.empty:
-        # Gráfico de líneas para tasas de éxito por bin de duración y temporada
-        duration_line = alt.Chart(peak_duration).mark_line(point=True).encode(
-            x=alt.X('duration_bin:N', axis=alt.Axis(title='Expedition Duration (days)')),
-            y=alt.Y('success_rate:Q', 
-                   axis=alt.Axis(title='Success Rate', format='.0%'), 
-                   scale=alt.Scale(domain=[0, 1])),
-            color=alt.Color('SEASON_FACTOR:N', legend=alt.Legend(title='Season')),
-            strokeWidth=alt.value(3),
-            tooltip=[
-                alt.Tooltip('PKNAME:N', title='Peak'),
-                alt.Tooltip('SEASON_FACTOR:N', title='Season'),
-                alt.Tooltip('duration_bin:N', title='Duration (days)'),
-                alt.Tooltip('success_rate:Q', title='Success Rate', format='.1%'),
-                alt.Tooltip('total:Q', title='Total Expeditions')
-            ]
-        ).properties(
-            width=700,
-            height=400,
-            title=f'Success Rate by Expedition Duration for {peak_info["PKNAME"]}'
-        )
-        
-        st.altair_chart(duration_line, use_container_width=True)
-        
-        # Datos para el gráfico de distribución
-        peak_duration_dist = filtered_df[
-            (filtered_df['PEAKID'] == selected_peak) & 
-            (filtered_df['TOTDAYS'] > 0)
-        ]
-        
-        if selected_season != 'All':
-            peak_duration_dist = peak_duration_dist[peak_duration_dist['SEASON_FACTOR'] == selected_season]
-        
-        # Histograma para la distribución de duración de expediciones
-        if not peak_duration_dist.empty:
-            duration_hist = alt.Chart(peak_duration_dist).mark_bar().encode(
-                x=alt.X('TOTDAYS:Q', 
-                       bin=alt.Bin(maxbins=30), 
-                       axis=alt.Axis(title='Expedition Duration (days)')),
-                y=alt.Y('count():Q', axis=alt.Axis(title='Number of Expeditions')),
-                color=alt.Color('ANY_SUCCESS:N', 
-                              scale=alt.Scale(domain=[True, False], range=['#48c13d', '#c22d2d']),
-                              legend=alt.Legend(title='Summit Success')),
+        def duration_line():
+            base = alt.Chart(peak_duration).encode(
+                x=alt.X('duration_bin:N', sort=line_labels, axis=alt.Axis(title='Expedition Duration (days)')),
+                color=alt.Color('SEASON_FACTOR:N', legend=alt.Legend(title='Season'))
+            )
+            
+            # Intervalo de confianza de cada temporada
+            band = base.mark_area(opacity=0.15).encode(
+                y=alt.Y('ci_low:Q', axis=alt.Axis(title='Success Rate', format='.0%'), scale=alt.Scale(domain=[0, 1])),
+                y2='ci_high:Q'
+            )
+            
+            # Gráfico de líneas para tasas de éxito por bin de duración y temporada
+            line = base.mark_line(point=True).encode(
+                y=alt.Y('success_rate:Q', 
+                       axis=alt.Axis(title='Success Rate', format='.0%'), 
+                       scale=alt.Scale(domain=[0, 1])),
+                strokeWidth=alt.value(3),
                 tooltip=[
-                    alt.Tooltip('ANY_SUCCESS:N', title='Success'),
-                    alt.Tooltip('count():Q', title='Expeditions')
+                    alt.Tooltip('PKNAME:N', title='Peak'),
+                    alt.Tooltip('SEASON_FACTOR:N', title='Season'),
+                    alt.Tooltip('duration_bin:N', title='Duration (days)'),
+                    alt.Tooltip('success_rate:Q', title='Success Rate', format='.1%'),
+                    *interval_tooltips(),
+                    alt.Tooltip('total:Q', title='Total Expeditions')
                 ]
-            ).properties(
+            )
+            
+            return alt.layer(band, line).properties(
                 width=700,
-                height=300,
-                title=f'Distribution of Expedition Durations for {peak_info["PKNAME"]}'
+                height=400,
+                title=f'Success Rate by Expedition Duration for {peak_info["PKNAME"]}'
             )
+        
+        show_chart(duration_line, selected_peak, selected_season, line_bins.key)
+
+        # Histograma para la distribución de duración de expediciones (dentro del rango de años)
+        extent = duration_index.extent(selected_peak, season, year_range)
+        if extent is not None:
+            def duration_hist():
+                if duration_bins is not None:
+                    # Bins elegidos en la barra lateral (recuentos del índice de duraciones); el
+                    # último incluye las duraciones mayores, como el histograma automático
+                    totals, successes = duration_index.histogram(selected_peak, duration_bins.edges, season, year_range,
+                                                                 clip=duration_bins.open_end)
+                    hist_data = binned_rows(duration_bins.edges, totals, successes, 'ANY_SUCCESS')
+                    hist_x = alt.X('bin_start:Q', bin='binned', axis=alt.Axis(title='Expedition Duration (days)'))
+                    hist_x2 = {'x2': 'bin_end:Q'}
+                    hist_count = 'count:Q'
+                elif RENDER_MODE == 'aggregated':
+                    # Bins calculados en Python: el gráfico recibe una fila por (bin, éxito)
+                    edges = nice_bin_edges(extent, maxbins=30)
+                    totals, successes = duration_index.histogram(selected_peak, edges, season, year_range, clip=True)
+                    hist_data = binned_rows(edges, totals, successes, 'ANY_SUCCESS')
+                    hist_x = alt.X('bin_start:Q', bin='binned', axis=alt.Axis(title='Expedition Duration (days)'))
+                    hist_x2 = {'x2': 'bin_end:Q'}
+                    hist_count = 'count:Q'
+                else:
+                    # Vega agrupa las expediciones individuales del pico en el navegador
+                    peak_expeditions = peak_partitions['expeditions'].get(selected_peak)
+                    hist_data = peak_expeditions[
+                        (peak_expeditions['YEAR_INT'] >= year_range[0]) &
+                        (peak_expeditions['YEAR_INT'] <= year_range[1]) &
+                        (peak_expeditions['TOTDAYS'] > 0)
+                    ]
+                    if season is not None:
+                        hist_data = hist_data[hist_data['SEASON_FACTOR'] == season]
+                    hist_x = alt.X('TOTDAYS:Q',
+                                   bin=alt.Bin(maxbins=30), 
+                                   axis=alt.Axis(title='Expedition Duration (days)'))
+                    hist_x2 = {}
+                    hist_count = 'count():Q'
+
+                return alt.Chart(hist_data).mark_bar().encode(
+                    x=hist_x,
+                    y=alt.Y(hist_count, axis=alt.Axis(title='Number of Expeditions')),
+                    color=alt.Color('ANY_SUCCESS:N', 
+                                  scale=alt.Scale(domain=[True, False], range=['#48c13d', '#c22d2d']),
+                                  legend=alt.Legend(title='Summit Success')),
+                    tooltip=[
+                        alt.Tooltip('ANY_SUCCESS:N', title='Success'),
+                        alt.Tooltip(hist_count, title='Expeditions')
+                    ],
+                    **hist_x2
+                ).properties(
+                    width=700,
+                    height=300,
+                    title=f'Distribution of Expedition Durations for {peak_info["PKNAME"]}'
+                )
             
-            st.altair_chart(duration_hist, use_container_width=True)
+            show_chart(duration_hist, selected_peak, selected_season, year_range,
+                       duration_bins.key if duration_bins else None)
     else:
         st.info(f"No duration data available for {peak_info['PKNAME']} with the current filters.")
     
     # Comparación entre picos
     st.markdown("### Duration and Success Rate Comparison Across Peaks")
     
-    # Preparar datos para la comparación
-    duration_comparison = df_merged.groupby(['PEAKID', 'PKNAME', 'ANY_SUCCESS']).agg(
-        avg_duration=('TOTDAYS', 'mean'),
-        count=('EXPID', 'count')
-    ).reset_index()
-    
-    # Filtrar para incluir solo picos con suficientes datos
-    peak_counts = duration_comparison.groupby('PEAKID')['count'].sum()
-    valid_peaks = peak_counts[peak_counts >= 20].index.tolist()
-    duration_comparison = duration_comparison[duration_comparison['PEAKID'].isin(valid_peaks)]
-    
     # Gráfico de dispersión para la comparación
     if not duration_comparison.empty:
-        scatter_chart = alt.Chart(duration_comparison).mark_circle(size=100).encode(
-            x=alt.X('avg_duration:Q', axis=alt.Axis(title='Average Expedition Duration (days)')),
-            y=alt.Y('PKNAME:N', sort='x', axis=alt.Axis(title='Peak')),
-            color=alt.Color('ANY_SUCCESS:N', 
-                          scale=alt.Scale(domain=[True, False], range=['#48c13d', '#c22d2d']),
-                          legend=alt.Legend(title='Summit Success')),
-            size=alt.Size('count:Q', legend=alt.Legend(title='Number of Expeditions')),
-            tooltip=[
-                alt.Tooltip('PKNAME:N', title='Peak'),
-                alt.Tooltip('ANY_SUCCESS:N', title='Success'),
-                alt.Tooltip('avg_duration:Q', title='Avg. Duration (days)', format='.1f'),
-                alt.Tooltip('count:Q', title='Expeditions')
-            ]
-        ).properties(
-            width=700,
-            height=500,
-            title='Relationship Between Expedition Duration and Success Across Peaks'
-        )
+        def scatter_chart():
+            return alt.Chart(duration_comparison).mark_circle(size=100).encode(
+                x=alt.X('avg_duration:Q', axis=alt.Axis(title='Average Expedition Duration (days)')),
+                y=alt.Y('PKNAME:N', sort='x', axis=alt.Axis(title='Peak')),
+                color=alt.Color('ANY_SUCCESS:N', 
+                              scale=alt.Scale(domain=[True, False], range=['#48c13d', '#c22d2d']),
+                              legend=alt.Legend(title='Summit Success')),
+                size=alt.Size('count:Q', legend=alt.Legend(title='Number of Expeditions')),
+                tooltip=[
+                    alt.Tooltip('PKNAME:N', title='Peak'),
+                    alt.Tooltip('ANY_SUCCESS:N', title='Success'),
+                    alt.Tooltip('avg_duration:Q', title='Avg. Duration (days)', format='.1f'),
+                    alt.Tooltip('count:Q', title='Expeditions')
+                ]
+            ).properties(
+                width=700,
+                height=500,
+                title='Relationship Between Expedition Duration and Success Across Peaks'
+            )
         
-        st.altair_chart(scatter_chart, use_container_width=True)
+        show_chart(scatter_chart)
     else:
         st.info("Not enough data available for cross-peak duration comparison with the current filters.")
 
+with tab4:
+    duration_panel(year_range, selected_peak, duration_bins)
+
 # Tab 5: Termination Reasons ---------------------------------------------
-with tab5:
+@panel('termination')
+def termination_panel(selected_peak, buckets):
+    peak_info = peak_metadata[selected_peak]
+    
     st.markdown("### Evolution of Termination Reasons Over Time")
     st.markdown("""
     These visualizations show how the reasons for expedition termination have evolved over the years for each peak.
     The stacked area chart shows the proportion of different reasons, while the line chart allows tracking specific reasons.
     """)
     
-    # Filtrar datos de terminación para el pico seleccionado
-    peak_termination = term_evolution[term_evolution['PEAKID'] == selected_peak]
+    # Filtrar datos de terminación para el pico seleccionado y agruparlos por intervalo de tiempo
+    peak_termination = termination_evolution(peak_partitions['termination'].get(selected_peak), buckets)
+    peak_termination = buckets.label(peak_termination, 'period')
     
     if not peak_termination.empty:
-        # Gráfico de área apilada para la evolución de razones
-        termination_area = alt.Chart(peak_termination).mark_area().encode(
-            x=alt.X('period:N', axis=alt.Axis(title='Time Period', labelAngle=-45)),
-            y=alt.Y('percentage:Q', axis=alt.Axis(title='Percentage of Expeditions'), stack='normalize'),
-            color=alt.Color('reason_grouped:N', 
-                          scale=alt.Scale(scheme='category20'),
-                          legend=alt.Legend(title='Termination Reason')),
-            tooltip=[
-                alt.Tooltip('PKNAME:N', title='Peak'),
-                alt.Tooltip('period:N', title='Period'),
-                alt.Tooltip('reason_grouped:N', title='Termination Reason'),
-                alt.Tooltip('percentage:Q', title='Percentage', format='.1f'),
-                alt.Tooltip('count:Q', title='Expeditions'),
-                alt.Tooltip('total:Q', title='Total in Period')
-            ]
-        ).properties(
-            width=700,
-            height=400,
-            title=f'Evolution of Termination Reasons for {peak_info["PKNAME"]}'
-        )
+        def termination_area():
+            # Gráfico de área apilada para la evolución de razones
+            return alt.Chart(peak_termination).mark_area().encode(
+                x=alt.X('period:N', axis=alt.Axis(title=buckets.title, labelAngle=-45)),
+                y=alt.Y('percentage:Q', axis=alt.Axis(title='Percentage of Expeditions'), stack='normalize'),
+                color=alt.Color('reason_grouped:N', 
+                              scale=alt.Scale(scheme='category20'),
+                              legend=alt.Legend(title='Termination Reason')),
+                tooltip=[
+                    alt.Tooltip('PKNAME:N', title='Peak'),
+                    alt.Tooltip('period:N', title='Period'),
+                    alt.Tooltip('reason_grouped:N', title='Termination Reason'),
+                    alt.Tooltip('percentage:Q', title='Percentage', format='.1f'),
+                    alt.Tooltip('count:Q', title='Expeditions'),
+                    alt.Tooltip('total:Q', title='Total in Period')
+                ]
+            ).properties(
+                width=700,
+                height=400,
+                title=f'Evolution of Termination Reasons for {peak_info["PKNAME"]}'
+            )
         
-        # Gráfico de líneas para la evolución de razones específicas
-        termination_line = alt.Chart(peak_termination).mark_line(point=True).encode(
-            x=alt.X('period:N', axis=alt.Axis(title='Time Period', labelAngle=-45)),
-            y=alt.Y('percentage:Q', axis=alt.Axis(title='Percentage of Expeditions')),
-            color=alt.Color('reason_grouped:N', scale=alt.Scale(scheme='category20'), legend=None),
-            strokeWidth=alt.value(3),
-            tooltip=[
-                alt.Tooltip('PKNAME:N', title='Peak'),
-                alt.Tooltip('period:N', title='Period'),
-                alt.Tooltip('reason_grouped:N', title='Termination Reason'),
-                alt.Tooltip('percentage:Q', title='Percentage', format='.1f'),
-                alt.Tooltip('count:Q', title='Expeditions'),
-                alt.Tooltip('total:Q', title='Total in Period')
-            ]
-        ).properties(
-            width=700,
-            height=300,
-            title='Trend of Specific Termination Reasons'
-        )
+        def termination_line():
+            base = alt.Chart(peak_termination).encode(
+                x=alt.X('period:N', axis=alt.Axis(title=buckets.title, labelAngle=-45)),
+                color=alt.Color('reason_grouped:N', scale=alt.Scale(scheme='category20'), legend=None)
+            )
+            
+            # Intervalo de confianza del porcentaje de cada razón
+            band = base.mark_area(opacity=0.15).encode(
+                y=alt.Y('ci_low:Q', axis=alt.Axis(title='Percentage of Expeditions')),
+                y2='ci_high:Q'
+            )
+            
+            # Gráfico de líneas para la evolución de razones específicas
+            line = base.mark_line(point=True).encode(
+                y=alt.Y('percentage:Q', axis=alt.Axis(title='Percentage of Expeditions')),
+                strokeWidth=alt.value(3),
+                tooltip=[
+                    alt.Tooltip('PKNAME:N', title='Peak'),
+                    alt.Tooltip('period:N', title='Period'),
+                    alt.Tooltip('reason_grouped:N', title='Termination Reason'),
+                    alt.Tooltip('percentage:Q', title='Percentage', format='.1f'),
+                    *interval_tooltips(format='.1f'),
+                    alt.Tooltip('count:Q', title='Expeditions'),
+                    alt.Tooltip('total:Q', title='Total in Period')
+                ]
+            )
+            
+            return alt.layer(band, line).properties(
+                width=700,
+                height=300,
+                title='Trend of Specific Termination Reasons'
+            )
         
         # Mostrar gráficos
-        st.altair_chart(termination_area, use_container_width=True)
-        st.altair_chart(termination_line, use_container_width=True)
-        
-        # Gráfico de barras para totales generales
-        termination_totals = peak_termination.groupby('reason_grouped')['count'].sum().reset_index()
-        termination_totals = termination_totals.sort_values('count', ascending=False)
-        
-        termination_bars = alt.Chart(termination_totals).mark_bar().encode(
-            y=alt.Y('reason_grouped:N', sort='-x', axis=alt.Axis(title='Termination Reason')),
-            x=alt.X('count:Q', axis=alt.Axis(title='Number of Expeditions')),
-            color=alt.Color('reason_grouped:N', scale=alt.Scale(scheme='category20'), legend=None),
-            tooltip=[
-                alt.Tooltip('reason_grouped:N', title='Termination Reason'),
-                alt.Tooltip('count:Q', title='Expeditions')
-            ]
-        ).properties(
-            width=700,
-            height=300,
-            title=f'Total Expeditions by Termination Reason for {peak_info["PKNAME"]}'
-        )
+        show_chart(termination_area, selected_peak, buckets.key)
+        show_chart(termination_line, selected_peak, buckets.key)
+
+        def termination_bars():
+            # Gráfico de barras para totales generales
+            termination_totals = peak_termination.groupby('reason_grouped', observed=True)['count'].sum().reset_index()
+            termination_totals = termination_totals.sort_values('count', ascending=False)
+            
+            return alt.Chart(termination_totals).mark_bar().encode(
+                y=alt.Y('reason_grouped:N', sort='-x', axis=alt.Axis(title='Termination Reason')),
+                x=alt.X('count:Q', axis=alt.Axis(title='Number of Expeditions')),
+                color=alt.Color('reason_grouped:N', scale=alt.Scale(scheme='category20'), legend=None),
+                tooltip=[
+                    alt.Tooltip('reason_grouped:N', title='Termination Reason'),
+                    alt.Tooltip('count:Q', title='Expeditions')
+                ]
+            ).properties(
+                width=700,
+                height=300,
+                title=f'Total Expeditions by Termination Reason for {peak_info["PKNAME"]}'
+            )
         
-        st.altair_chart(termination_bars, use_container_width=True)
+        show_chart(termination_bars, selected_peak)
     else:
         st.info(f"No termination reason data available for {peak_info['PKNAME']} with the current filters.")
     
     # Comparación entre picos
     st.markdown("### Termination Reasons Comparison Across Peaks")
     
-    # Preparar datos para la comparación
-    term_comparison = termination_df.groupby(['PEAKID', 'PKNAME', 'reason_grouped']).size().reset_index(name='count')
-    term_comparison = term_comparison.merge(
-        term_comparison.groupby(['PEAKID'])['count'].sum().reset_index(name='total'),
-        on=['PEAKID']
-    )
-    term_comparison['percentage'] = term_comparison['count'] / term_comparison['total'] * 100
-    
-    # Filtrar para incluir solo los picos principales
-    term_comparison = term_comparison[term_comparison['PEAKID'].isin(top_peaks)]
-    
-    # Mostrar solo las razones más comunes
-    common_reasons = termination_df['reason_grouped'].value_counts().head(5).index.tolist()
-    term_comparison = term_comparison[term_comparison['reason_grouped'].isin(common_reasons)]
-    
     # Crear gráfico de calor para comparación
     if not term_comparison.empty:
-        heatmap = alt.Chart(term_comparison).mark_rect().encode(
-            x=alt.X('PKNAME:N', axis=alt.Axis(title='Peak', labelAngle=-45)),
-            y=alt.Y('reason_grouped:N', axis=alt.Axis(title='Termination Reason')),
-            color=alt.Color('percentage:Q',
-                          scale=alt.Scale(scheme='viridis'),
-                          legend=alt.Legend(title='Percentage of Expeditions')),
-            tooltip=[
-                alt.Tooltip('PKNAME:N', title='Peak'),
-                alt.Tooltip('reason_grouped:N', title='Termination Reason'),
-                alt.Tooltip('percentage:Q', title='Percentage', format='.1f'),
-                alt.Tooltip('count:Q', title='Expeditions'),
-                alt.Tooltip('total:Q', title='Total Expeditions')
-            ]
-        ).properties(
-            width=700,
-            height=300,
-            title='Comparison of Termination Reasons Across Peaks'
-        )
+        def heatmap():
+            return alt.Chart(term_comparison).mark_rect().encode(
+                x=alt.X('PKNAME:N', axis=alt.Axis(title='Peak', labelAngle=-45)),
+                y=alt.Y('reason_grouped:N', axis=alt.Axis(title='Termination Reason')),
+                color=alt.Color('percentage:Q',
+                              scale=alt.Scale(scheme='viridis'),
+                              legend=alt.Legend(title='Percentage of Expeditions')),
+                tooltip=[
+                    alt.Tooltip('PKNAME:N', title='Peak'),
+                    alt.Tooltip('reason_grouped:N', title='Termination Reason'),
+                    alt.Tooltip('percentage:Q', title='Percentage', format='.1f'),
+                    alt.Tooltip('count:Q', title='Expeditions'),
+                    alt.Tooltip('total:Q', title='Total Expeditions')
+                ]
+            ).properties(
+                width=700,
+                height=300,
+                title='Comparison of Termination Reasons Across Peaks'
+            )
         
-        st.altair_chart(heatmap, use_container_width=True)
+        show_chart(heatmap)
     else:
         st.info("Not enough data available for cross-peak termination reason comparison with the current filters.")
 
+with tab5:
+    termination_panel(selected_peak, term_buckets)
+
+# Tamaño total de los gráficos enviados en esta ejecución
+logger.info("rerun chart payload: %d bytes in %d charts", sum(chart_payloads.values()), len(chart_payloads))
+
+# Latencia de esta ejecución completa y control de la barra lateral que la provocó
+controls = {'selected_peak': selected_peak, 'year_range': year_range, 'nearby_km': nearby_km,
+            'time_buckets': (bucket_choice, country_buckets.key, term_buckets.key),
+            'duration_bins': (duration_choice, duration_bins.key if duration_bins else None)}
+previous_controls = st.session_state.get('controls')
+changed = [name for name, value in controls.items()
+           if previous_controls is not None and previous_controls.get(name) != value]
+st.session_state['controls'] = controls
+st.session_state['rerun_ms'] = (time.perf_counter() - run_started) * 1000
+logger.info("rerun (%s): %.1f ms", ', '.join(changed) or ('initial' if previous_controls is None else 'no change'),
+            st.session_state['rerun_ms'])
+
+# Estado de la caché de gráficos (compartida por todas las sesiones)
+cache_stats = chart_cache.stats()
+logger.info("chart cache: %d hits, %d misses, %d entries", cache_stats['hits'], cache_stats['misses'], cache_stats['entries'])
+st.sidebar.markdown("---")
+st.sidebar.header("Chart Cache")
+st.sidebar.markdown(f"""
+**Hits**: {cache_stats['hits']}  
+**Misses**: {cache_stats['misses']}  
+**Cached charts**: {cache_stats['entries']} ({cache_stats['bytes'] / 1024:.0f} KB)
+""")
+
+# Panel de diagnóstico (tiempos, memoria y cachés de esta ejecución)
+if diagnostics:
+    run_record = write_diagnostics(profiler, 'full', total_ms=round(st.session_state['rerun_ms'], 2))
+    st.sidebar.markdown("---")
+    st.sidebar.header("Diagnostics")
+    st.sidebar.markdown(f"""
+**Rerun**: {run_record['total_ms']:.0f} ms  
+**Charts**: {profiler.total('chart'):.0f} ms  
+**Memory (RSS)**: {run_record['rss_mb']:.0f} MB
+""")
+    measurements = pd.DataFrame(run_record['measurements'])
+    if not measurements.empty:
+        st.sidebar.markdown("**Stages and tabs**")
+        st.sidebar.dataframe(measurements[measurements['kind'] != 'chart'][['kind', 'name', 'ms', 'rss_delta_mb']],
+                             hide_index=True)
+    if run_record['caches']:
+        st.sidebar.markdown("**Cached functions**")
+        st.sidebar.dataframe(pd.DataFrame.from_dict(run_record['caches'], orient='index')
+                             [['hits', 'misses', 'compute_ms', 'cache_ms']])
+    st.sidebar.caption(f"Appended to {os.path.abspath(DIAGNOSTICS_LOG)}")
+
 # Información sobre el proyecto
 st.sidebar.markdown("---")
 st.sidebar.markdown("### About this Project")
@@ -0,0 +1,79 @@
+# Arranque en frío de la aplicación servida desde un paquete precalculado (HIMALAYA_BUNDLE)
+# frente al cálculo desde los CSV y desde la instantánea Parquet.
+#
+# Genera un dataset sintético de --rows expediciones (himalaya.synthetic), construye el paquete
+# con himalaya.build y mide, cada vez en un proceso nuevo, la primera ejecución completa de la
+# aplicación con AppTest en los tres modos. En el modo paquete comprueba además que no se ha
+# importado el pipeline de los CSV.
+#
+# Uso:
+#   python benchmarks/bench_bundle.py [--rows 100000] [--repeat 3]
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from himalaya.build import build  # noqa: E402
+from himalaya.synthetic import generate  # noqa: E402
+
+FIRST_RUN = """
+import sys, time
+from streamlit.testing.v1 import AppTest
+start = time.perf_counter()
+at = AppTest.from_file({app!r}, default_timeout=3600).run()
+elapsed = time.perf_counter() - start
+assert not at.exception, at.exception
+print(elapsed, int('himalaya.pipeline' in sys.modules))
+"""
+
+
+def first_run(env):
+    code = FIRST_RUN.format(app=os.path.join(ROOT, 'app.py'))
+    env = dict(os.environ, HIMALAYA_LOG_LEVEL='WARNING', **env)
+    out = subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=env, check=True,
+                         capture_output=True, text=True).stdout
+    elapsed, pipeline_imported = out.strip().splitlines()[-1].split()
+    return float(elapsed), pipeline_imported == '1'
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        data_dir = os.path.join(work_dir, 'data')
+        bundles = os.path.join(work_dir, 'bundles')
+        generate(data_dir, rows=args.rows, seed=0)
+        build(data_dir, bundles)
+
+        modes = {
+            'CSV (sin instantánea)': lambda i: {'HIMALAYA_DATA_DIR': data_dir,
+                                               'HIMALAYA_SNAPSHOT_DIR': os.path.join(work_dir, f'empty-{i}')},
+            'instantánea Parquet': lambda i: {'HIMALAYA_DATA_DIR': data_dir,
+                                             'HIMALAYA_SNAPSHOT_DIR': os.path.join(work_dir, 'snapshots')},
+            'paquete (HIMALAYA_BUNDLE)': lambda i: {'HIMALAYA_BUNDLE': bundles},
+        }
+        # Crear la instantánea antes de medir su modo
+        first_run(modes['instantánea Parquet'](0))
+
+        print(f'{args.rows:,} expediciones, primera ejecución de la app (mediana de {args.repeat}):')
+        for name, env in modes.items():
+            results = [first_run(env(i)) for i in range(args.repeat)]
+            times = [elapsed for elapsed, _ in results]
+            imported = any(pipeline_imported for _, pipeline_imported in results)
+            line = f'  {name:28s} {statistics.median(times):6.2f} s'
+            if name.startswith('paquete'):
+                assert not imported, 'el modo paquete ha importado himalaya.pipeline'
+                line += '   (sin importar himalaya.pipeline)'
+            print(line)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+# Coste de un acierto de caché de las etapas en función del número de expediciones.
+#
+# Para cada tamaño genera un dataset sintético (himalaya.synthetic) y, en un proceso nuevo, ejecuta
+# la aplicación con AppTest en el modo de diagnóstico: la primera ejecución calcula las etapas y la
+# segunda solo tiene aciertos. Del registro de diagnóstico de la segunda se toma el tiempo que
+# añade la caché (cache_ms: hash de la clave y búsqueda) en cada función cargada o preparada.
+# Con la versión de los datos como clave, este coste no crece con las filas; con --app se puede
+# medir otra versión de la aplicación para comparar.
+#
+# Uso:
+#   python benchmarks/bench_cache_hits.py [--rows 10000 100000 1000000] [--app app.py]
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from himalaya.synthetic import generate  # noqa: E402
+
+HIT_RUN = """
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file({app!r}, default_timeout=3600).run()
+at.run()
+assert not at.exception, at.exception
+"""
+
+
+def hit_costs(app, env):
+    # cache_ms de cada función con aciertos en la segunda ejecución
+    with tempfile.TemporaryDirectory() as log_dir:
+        log = os.path.join(log_dir, 'diagnostics.jsonl')
+        env = dict(os.environ, HIMALAYA_LOG_LEVEL='WARNING', HIMALAYA_DIAGNOSTICS='1',
+                   HIMALAYA_DIAGNOSTICS_LOG=log, **env)
+        subprocess.run([sys.executable, '-c', HIT_RUN.format(app=app)], cwd=os.path.dirname(app), env=env,
+                       check=True, capture_output=True)
+        with open(log) as f:
+            record = [json.loads(line) for line in f][-1]
+    return {name: entry['cache_ms'] for name, entry in record['caches'].items()
+            if entry['hits'] and name.startswith(('load_', 'prepare_'))}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--app', default=os.path.join(ROOT, 'app.py'))
+    args = parser.parse_args()
+    app = os.path.abspath(args.app)
+
+    print(f'Coste de los aciertos de caché por rerun, {app}')
+    print(f"  {'expediciones':>12s} {'total':>9s} {'máximo':>9s}  función más cara")
+    for rows in args.rows:
+        with tempfile.TemporaryDirectory() as work_dir:
+            data_dir = os.path.join(work_dir, 'data')
+            generate(data_dir, rows=rows, seed=0)
+            costs = hit_costs(app, {'HIMALAYA_DATA_DIR': data_dir,
+                                    'HIMALAYA_SNAPSHOT_DIR': os.path.join(work_dir, 'snapshots')})
+        slowest = max(costs, key=costs.get)
+        print(f'  {rows:12,d} {sum(costs.values()):6.1f} ms {costs[slowest]:6.2f} ms  {slowest}')
+
+
+if __name__ == '__main__':
+    main()
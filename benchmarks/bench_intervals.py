@@ -0,0 +1,107 @@
+# Benchmark de los intervalos de confianza de las tasas de éxito (himalaya.intervals) para todos
+# los pares (pico, ruta).
+#
+# Para cada escala genera un dataset sintético con `escala` veces las expediciones del original
+# (y, con --peak-factor/--route-factor, más picos y rutas), calcula las tablas de conteos y mide
+# sobre todos los pares (pico, ruta), sin el mínimo de intentos de la aplicación:
+#   - Wilson en forma cerrada;
+#   - bootstrap por lotes en el proceso y en el pool de procesos (--workers);
+#   - bootstrap con un bucle de Python por grupo (referencia, hasta --loop-max grupos).
+# Comprueba que con muchos intentos el bootstrap se acerca a Wilson y termina con código 1 si
+# el bootstrap de la escala mayor supera --budget-ms.
+#
+# Uso:
+#   python benchmarks/bench_intervals.py [--scales 1 10 100] [--route-factor 20] [--workers 4]
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from himalaya.aggregates import count_tables  # noqa: E402
+from himalaya.intervals import (BOOTSTRAP_RESAMPLES, BOOTSTRAP_WORKERS, CONFIDENCE,  # noqa: E402
+                                bootstrap_interval, wilson_interval)
+from himalaya.pipeline import load_data, process_data  # noqa: E402
+from himalaya.synthetic import generate  # noqa: E402
+
+
+def route_groups(factor, peak_factor, route_factor):
+    # Éxitos e intentos de todos los pares (pico, ruta) del dataset sintético
+    with tempfile.TemporaryDirectory() as data_dir:
+        rows = generate(data_dir, rows=None, seed=0, peak_factor=peak_factor, route_factor=route_factor)
+        if factor > 1:
+            rows = generate(data_dir, rows=rows * factor, seed=0, peak_factor=peak_factor,
+                            route_factor=route_factor)
+        df_merged, _ = process_data(*load_data(data_dir))
+    routes = count_tables(df_merged)['routes']
+    return rows, routes['successful_attempts'].to_numpy(), routes['total_attempts'].to_numpy()
+
+
+def loop_bootstrap(successes, totals, resamples=BOOTSTRAP_RESAMPLES, confidence=CONFIDENCE, seed=0):
+    # Un remuestreo de los resultados individuales por grupo, en Python
+    rng = np.random.default_rng(seed)
+    alpha = 1 - confidence
+    bounds = []
+    for k, n in zip(successes, totals):
+        outcomes = np.zeros(n)
+        outcomes[:k] = 1
+        rates = rng.choice(outcomes, size=(resamples, n)).mean(axis=1)
+        bounds.append(np.quantile(rates, [alpha / 2, 1 - alpha / 2]))
+    return np.array(bounds)
+
+
+def median_ms(func, *args, repeat=3, **kwargs):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(*args, **kwargs)
+        times.append((time.perf_counter() - started) * 1000)
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--peak-factor', type=int, default=1)
+    parser.add_argument('--route-factor', type=int, default=1)
+    parser.add_argument('--workers', type=int, default=BOOTSTRAP_WORKERS)
+    parser.add_argument('--loop-max', type=int, default=20, help='grupos del bucle de referencia')
+    parser.add_argument('--budget-ms', type=float, default=200.0)
+    args = parser.parse_args()
+
+    print(f'{BOOTSTRAP_RESAMPLES} remuestreos, {args.workers} procesos')
+    print(f"{'escala':>7} {'expediciones':>13} {'grupos':>8} {'wilson':>9} {'bootstrap':>10} "
+          f"{'pool':>9} {'bucle/grupo':>12}")
+    bootstrap_ms = 0.0
+    for factor in args.scales:
+        rows, successes, totals = route_groups(factor, args.peak_factor, args.route_factor)
+        wilson_ms = median_ms(wilson_interval, successes, totals)
+        bootstrap_ms = median_ms(bootstrap_interval, successes, totals, workers=1)
+        # La primera llamada arranca el pool; se mide con los procesos ya en marcha
+        bootstrap_interval(successes, totals, workers=args.workers)
+        pool_ms = median_ms(bootstrap_interval, successes, totals, workers=args.workers)
+        sample = slice(0, min(args.loop_max, len(totals)))
+        loop_ms = median_ms(loop_bootstrap, successes[sample], totals[sample], repeat=1)
+
+        # Con muchos intentos los dos intervalos casi coinciden
+        low, high = bootstrap_interval(successes, totals, workers=1)
+        wilson_low, wilson_high = wilson_interval(successes, totals)
+        large = totals >= 1000
+        if large.any():
+            gap = max(np.abs(low - wilson_low)[large].max(), np.abs(high - wilson_high)[large].max())
+            assert gap < 0.02, f'bootstrap and Wilson differ by {gap:.3f}'
+        print(f'{factor:>6}x {rows:13,d} {len(totals):8,d} {wilson_ms:6.2f} ms {bootstrap_ms:7.1f} ms '
+              f'{pool_ms:6.1f} ms {loop_ms / (sample.stop or 1):9.2f} ms')
+
+    if bootstrap_ms > args.budget_ms:
+        print(f'El bootstrap tarda {bootstrap_ms:.0f} ms (presupuesto: {args.budget_ms:.0f} ms)')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+# Bytes por fila del dataset combinado (df_merged) antes y después del esquema compacto.
+#
+# "Antes" reproduce la carga original: todas las columnas de exped_tidy.csv con tipos
+# inferidos. "Después" usa himalaya.pipeline con el esquema de himalaya.schema.
+#
+# Con --bundle comprueba además que un paquete Arrow se sirve sin copias: después de load_bundle
+# (que ya particiona las tablas por pico) y de freeze, los datos de cada columna de las tablas
+# y particiones y los arrays de las sumas por año y del índice de duraciones tienen que estar en
+# la proyección en memoria de los archivos del paquete (/proc/self/maps, solo Linux). Solo se
+# admiten las copias que Arrow no puede evitar (booleanos y categóricas con nulos). Termina con
+# código 1 si algo más se ha copiado.
+#
+# Uso:
+#   python benchmarks/bench_memory.py [--data-dir input_data] [--bundle bundles]
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from himalaya.bundle import load_bundle, resolve_bundle  # noqa: E402
+from himalaya.pipeline import input_paths, load_data, process_data  # noqa: E402
+from himalaya.schema import bytes_per_row  # noqa: E402
+from himalaya.shared import freeze  # noqa: E402
+
+
+def legacy_merged(data_dir):
+    # Carga y procesamiento sin esquema (todas las columnas, tipos inferidos)
+    exped_path, peaks_path, coords_path = input_paths(data_dir)
+    df = pd.read_csv(exped_path, encoding='latin-1')
+    peaks_df = pd.read_csv(peaks_path, encoding='latin-1')
+    coords_df = pd.read_csv(coords_path, encoding='latin-1')
+
+    for i in range(1, 5):
+        df[f'SUCCESS{i}'] = df[f'SUCCESS{i}'].fillna(False).astype(bool)
+    df['TOTDAYS'] = pd.to_numeric(df['TOTDAYS'], errors='coerce')
+    df['YEAR_INT'] = pd.to_numeric(df['YEAR'], errors='coerce')
+    df['ANY_SUCCESS'] = df[[f'SUCCESS{i}' for i in range(1, 5)]].any(axis=1)
+    df = pd.merge(df, peaks_df[['PEAKID', 'PKNAME', 'HEIGHTM', 'HIMAL_FACTOR', 'REGION_FACTOR']],
+                  on='PEAKID', how='left')
+    df = pd.merge(df, coords_df[['PEAKID', 'LATITUDE', 'LONGITUDE']], on='PEAKID', how='left')
+    df['decade'] = ((df['YEAR_INT'] // 10) * 10).astype(str) + 's'
+    period = (df['YEAR_INT'] // 5) * 5
+    df['period'] = period.astype(str) + '-' + (period + 4).astype(str)
+    return df
+
+
+def mapped_ranges(directory):
+    # Tramos de memoria del proceso proyectados desde archivos de `directory`
+    directory = os.path.realpath(directory) + os.sep
+    ranges = []
+    with open('/proc/self/maps') as f:
+        for line in f:
+            fields = line.split(maxsplit=5)
+            if len(fields) == 6 and fields[5].strip().startswith(directory):
+                start, stop = (int(address, 16) for address in fields[0].split('-'))
+                ranges.append((start, stop))
+    return ranges
+
+
+def column_buffers(values):
+    # (dirección, bytes) de los datos de una columna; de las categóricas, sus códigos
+    if isinstance(values, pd.Categorical):
+        values = values.codes
+    pa_array = getattr(values, '_pa_array', None)
+    if pa_array is not None:
+        return [(buffer.address, buffer.size) for chunk in pa_array.chunks
+                for buffer in chunk.buffers() if buffer is not None and buffer.size]
+    array = np.asarray(values)
+    return [(array.__array_interface__['data'][0], array.nbytes)] if array.nbytes else []
+
+
+# Tabla del paquete de la que sale cada partición por pico (ver stages.peak_partitions)
+PARTITION_TABLES = {'expeditions': 'df_merged', 'routes': 'route_success_data', 'countries': 'country_exped_by_peak',
+                    'duration': 'duration_success', 'termination': 'termination_data'}
+
+
+def needs_copy(column):
+    # Columnas Arrow que pandas no puede usar tal cual: booleanos (un bit por valor) y
+    # diccionarios con nulos (los códigos de pandas usan -1)
+    return pa.types.is_boolean(column.type) or (pa.types.is_dictionary(column.type) and column.null_count > 0)
+
+
+def served_data(version_dir, manifest, prepared, df_merged, peaks_df, coords_df):
+    # (nombre, buffers) de todo lo que el paquete debería servir sin copiar
+    tables = {'df_merged': df_merged, 'peaks_df': peaks_df, 'coords_df': coords_df}
+    for stage, names in manifest['stages'].items():
+        results = prepared[stage] if len(names) > 1 else (prepared[stage],)
+        tables.update(zip(names, results))
+    frames = [(name, name, frame) for name, frame in tables.items()]
+    partitions, _ = prepared['peak_partitions']
+    frames += [(f'peak_partitions.{name}', PARTITION_TABLES[name], partition.frame)
+               for name, partition in partitions.items()]
+
+    for name, table, frame in frames:
+        info = manifest['tables'][table]
+        if not info['file'].endswith('.arrow'):
+            continue
+        arrow = pa.ipc.open_file(pa.memory_map(os.path.join(version_dir, info['file']))).read_all()
+        for col in frame.columns:
+            if not needs_copy(arrow.column(str(col))):
+                yield f'{name}.{col}', column_buffers(frame[col]._values)
+
+    indexes = {'peak_years': prepared['year_prefix_sums'][0], 'all_years': prepared['year_prefix_sums'][1],
+               'duration_index': prepared['duration_index']}
+    for name, index in indexes.items():
+        for attr, value in vars(index).items():
+            if isinstance(value, np.ndarray):
+                yield f'{name}.{attr}', column_buffers(value)
+
+
+def copied_data(version_dir):
+    # Nombres de las columnas y arrays del paquete que no están en su proyección en memoria
+    loaded = freeze(load_bundle(version_dir))
+    ranges = mapped_ranges(version_dir)
+    return [name for name, buffers in served_data(version_dir, *loaded)
+            if not all(any(start <= address and address + size <= stop for start, stop in ranges)
+                       for address, size in buffers)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--data-dir', default=os.path.join(os.path.dirname(__file__), '..', 'input_data'))
+    parser.add_argument('--bundle', help='raíz o versión de un paquete (python -m himalaya.build)')
+    args = parser.parse_args()
+
+    before = legacy_merged(args.data_dir)
+    after, _ = process_data(*load_data(args.data_dir))
+
+    print(f'filas:                 {len(after):,}')
+    print(f'antes:  {before.shape[1]:>3} columnas, {bytes_per_row(before):>8.1f} bytes/fila')
+    print(f'después: {after.shape[1]:>2} columnas, {bytes_per_row(after):>8.1f} bytes/fila')
+    print(f'reducción: {bytes_per_row(before) / bytes_per_row(after):.1f}x')
+    print()
+    print(after.dtypes.to_string())
+
+    if args.bundle:
+        copied = copied_data(resolve_bundle(args.bundle))
+        print()
+        print(f'paquete: {len(copied)} columnas o arrays copiados fuera de la proyección en memoria')
+        if copied:
+            print('\n'.join(f'  {name}' for name in copied))
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
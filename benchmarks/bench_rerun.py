@@ -0,0 +1,83 @@
+# Latencia de rerun por control de la aplicación (AppTest, sin navegador).
+#
+# AppTest siempre ejecuta el script completo, así que para cada control se mide el rerun
+# completo y, por separado, el tiempo de los fragmentos que dependen de ese control y el de
+# las demás pestañas, que repiten su contenido desde la caché sin ejecutarse. En un servidor
+# real el selector de temporada solo vuelve a ejecutar el fragmento de duración.
+#
+# Uso:
+#   python benchmarks/bench_rerun.py [--repeat 5]
+import argparse
+import os
+import statistics
+import time
+
+from streamlit.testing.v1 import AppTest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+APP = os.path.join(ROOT, 'app.py')
+
+# Fragmentos que se vuelven a ejecutar al cambiar cada control
+CONTROL_PANELS = {
+    'selected_peak': ['overview', 'routes', 'countries', 'duration', 'termination'],
+    'year_range': ['overview', 'countries', 'duration'],
+    'season': ['duration'],
+    'time_buckets': ['countries', 'termination'],
+    'duration_bins': ['duration'],
+    'nearby_peaks': ['overview'],
+}
+
+
+def change(at, control, i):
+    # Valor distinto en cada repetición para no medir solo aciertos de caché
+    if control == 'selected_peak':
+        widget = at.sidebar.selectbox[0]
+        widget.set_value(widget.options[(i + 1) % len(widget.options)].split(' - ')[0])
+    elif control == 'year_range':
+        # Rangos dentro de los años del dataset (el incluido solo abarca unos pocos años)
+        widget = at.sidebar.slider[0]
+        years = range(int(widget.min), int(widget.max) + 1)
+        ranges = [(first, last) for first in years for last in years if first < last]
+        widget.set_value(ranges[i % len(ranges)])
+    elif control == 'nearby_peaks':
+        widget = [s for s in at.sidebar.slider if s.label == 'Nearby Peaks (km)'][0]
+        widget.set_value(50 + 10 * i)
+    elif control == 'season':
+        widget = [s for s in at.selectbox if s.label.startswith('Season')][0]
+        widget.set_value(widget.options[(i + 1) % len(widget.options)])
+    else:
+        # Anchos fijos y opción por defecto (los cortes propios necesitan además el texto)
+        label = 'Time Buckets' if control == 'time_buckets' else 'Duration Bins'
+        widget = [s for s in at.sidebar.selectbox if s.label == label][0]
+        options = [option for option in widget.options if option != 'Custom edges']
+        widget.set_value(options[(i + 1) % len(options)])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    at = AppTest.from_file(APP, default_timeout=300)
+    start = time.perf_counter()
+    at.run()
+    print(f'primera ejecución: {(time.perf_counter() - start) * 1000:.0f} ms')
+
+    for control, panels in CONTROL_PANELS.items():
+        full, scoped, replayed = [], [], []
+        for i in range(args.repeat):
+            change(at, control, i)
+            start = time.perf_counter()
+            at.run()
+            assert not at.exception, at.exception
+            full.append((time.perf_counter() - start) * 1000)
+            timings = at.session_state['panel_timings']
+            scoped.append(sum(timings[name] for name in panels))
+            replayed.append(sum(ms for name, ms in timings.items() if name not in panels))
+        print(f'{control:14s} rerun completo: {statistics.median(full):7.1f} ms   '
+              f'fragmentos ({", ".join(panels)}): {statistics.median(scoped):7.1f} ms   '
+              f'resto (caché): {statistics.median(replayed):5.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
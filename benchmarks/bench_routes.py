@@ -0,0 +1,107 @@
+# Benchmark del motor ancho-a-largo de rutas (himalaya.routes) frente al bucle iterrows original.
+# tests/test_routes.py comprueba que los dos dan el mismo resultado.
+#
+# Uso:
+#   python benchmarks/bench_routes.py                      # 1x, 10x, 100x, 1000x
+#   python benchmarks/bench_routes.py --scales 1 1000 12000  # ~10M expediciones
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from himalaya.routes import explode_routes, route_success_rates  # noqa: E402
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'input_data')
+
+
+def load_merged():
+    # Réplica mínima de load_data + process_data con las columnas que usa el motor de rutas
+    exped_df = pd.read_csv(os.path.join(DATA_DIR, 'exped_tidy.csv'), encoding='latin-1')
+    peaks_df = pd.read_csv(os.path.join(DATA_DIR, 'peaks_tidy.csv'), encoding='latin-1')
+
+    for i in range(1, 5):
+        exped_df[f'SUCCESS{i}'] = exped_df[f'SUCCESS{i}'].fillna(False).astype(bool)
+
+    df = pd.merge(exped_df, peaks_df[['PEAKID', 'PKNAME', 'HEIGHTM']], on='PEAKID', how='left')
+    columns = ['EXPID', 'PEAKID', 'PKNAME', 'YEAR', 'SEASON_FACTOR', 'HEIGHTM',
+               'ROUTE1', 'ROUTE2', 'ROUTE3', 'ROUTE4',
+               'SUCCESS1', 'SUCCESS2', 'SUCCESS3', 'SUCCESS4']
+    return df[columns]
+
+
+def scale_frame(df, factor):
+    # Repetir el dataset `factor` veces con EXPID únicos
+    if factor == 1:
+        return df
+    scaled = df.take(np.tile(np.arange(len(df)), factor)).reset_index(drop=True)
+    suffix = np.repeat(np.arange(factor), len(df)).astype(str)
+    scaled['EXPID'] = scaled['EXPID'].to_numpy(dtype=object) + '-' + suffix.astype(object)
+    return scaled
+
+
+def legacy_route_success_data(df_merged):
+    # Implementación original de prepare_route_success_data (referencia)
+    route_success_pairs = []
+
+    for _, row in df_merged.iterrows():
+        for i in range(1, 5):
+            route_col = f'ROUTE{i}'
+            success_col = f'SUCCESS{i}'
+
+            if pd.notna(row[route_col]):
+                route_success_pairs.append({
+                    'EXPID': row['EXPID'],
+                    'PEAKID': row['PEAKID'],
+                    'PKNAME': row['PKNAME'],
+                    'YEAR': row['YEAR'],
+                    'SEASON_FACTOR': row['SEASON_FACTOR'],
+                    'ROUTE': row[route_col],
+                    'SUCCESS': row[success_col],
+                    'HEIGHTM': row['HEIGHTM']
+                })
+
+    routes_df = pd.DataFrame(route_success_pairs)
+
+    rates = routes_df.groupby(['PEAKID', 'PKNAME', 'ROUTE']).agg(
+        total_attempts=('SUCCESS', 'count'),
+        successful_attempts=('SUCCESS', 'sum'),
+        height=('HEIGHTM', 'first')
+    ).reset_index()
+    rates['success_rate'] = rates['successful_attempts'] / rates['total_attempts']
+    return rates[rates['total_attempts'] >= 5]
+
+
+def vectorized_route_success_data(df_merged):
+    return route_success_rates(explode_routes(df_merged), min_attempts=5)
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 100, 1000])
+    parser.add_argument('--legacy-max-rows', type=int, default=100_000,
+                        help='no ejecutar el bucle iterrows por encima de este número de filas')
+    args = parser.parse_args()
+
+    base = load_merged()
+    print(f"{'scale':>7} {'rows':>12} {'vectorized_s':>13} {'rows_per_s':>13} {'legacy_s':>10}")
+    for factor in args.scales:
+        df = scale_frame(base, factor)
+        vectorized = timed(vectorized_route_success_data, df)
+        legacy = timed(legacy_route_success_data, df) if len(df) <= args.legacy_max_rows else float('nan')
+        print(f'{factor:>7} {len(df):>12,} {vectorized:>13.3f} {len(df) / vectorized:>13,.0f} {legacy:>10.3f}')
+        del df
+
+
+if __name__ == '__main__':
+    main()
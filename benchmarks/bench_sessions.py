@@ -0,0 +1,149 @@
+# Memoria y latencia por sesión con 1 y con 50 sesiones concurrentes.
+#
+# Para cada número de sesiones arranca un servidor `streamlit run app.py` nuevo sobre un dataset
+# sintético de --rows expediciones. Una primera sesión calcula las cachés del proceso (no se
+# cuenta). Después se conectan a la vez N clientes por WebSocket, con el mismo protocolo que el
+# navegador, y cada uno pide la primera ejecución y --reruns ejecuciones más. Se informa de la
+# mediana y el p95 de la latencia de cada ejecución (hasta script_finished), del pico de RSS del
+# servidor durante las ejecuciones y de la memoria que queda por sesión conectada. Con --app se
+# mide otra versión de la aplicación (p. ej. un checkout anterior) para comparar.
+#
+# Uso:
+#   python benchmarks/bench_sessions.py [--rows 100000] [--sessions 1 50] [--reruns 3] [--app app.py]
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+import websockets
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from himalaya.synthetic import generate  # noqa: E402
+
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+
+
+def rss_mb(pid):
+    with open(f'/proc/{pid}/statm') as f:
+        return int(f.read().split()[1]) * PAGE_SIZE / 2**20
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('localhost', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(app, port, env):
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'streamlit', 'run', app, '--server.headless', 'true', '--server.port', str(port),
+         '--browser.gatherUsageStats', 'false'],
+        cwd=os.path.dirname(app), env=dict(os.environ, HIMALAYA_LOG_LEVEL='WARNING', **env),
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 60
+    while True:
+        try:
+            urllib.request.urlopen(f'http://localhost:{port}/_stcore/health')
+            return server
+        except OSError:
+            if server.poll() is not None or time.monotonic() > deadline:
+                server.kill()
+                raise RuntimeError('the Streamlit server did not start')
+            time.sleep(0.2)
+
+
+async def timed_run(ws):
+    # Una ejecución completa del script: desde la petición hasta script_finished
+    request = BackMsg()
+    request.rerun_script.query_string = ''
+    started = time.perf_counter()
+    await ws.send(request.SerializeToString())
+    while True:
+        msg = ForwardMsg()
+        msg.ParseFromString(await ws.recv())
+        if msg.WhichOneof('type') == 'delta' and msg.delta.new_element.WhichOneof('type') == 'exception':
+            raise RuntimeError(msg.delta.new_element.exception.message)
+        if msg.WhichOneof('type') == 'script_finished':
+            return (time.perf_counter() - started) * 1000
+
+
+async def run_sessions(port, pid, sessions, reruns):
+    url = f'ws://localhost:{port}/_stcore/stream'
+    async with websockets.connect(url, subprotocols=['streamlit'], max_size=None) as ws:
+        await timed_run(ws)
+    await asyncio.sleep(0.5)
+    baseline = peak = rss_mb(pid)
+    connected = []
+
+    async def session():
+        ws = await websockets.connect(url, subprotocols=['streamlit'], max_size=None)
+        connected.append(ws)
+        return [await timed_run(ws) for _ in range(1 + reruns)]
+
+    async def sample():
+        nonlocal peak
+        while True:
+            peak = max(peak, rss_mb(pid))
+            await asyncio.sleep(0.02)
+
+    sampler = asyncio.create_task(sample())
+    results = await asyncio.gather(*(session() for _ in range(sessions)))
+    sampler.cancel()
+    # La memoria retenida se mide con todas las sesiones todavía conectadas
+    await asyncio.sleep(0.5)
+    retained = rss_mb(pid)
+    for ws in connected:
+        await ws.close()
+
+    latencies = sorted(ms for runs in results for ms in runs)
+    return {
+        'median_ms': statistics.median(latencies),
+        'p95_ms': latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))],
+        'peak_mb': max(peak, retained) - baseline,
+        'retained_mb': retained - baseline,
+    }
+
+
+def measure(app, sessions, reruns, env):
+    port = free_port()
+    server = start_server(app, port, env)
+    try:
+        return asyncio.run(run_sessions(port, server.pid, sessions, reruns))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--sessions', type=int, nargs='+', default=[1, 50])
+    parser.add_argument('--reruns', type=int, default=3)
+    parser.add_argument('--app', default=os.path.join(ROOT, 'app.py'))
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        data_dir = os.path.join(work_dir, 'data')
+        generate(data_dir, rows=args.rows, seed=0)
+        env = {'HIMALAYA_DATA_DIR': data_dir, 'HIMALAYA_SNAPSHOT_DIR': os.path.join(work_dir, 'snapshots')}
+
+        print(f'{args.rows:,} expediciones, {os.path.abspath(args.app)}')
+        print(f"  {'sesiones':>8s} {'mediana':>9s} {'p95':>9s} {'pico RSS/sesión':>16s} {'RSS retenido/sesión':>20s}")
+        for sessions in args.sessions:
+            result = measure(os.path.abspath(args.app), sessions, args.reruns, env)
+            print(f"  {sessions:8d} {result['median_ms']:7.0f} ms {result['p95_ms']:6.0f} ms "
+                  f"{result['peak_mb'] / sessions:13.1f} MB {result['retained_mb'] / sessions:17.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
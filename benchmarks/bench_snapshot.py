@@ -0,0 +1,53 @@
+# Tiempo de arranque en frío de load_data + process_data con y sin instantánea Parquet.
+#
+# Cada medición se hace en un proceso nuevo, como ocurre al arrancar un servidor Streamlit.
+#
+# Uso:
+#   python benchmarks/bench_snapshot.py [--data-dir input_data] [--repeat 5]
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Las importaciones (pandas, pyarrow) quedan fuera de la medición
+COLD_START = """
+import time
+from himalaya import snapshot
+start = time.perf_counter()
+snapshot.load_or_build({data_dir!r}, cache_dir={cache_dir!r})
+print(time.perf_counter() - start)
+"""
+
+
+def cold_start(data_dir, cache_dir):
+    code = COLD_START.format(data_dir=data_dir, cache_dir=cache_dir)
+    out = subprocess.run([sys.executable, '-c', code], cwd=ROOT, check=True,
+                         capture_output=True, text=True).stdout
+    return float(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--data-dir', default=os.path.join(ROOT, 'input_data'))
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        without = [cold_start(args.data_dir, None) for _ in range(args.repeat)]
+
+        # Primera ejecución: construye y publica la instantánea
+        build = cold_start(args.data_dir, cache_dir)
+        with_snapshot = [cold_start(args.data_dir, cache_dir) for _ in range(args.repeat)]
+
+    print(f'data_dir: {args.data_dir}')
+    print(f'sin instantánea (CSV + process_data): {statistics.median(without):.3f} s')
+    print(f'primer arranque (construye instantánea): {build:.3f} s')
+    print(f'con instantánea (Parquet):             {statistics.median(with_snapshot):.3f} s')
+
+
+if __name__ == '__main__':
+    main()
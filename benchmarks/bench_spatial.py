@@ -0,0 +1,92 @@
+# Benchmark de la rejilla espacial de picos (himalaya.spatial) frente a calcular la distancia
+# haversine a todos los picos del catálogo.
+#
+# Para cada tamaño genera un catálogo sintético: los picos del CSV de coordenadas más picos
+# aleatorios en la franja del Himalaya y el resto del mundo. Comprueba que las consultas por radio
+# y por rectángulo coinciden con la fuerza bruta y mide la construcción y la mediana de cada consulta.
+#
+# Uso:
+#   python benchmarks/bench_spatial.py [--peaks 1000 10000 50000 200000] [--radius 50]
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from himalaya.spatial import PeakGrid, haversine_km  # noqa: E402
+
+COORDS_CSV = os.path.join(os.path.dirname(__file__), '..', 'input_data', 'unique_peaks_coords.csv')
+
+
+def catalog(size, seed=0):
+    # PEAKID, LATITUDE y LONGITUDE de `size` picos (los reales primero)
+    coords = pd.read_csv(COORDS_CSV, encoding='latin-1')[['PEAKID', 'LATITUDE', 'LONGITUDE']]
+    rng = np.random.default_rng(seed)
+    extra = max(size - len(coords), 0)
+    # La mitad en la franja del Himalaya, la otra mitad en cualquier punto del globo
+    himalaya = extra // 2
+    lats = np.concatenate([rng.uniform(27, 36, himalaya), np.degrees(np.arcsin(rng.uniform(-1, 1, extra - himalaya)))])
+    lons = np.concatenate([rng.uniform(72, 95, himalaya), rng.uniform(-180, 180, extra - himalaya)])
+    synthetic = pd.DataFrame({'PEAKID': [f'S{i:07d}' for i in range(extra)], 'LATITUDE': lats, 'LONGITUDE': lons})
+    return pd.concat([coords, synthetic], ignore_index=True).head(size)
+
+
+def brute_radius(coords, lat, lon, km):
+    distances = haversine_km(lat, lon, coords['LATITUDE'].to_numpy(), coords['LONGITUDE'].to_numpy())
+    near = distances <= km
+    return set(coords['PEAKID'].to_numpy()[near])
+
+
+def brute_bbox(coords, south, west, north, east):
+    lats, lons = coords['LATITUDE'], coords['LONGITUDE']
+    inside = (lats >= south) & (lats <= north) & (lons >= west) & (lons <= east)
+    return set(coords['PEAKID'][inside])
+
+
+def median_ms(func, *args, repeat=50):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(*args)
+        times.append((time.perf_counter() - started) * 1000)
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--peaks', type=int, nargs='+', default=[1000, 10_000, 50_000, 200_000])
+    parser.add_argument('--radius', type=float, default=50.0)
+    args = parser.parse_args()
+
+    print(f"{'picos':>9} {'construcción':>13} {'radio':>9} {'rectángulo':>11} {'fuerza bruta':>13} {'en radio':>9}")
+    for size in args.peaks:
+        coords = catalog(size).dropna(subset=['LATITUDE', 'LONGITUDE'])
+        started = time.perf_counter()
+        grid = PeakGrid.from_frame(coords)
+        build_ms = (time.perf_counter() - started) * 1000
+
+        # Consultas centradas en picos reales (Everest y los demás del CSV)
+        centers = coords.head(20)[['LATITUDE', 'LONGITUDE']].to_numpy()
+        box = (27.5, 86.0, 28.5, 87.5)
+        for lat, lon in centers:
+            peaks, distances = grid.radius(lat, lon, args.radius)
+            assert set(peaks) == brute_radius(coords, lat, lon, args.radius)
+            assert np.all(np.diff(distances) >= 0)
+        assert set(grid.bbox(*box)) == brute_bbox(coords, *box)
+
+        lat, lon = centers[0]
+        radius_ms = median_ms(grid.radius, lat, lon, args.radius)
+        bbox_ms = median_ms(grid.bbox, *box)
+        brute_ms = median_ms(brute_radius, coords, lat, lon, args.radius, repeat=10)
+        found = len(grid.radius(lat, lon, args.radius)[0])
+        print(f'{len(coords):9,d} {build_ms:10.1f} ms {radius_ms:6.2f} ms {bbox_ms:8.2f} ms '
+              f'{brute_ms:10.2f} ms {found:9,d}')
+
+
+if __name__ == '__main__':
+    main()
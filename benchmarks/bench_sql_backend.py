@@ -0,0 +1,47 @@
+# Benchmark del backend SQL (himalaya.sql_backend) frente al backend pandas.
+#
+# Construye la instantánea Parquet en un directorio temporal y mide las tablas de conteos con
+# pandas y con DuckDB sobre el Parquet. tests/test_sql_backend.py comprueba que las dos dan las
+# mismas tablas. Requiere duckdb y pyarrow.
+#
+# Uso:
+#   python benchmarks/bench_sql_backend.py [--repeat 5]
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from himalaya import snapshot  # noqa: E402
+from himalaya.aggregates import count_tables  # noqa: E402
+from himalaya.sql_backend import sql_count_tables  # noqa: E402
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'input_data')
+
+
+def timed(func, *args, repeat=5):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        df_merged, _, _, _ = snapshot.load_or_build(DATA_DIR, cache_dir)
+        path = snapshot.table_path(snapshot.input_fingerprint(DATA_DIR), 'df_merged', cache_dir)
+        print(f'pandas: {timed(count_tables, df_merged, repeat=args.repeat) * 1000:.1f} ms   '
+              f'SQL (DuckDB sobre Parquet): {timed(sql_count_tables, path, repeat=args.repeat) * 1000:.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
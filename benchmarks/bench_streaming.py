@@ -0,0 +1,105 @@
+# Memoria máxima (RSS) y tiempo del modo streaming (himalaya.streaming) frente a la carga
+# completa (load_data + process_data + count_tables) a distintas escalas del dataset.
+#
+# Cada escala escribe un exped_tidy.csv con las expediciones repetidas N veces (EXPID únicos)
+# en un directorio temporal, y cada medición se hace en un proceso nuevo. En la escala más
+# pequeña se comprueba además que ambos modos producen tablas idénticas.
+#
+# Uso:
+#   python benchmarks/bench_streaming.py [--scales 1 10 100] [--chunksize 100000] [--skip-full-above 100]
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+DATA_DIR = os.path.join(ROOT, 'input_data')
+
+MEASURE = """
+import pickle, resource, sys, time
+mode, data_dir, chunksize, out = sys.argv[1], sys.argv[2], int(sys.argv[3]), sys.argv[4]
+from himalaya.aggregates import count_tables
+from himalaya.pipeline import load_data, process_data
+from himalaya.streaming import stream_aggregates
+start = time.perf_counter()
+if mode == 'stream':
+    counts, top_peaks = stream_aggregates(data_dir, chunksize)
+else:
+    df_merged, top_peaks = process_data(*load_data(data_dir))
+    counts = count_tables(df_merged)
+elapsed = time.perf_counter() - start
+if out != '-':
+    with open(out, 'wb') as f:
+        pickle.dump((counts, top_peaks), f)
+print(elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024)
+"""
+
+
+def write_scaled(data_dir, factor):
+    # exped_tidy.csv repetido `factor` veces, línea a línea (sin cargarlo en memoria)
+    for name in ('peaks_tidy.csv', 'unique_peaks_coords.csv'):
+        shutil.copy(os.path.join(DATA_DIR, name), data_dir)
+    with open(os.path.join(DATA_DIR, 'exped_tidy.csv'), encoding='latin-1') as f:
+        header, *lines = f.read().splitlines(keepends=True)
+    with open(os.path.join(data_dir, 'exped_tidy.csv'), 'w', encoding='latin-1') as f:
+        f.write(header)
+        for i in range(factor):
+            suffix = f'-{i},' if factor > 1 else ','
+            f.writelines(line.replace(',', suffix, 1) for line in lines)
+
+
+def measure(mode, data_dir, chunksize, out='-'):
+    result = subprocess.run([sys.executable, '-c', MEASURE, mode, data_dir, str(chunksize), out],
+                            cwd=ROOT, check=True, capture_output=True, text=True).stdout
+    elapsed, rss_mb = result.strip().splitlines()[-1].split()
+    return float(elapsed), float(rss_mb)
+
+
+def check_identical(data_dir, chunksize):
+    import pickle
+
+    import pandas as pd
+
+    results = {}
+    for mode in ('full', 'stream'):
+        out = os.path.join(data_dir, f'{mode}.pkl')
+        measure(mode, data_dir, chunksize, out)
+        with open(out, 'rb') as f:
+            results[mode] = pickle.load(f)
+
+    (full_counts, full_top), (stream_counts, stream_top) = results['full'], results['stream']
+    assert full_top == stream_top, (full_top, stream_top)
+    for name in full_counts:
+        pd.testing.assert_frame_equal(full_counts[name], stream_counts[name])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--chunksize', type=int, default=100_000)
+    parser.add_argument('--skip-full-above', type=int, default=100,
+                        help='no medir la carga completa por encima de esta escala')
+    args = parser.parse_args()
+
+    for i, factor in enumerate(args.scales):
+        with tempfile.TemporaryDirectory() as data_dir:
+            write_scaled(data_dir, factor)
+            size_mb = os.path.getsize(os.path.join(data_dir, 'exped_tidy.csv')) / 2**20
+            if i == 0:
+                # Bloques pequeños para que el resultado combine varios bloques
+                check_identical(data_dir, chunksize=max(1, 100 * factor))
+                print(f'{factor}x: streaming y carga completa producen tablas idénticas')
+
+            stream_time, stream_rss = measure('stream', data_dir, args.chunksize)
+            line = (f'{factor:5d}x ({size_mb:7.1f} MB)  streaming: {stream_time:7.2f} s, '
+                    f'RSS máx. {stream_rss:7.0f} MB')
+            if factor <= args.skip_full_above:
+                full_time, full_rss = measure('full', data_dir, args.chunksize)
+                line += f'   completa: {full_time:7.2f} s, RSS máx. {full_rss:7.0f} MB'
+            print(line)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,197 @@
+# Suite de benchmarks del pipeline y de la aplicación, con resultados en JSON.
+#
+# Para cada escala (el dataset incluido repetido N veces, como en bench_streaming.py) se mide,
+# en un proceso nuevo:
+#   - pipeline: load_data y process_data (mediana de --repeat ejecuciones) y el rendimiento de
+#     lectura de load_data en MB/s sobre el tamaño de los tres CSV (load_data_mb_s);
+#   - prepare: cada etapa del precálculo (prepare_*) en la primera ejecución de la app, en
+#     secuencia y sin caché (st.session_state['stage_timings']);
+#   - tabs: el bloque de cada pestaña en la primera ejecución (st.session_state['panel_timings']);
+#   - interactions: rerun completo con AppTest al cambiar el pico, el rango de años, la
+#     temporada, los intervalos de tiempo y los bins de duración, y el tiempo de las pestañas
+#     que dependen de cada control (medianas).
+# Los tiempos están en milisegundos. El lector de los CSV (HIMALAYA_CSV_READER) se guarda en los
+# metadatos; con HIMALAYA_CSV_READER=pandas se mide el lector de pandas. Con --baseline se comparan los resultados con los de
+# una ejecución anterior y se listan las métricas más lentas que la tolerancia.
+#
+# Uso:
+#   python benchmarks/bench_suite.py [--scales 1 10 100 1000] [--repeat 3] [--output bench.json]
+#                                    [--baseline anterior.json] [--tolerance 0.2]
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench_rerun import APP, CONTROL_PANELS, ROOT, change
+from bench_streaming import write_scaled
+
+# Nombre de cada interacción en el JSON
+INTERACTIONS = {'selected_peak': 'peak_change', 'year_range': 'year_range_change', 'season': 'season_change',
+                'time_buckets': 'bucket_change', 'duration_bins': 'duration_bins_change',
+                'nearby_peaks': 'nearby_peaks_change'}
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def measure(data_dir, repeat):
+    # Se ejecuta en el proceso hijo, con HIMALAYA_DATA_DIR apuntando a `data_dir`
+    sys.path.insert(0, ROOT)
+    from streamlit.testing.v1 import AppTest
+
+    from himalaya.pipeline import load_data, process_data
+
+    load_times, process_times = [], []
+    for _ in range(repeat):
+        raw, load_ms = timed(load_data, data_dir)
+        (df_merged, _), process_ms = timed(process_data, *raw)
+        load_times.append(load_ms)
+        process_times.append(process_ms)
+    rows = len(df_merged)
+    del raw, df_merged
+
+    at = AppTest.from_file(APP, default_timeout=3600)
+    _, first_run = timed(at.run)
+    assert not at.exception, at.exception
+    result = {
+        'rows': rows,
+        'pipeline': {'load_data': statistics.median(load_times),
+                     'process_data': statistics.median(process_times)},
+        'prepare': dict(at.session_state['stage_timings']),
+        'first_run': first_run,
+        'tabs': dict(at.session_state['panel_timings']),
+        'interactions': {},
+    }
+
+    for control, panels in CONTROL_PANELS.items():
+        reruns, tabs = [], {name: [] for name in panels}
+        for i in range(repeat):
+            change(at, control, i)
+            _, rerun_ms = timed(at.run)
+            assert not at.exception, at.exception
+            reruns.append(rerun_ms)
+            for name in panels:
+                tabs[name].append(at.session_state['panel_timings'][name])
+        result['interactions'][INTERACTIONS[control]] = {
+            'rerun': statistics.median(reruns),
+            'tabs': {name: statistics.median(times) for name, times in tabs.items()},
+        }
+    return result
+
+
+def run_scale(factor, repeat):
+    with tempfile.TemporaryDirectory() as work_dir:
+        data_dir = os.path.join(work_dir, 'data')
+        os.mkdir(data_dir)
+        write_scaled(data_dir, factor)
+        # Instantáneas en un directorio temporal y precálculo en secuencia para que el tiempo
+        # de cada etapa no incluya la espera por las demás
+        env = dict(os.environ, HIMALAYA_DATA_DIR=data_dir,
+                   HIMALAYA_SNAPSHOT_DIR=os.path.join(work_dir, 'snapshots'),
+                   HIMALAYA_PRECOMPUTE_WORKERS='1', HIMALAYA_LOG_LEVEL='WARNING')
+        out = subprocess.run([sys.executable, __file__, '--measure', data_dir, '--repeat', str(repeat)],
+                             cwd=ROOT, env=env, check=True, capture_output=True, text=True).stdout
+        result = json.loads(out.strip().splitlines()[-1])
+        result['csv_mb'] = os.path.getsize(os.path.join(data_dir, 'exped_tidy.csv')) / 2**20
+        result['input_mb'] = sum(os.path.getsize(os.path.join(data_dir, name)) for name in os.listdir(data_dir)) / 2**20
+        result['pipeline']['load_data_mb_s'] = result['input_mb'] / (result['pipeline']['load_data'] / 1000)
+    return {'scale': factor, **result}
+
+
+def metadata(repeat):
+    import pandas as pd
+    import streamlit
+
+    sys.path.insert(0, ROOT)
+    from himalaya.pipeline import ARROW_CSV_AVAILABLE, CSV_READER
+
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, check=True,
+                                capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'streamlit': streamlit.__version__,
+        'csv_reader': CSV_READER if ARROW_CSV_AVAILABLE else 'pandas',
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'repeat': repeat,
+    }
+
+
+def flatten(results):
+    # {"<escala>x/<sección>/<nombre>": ms} para comparar dos ejecuciones (sin tamaños ni MB/s)
+    metrics = {}
+
+    def walk(prefix, node):
+        for name, value in node.items():
+            if isinstance(value, dict):
+                walk(f'{prefix}/{name}', value)
+            elif name not in ('rows', 'csv_mb', 'input_mb', 'load_data_mb_s', 'scale'):
+                metrics[f'{prefix}/{name}'] = value
+
+    for scale in results['scales']:
+        walk(f"{scale['scale']}x", scale)
+    return metrics
+
+
+def compare(results, baseline, tolerance):
+    current, previous = flatten(results), flatten(baseline)
+    slower = [(name, previous[name], ms) for name, ms in current.items()
+              if name in previous and ms > previous[name] * (1 + tolerance)]
+    for name, before, after in slower:
+        print(f'más lento: {name}: {before:.1f} -> {after:.1f} ms ({after / before - 1:+.0%})')
+    return slower
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 100, 1000])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', default='bench.json')
+    parser.add_argument('--baseline', help='JSON de una ejecución anterior con el que comparar')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='aumento relativo a partir del cual una métrica se considera más lenta')
+    parser.add_argument('--measure', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure(args.measure, args.repeat)))
+        return
+
+    results = {'meta': metadata(args.repeat), 'scales': []}
+    for factor in args.scales:
+        scale = run_scale(factor, args.repeat)
+        results['scales'].append(scale)
+        interactions = '   '.join(f"{name}: {data['rerun']:.0f} ms" for name, data in scale['interactions'].items())
+        print(f"{factor:5d}x ({scale['rows']:>9,} filas)  load_data: {scale['pipeline']['load_data']:.0f} ms "
+              f"({scale['pipeline']['load_data_mb_s']:.0f} MB/s)   "
+              f"process_data: {scale['pipeline']['process_data']:.0f} ms   "
+              f"precálculo: {sum(scale['prepare'].values()):.0f} ms   primera ejecución: {scale['first_run']:.0f} ms")
+        print(f'{"":7s}reruns  {interactions}')
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f'Resultados en {args.output}')
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            slower = compare(results, json.load(f), args.tolerance)
+        sys.exit(1 if slower else 0)
+
+
+if __name__ == '__main__':
+    main()
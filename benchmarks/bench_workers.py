@@ -0,0 +1,106 @@
+# Memoria y arranque de varios procesos servidor en el mismo nodo, según de dónde salen los datos.
+#
+# Genera un dataset sintético de --rows expediciones y, para cada modo, arranca uno tras otro
+# --workers servidores `streamlit run app.py` (como detrás de un balanceador). El arranque de
+# cada uno es el tiempo hasta que termina la primera ejecución de una sesión. Con todos en marcha
+# se lee /proc/<pid>/smaps_rollup de cada proceso: RSS, PSS (las páginas compartidas se reparten
+# entre los procesos que las usan) y memoria privada. Los modos son:
+#   - instantánea Parquet: cada proceso carga y procesa su propia copia (sin HIMALAYA_BUNDLE);
+#   - paquete Parquet: cada proceso lee las tablas del paquete en su memoria;
+#   - paquete Arrow: las tablas y las sumas por año se proyectan en memoria y se comparten.
+#
+# Uso:
+#   python benchmarks/bench_workers.py [--rows 1000000] [--workers 4]
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import websockets
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(__file__))
+
+from bench_sessions import free_port, start_server, timed_run  # noqa: E402
+from himalaya.build import build  # noqa: E402
+from himalaya.synthetic import generate  # noqa: E402
+
+APP = os.path.join(ROOT, 'app.py')
+
+
+def memory_mb(pid):
+    # RSS, PSS y memoria privada del proceso
+    values = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            key, _, value = line.partition(':')
+            if key in ('Rss', 'Pss', 'Private_Clean', 'Private_Dirty'):
+                values[key] = int(value.split()[0]) / 1024
+    return {'rss': values['Rss'], 'pss': values['Pss'], 'private': values['Private_Clean'] + values['Private_Dirty']}
+
+
+async def first_session(port):
+    url = f'ws://localhost:{port}/_stcore/stream'
+    async with websockets.connect(url, subprotocols=['streamlit'], max_size=None) as ws:
+        await timed_run(ws)
+
+
+def start_worker(env):
+    # Devuelve (proceso, segundos hasta terminar la primera ejecución)
+    started = time.perf_counter()
+    port = free_port()
+    server = start_server(APP, port, env)
+    asyncio.run(first_session(port))
+    return server, time.perf_counter() - started
+
+
+def measure(workers, env):
+    servers, startups = [], []
+    try:
+        for _ in range(workers):
+            server, startup = start_worker(env)
+            servers.append(server)
+            startups.append(startup)
+        memory = [memory_mb(server.pid) for server in servers]
+    finally:
+        for server in servers:
+            server.terminate()
+            server.wait()
+    return startups, memory
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        data_dir = os.path.join(work_dir, 'data')
+        generate(data_dir, rows=args.rows, seed=0)
+        snapshots = os.path.join(work_dir, 'snapshots')
+        modes = {
+            'instantánea Parquet': {'HIMALAYA_DATA_DIR': data_dir, 'HIMALAYA_SNAPSHOT_DIR': snapshots},
+            'paquete Parquet': {'HIMALAYA_BUNDLE': os.path.join(work_dir, 'bundle-parquet')},
+            'paquete Arrow (mmap)': {'HIMALAYA_BUNDLE': os.path.join(work_dir, 'bundle-arrow')},
+        }
+        build(data_dir, modes['paquete Parquet']['HIMALAYA_BUNDLE'], table_format='parquet')
+        build(data_dir, modes['paquete Arrow (mmap)']['HIMALAYA_BUNDLE'], table_format='arrow')
+        # Crear la instantánea antes de medir su modo
+        measure(1, modes['instantánea Parquet'])
+
+        print(f'{args.rows:,} expediciones, {args.workers} procesos servidor (medias por proceso):')
+        print(f"  {'modo':22s} {'arranque':>9s} {'RSS':>9s} {'PSS':>9s} {'privada':>9s}")
+        for name, env in modes.items():
+            startups, memory = measure(args.workers, env)
+            mean = {key: statistics.mean(m[key] for m in memory) for key in ('rss', 'pss', 'private')}
+            print(f"  {name:22s} {statistics.median(startups):7.2f} s {mean['rss']:6.0f} MB "
+                  f"{mean['pss']:6.0f} MB {mean['private']:6.0f} MB")
+
+
+if __name__ == '__main__':
+    main()
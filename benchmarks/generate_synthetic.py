@@ -0,0 +1,113 @@
+# Genera un dataset sintético (himalaya.synthetic) con la distribución de input_data.
+#
+# Los tres CSV se escriben en --out y se pueden cargar con load_data sin cambios (por ejemplo
+# con HIMALAYA_DATA_DIR=<out>). Con --check se cargan el original y el sintético con el
+# pipeline y se comparan, agrupando las variantes con su pico, ruta o país de origen:
+#   - tasa de éxito por (pico, ruta), ponderada por intentos;
+#   - cuantiles de TOTDAYS;
+#   - reparto de HOST_FACTOR en cada década y frecuencia de TERMREASON_FACTOR
+#     (distancia de variación total);
+#   - que cada pico solo use rutas que tiene en el original.
+# También se comprueba que dos generaciones con la misma semilla producen los mismos archivos.
+#
+# Uso:
+#   python benchmarks/generate_synthetic.py --out synthetic --rows 1000000 [--seed 0]
+#       [--peak-factor 1] [--route-factor 1] [--country-factor 1] [--check]
+import argparse
+import filecmp
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from himalaya.pipeline import COORDS_FILE, EXPED_FILE, PEAKS_FILE, load_data, process_data  # noqa: E402
+from himalaya.routes import explode_routes  # noqa: E402
+from himalaya.synthetic import generate  # noqa: E402
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'input_data')
+
+
+def base_names(df, source_peaks):
+    # Pico, ruta y país de origen de cada variante ("EVER-2", "SW Ridge (2)", "Nepal 2")
+    df = df.astype({'PEAKID': str, 'HOST_FACTOR': str})
+    base_peak = df['PEAKID'].str.replace(r'-\d+$', '', regex=True)
+    df['PEAKID'] = df['PEAKID'].where(df['PEAKID'].isin(source_peaks), base_peak)
+    df['HOST_FACTOR'] = df['HOST_FACTOR'].str.replace(r' \d+$', '', regex=True)
+    return df
+
+
+def route_rates(df):
+    routes = explode_routes(df, ['EXPID', 'PEAKID'])
+    routes['ROUTE'] = routes['ROUTE'].astype(str).str.replace(r' \(\d+\)$', '', regex=True)
+    return routes.groupby(['PEAKID', 'ROUTE'])['SUCCESS'].agg(['mean', 'count'])
+
+
+def total_variation(a, b):
+    a, b = a / a.sum(), b / b.sum()
+    return 0.5 * a.sub(b, fill_value=0).abs().sum()
+
+
+def check(source, synthetic):
+    synthetic = base_names(synthetic, set(source['PEAKID'].astype(str)))
+    source = base_names(source, set(source['PEAKID'].astype(str)))
+
+    real, synth = route_rates(source), route_rates(synthetic)
+    unknown = synth.index.difference(real.index)
+    assert len(unknown) == 0, f'rutas que no existen en el original: {list(unknown[:5])}'
+    joined = real.join(synth, rsuffix='_synth', how='inner')
+    rate_error = ((joined['mean'] - joined['mean_synth']).abs() * joined['count_synth']).sum() / joined['count_synth'].sum()
+    print(f'tasa de éxito por (pico, ruta): error absoluto medio {rate_error:.3f} '
+          f'({len(joined)} de {len(real)} pares presentes)')
+
+    quantiles = [0.05, 0.25, 0.5, 0.75, 0.95]
+    days = pd.DataFrame({'original': source['TOTDAYS'].astype('float64').quantile(quantiles),
+                         'sintético': synthetic['TOTDAYS'].astype('float64').quantile(quantiles)})
+    print('cuantiles de TOTDAYS:\n' + days.to_string())
+
+    for decade, rows in synthetic.groupby('decade', observed=True):
+        original = source[source['decade'] == decade]['HOST_FACTOR'].value_counts()
+        print(f'HOST_FACTOR en {decade}: distancia {total_variation(original, rows["HOST_FACTOR"].value_counts()):.3f}')
+    reasons = total_variation(source['TERMREASON_FACTOR'].astype(str).value_counts(),
+                              synthetic['TERMREASON_FACTOR'].astype(str).value_counts())
+    print(f'TERMREASON_FACTOR: distancia {reasons:.3f}')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--out', required=True)
+    parser.add_argument('--rows', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--peak-factor', type=int, default=1)
+    parser.add_argument('--route-factor', type=int, default=1)
+    parser.add_argument('--country-factor', type=int, default=1)
+    parser.add_argument('--check', action='store_true')
+    args = parser.parse_args()
+
+    options = dict(rows=args.rows, seed=args.seed, peak_factor=args.peak_factor,
+                   route_factor=args.route_factor, country_factor=args.country_factor, data_dir=DATA_DIR)
+    start = time.perf_counter()
+    rows = generate(args.out, **options)
+    size_mb = os.path.getsize(os.path.join(args.out, EXPED_FILE)) / 2**20
+    print(f'{rows:,} expediciones ({size_mb:.1f} MB) en {args.out}: {time.perf_counter() - start:.1f} s')
+
+    if args.check:
+        with tempfile.TemporaryDirectory() as again:
+            generate(again, **options)
+            for name in (EXPED_FILE, PEAKS_FILE, COORDS_FILE):
+                assert filecmp.cmp(os.path.join(args.out, name), os.path.join(again, name), shallow=False), name
+        print('OK: la misma semilla produce los mismos archivos')
+
+        source, _ = process_data(*load_data(DATA_DIR))
+        synthetic, _ = process_data(*load_data(args.out))
+        print(f"picos: {synthetic['PEAKID'].nunique()} (original {source['PEAKID'].nunique()})   "
+              f"rutas: {synthetic['ROUTE1'].nunique()} (original {source['ROUTE1'].nunique()})   "
+              f"países: {synthetic['HOST_FACTOR'].nunique()} (original {source['HOST_FACTOR'].nunique()})")
+        check(source, synthetic)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,3 @@
+# Utilidades de procesamiento de datos para el dashboard de expediciones al Himalaya.
+# El código de este paquete es pandas/numpy puro: no depende de Streamlit, de modo que
+# puede reutilizarse desde app.py, los benchmarks y los scripts de línea de comandos.
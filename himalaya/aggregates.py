@@ -0,0 +1,142 @@
+# Agregados de los paneles (rutas, países, duración y razones de terminación) como tablas
+# de conteos aditivas.
+#
+# count_tables() resume las expediciones en tablas de conteos (claves + medidas que se
+# suman) y las funciones *_table derivan de ellas las tablas que usan los gráficos: tasas,
+# porcentajes y filtros por número mínimo de expediciones. Como las medidas son aditivas,
+# añadir o sustituir expediciones se resuelve con merge_counts() sumando los conteos de las
+# filas nuevas y restando los de las anteriores, sin volver a recorrer todo el dataset.
+import pandas as pd
+
+from himalaya.cube import DURATION_LABELS, duration_bins
+from himalaya.intervals import add_intervals
+from himalaya.routes import explode_routes
+
+# Claves de cada tabla de conteos
+COUNT_KEYS = {
+    'routes': ['PEAKID', 'PKNAME', 'ROUTE'],
+    'country_year': ['HOST_FACTOR', 'YEAR_INT'],
+    'country_peak': ['PEAKID', 'PKNAME', 'HOST_FACTOR'],
+    'duration': ['PEAKID', 'PKNAME', 'SEASON_FACTOR', 'duration_bin'],
+    'duration_avg': ['PEAKID', 'PKNAME', 'ANY_SUCCESS'],
+    'reasons': ['TERMREASON_FACTOR'],
+    'termination': ['PEAKID', 'PKNAME', 'YEAR_INT', 'TERMREASON_FACTOR'],
+}
+
+
+def canonical_counts(table, keys):
+    # Forma canónica de una tabla de conteos: claves como valores simples (no categóricas),
+    # una fila por clave, ordenada, y sin filas a cero
+    table = table.astype({key: object for key in keys})
+    table = table.groupby(keys, sort=True).sum().reset_index()
+    measures = [col for col in table.columns if col not in keys]
+    return table[(table[measures] != 0).any(axis=1)].reset_index(drop=True)
+
+
+def _count(df, name, **measures):
+    keys = COUNT_KEYS[name]
+    table = df.groupby(keys, observed=True).agg(**measures).reset_index()
+    return canonical_counts(table, keys)
+
+
+def count_tables(df_merged):
+    # Tablas de conteos de un conjunto de expediciones ya limpias y combinadas
+    routes = explode_routes(df_merged, ['EXPID', 'PEAKID', 'PKNAME'])
+
+    # Solo duraciones válidas; las de 365 días o más quedan fuera de los bins
+    durations = df_merged[df_merged['TOTDAYS'] > 0]
+    durations = durations.assign(duration_bin=duration_bins(durations['TOTDAYS']),
+                                 TOTDAYS=durations['TOTDAYS'].astype('float64'))
+
+    return {
+        'routes': _count(routes, 'routes', total_attempts=('SUCCESS', 'count'),
+                         successful_attempts=('SUCCESS', 'sum')),
+        'country_year': _count(df_merged, 'country_year', count=('EXPID', 'size')),
+        'country_peak': _count(df_merged, 'country_peak', count=('EXPID', 'size')),
+        'duration': _count(durations, 'duration', total=('EXPID', 'count'), success=('ANY_SUCCESS', 'sum')),
+        'duration_avg': _count(durations, 'duration_avg', totdays_sum=('TOTDAYS', 'sum'),
+                               count=('EXPID', 'count')),
+        'reasons': _count(df_merged, 'reasons', count=('EXPID', 'size')),
+        'termination': _count(df_merged, 'termination', count=('EXPID', 'size')),
+    }
+
+
+def merge_counts(counts, added=None, removed=None):
+    # Sumar los conteos de `added` y restar los de `removed` (resultados de count_tables)
+    merged = {}
+    for name, keys in COUNT_KEYS.items():
+        parts = [counts[name]]
+        if added is not None:
+            parts.append(added[name])
+        if removed is not None:
+            table = removed[name]
+            measures = [col for col in table.columns if col not in keys]
+            parts.append(table.assign(**{col: -table[col] for col in measures}))
+        merged[name] = canonical_counts(pd.concat(parts, ignore_index=True), keys)
+    return merged
+
+
+def route_table(counts, heights, min_attempts=5):
+    # Tasas de éxito por ruta y pico (rutas con al menos `min_attempts` intentos) con su
+    # intervalo de confianza (ci_low, ci_high)
+    rates = counts['routes'].copy()
+    rates['height'] = rates['PEAKID'].map(heights)
+    rates['success_rate'] = rates['successful_attempts'] / rates['total_attempts']
+    rates = rates[rates['total_attempts'] >= min_attempts]
+    return add_intervals(rates, 'successful_attempts', 'total_attempts')
+
+
+def country_tables(counts, top_n=10):
+    # Expediciones por país y año (solo los `top_n` países) y por país para cada pico
+    country_year = counts['country_year']
+    country_totals = country_year.groupby('HOST_FACTOR')['count'].sum()
+    top_countries = country_totals.sort_values(ascending=False, kind='stable').head(top_n).index
+    country_expeditions_top = country_year[country_year['HOST_FACTOR'].isin(top_countries)]
+
+    # Ordenada por pico (como la particiona PeakPartition, sin copiarla) y, dentro del pico, por expediciones
+    country_exped_by_peak = counts['country_peak'].sort_values(['PEAKID', 'count'], ascending=[True, False],
+                                                               kind='stable')
+    return country_expeditions_top, country_exped_by_peak
+
+
+def duration_tables(counts, min_total=3):
+    # Tasas de éxito por pico, temporada y bin de duración (al menos `min_total` expediciones)
+    duration_success = counts['duration'].copy()
+    duration_success['duration_bin'] = pd.Categorical(duration_success['duration_bin'],
+                                                      categories=DURATION_LABELS, ordered=True)
+    duration_success['success_rate'] = duration_success['success'] / duration_success['total']
+    duration_success = duration_success[duration_success['total'] >= min_total]
+
+    # Duración media por pico y resultado
+    duration_avg = counts['duration_avg'].astype({'ANY_SUCCESS': bool})
+    duration_avg['avg_duration'] = duration_avg['totdays_sum'] / duration_avg['count']
+    duration_avg = duration_avg[['PEAKID', 'PKNAME', 'ANY_SUCCESS', 'avg_duration', 'count']]
+
+    return duration_success, duration_avg
+
+
+def termination_table(counts, min_count=100, other_label='Other reasons'):
+    # Razones con al menos `min_count` expediciones; el resto pasa a "Other reasons"
+    reasons = counts['reasons']
+    common = reasons.loc[reasons['count'] >= min_count, 'TERMREASON_FACTOR']
+    term = counts['termination']
+    term = term.assign(reason_grouped=term['TERMREASON_FACTOR'].where(term['TERMREASON_FACTOR'].isin(common),
+                                                                      other_label))
+
+    # Expediciones por pico, año y razón agrupada (los períodos se forman al mostrarlas)
+    return term.groupby(['PEAKID', 'PKNAME', 'YEAR_INT', 'reason_grouped'])['count'].sum().reset_index()
+
+
+def termination_evolution(term_years, buckets):
+    # Distribución de razones por pico e intervalo de `buckets`, y porcentaje dentro de cada
+    # pico e intervalo (con su intervalo de confianza, también en porcentaje); el intervalo de
+    # tiempo queda como código entero en 'period'
+    term = term_years.assign(period=buckets.codes(term_years['YEAR_INT']))
+    term = term[term['period'] >= 0]
+    term_evolution = term.groupby(['PEAKID', 'PKNAME', 'period', 'reason_grouped'])['count'].sum().reset_index()
+    term_evolution = term_evolution.merge(
+        term_evolution.groupby(['PEAKID', 'period'])['count'].sum().reset_index(name='total'),
+        on=['PEAKID', 'period']
+    )
+    term_evolution['percentage'] = term_evolution['count'] / term_evolution['total'] * 100
+    return add_intervals(term_evolution, 'count', 'total', scale=100)
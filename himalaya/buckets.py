@@ -0,0 +1,122 @@
+# Intervalos de años (buckets) con códigos enteros y bins de duración configurables.
+#
+# Un TimeBuckets se define por sus límites: el intervalo i contiene los años de edges[i] a
+# edges[i + 1] - 1. codes() da a cada año el número de su intervalo (un entero pequeño, -1
+# fuera de rango), de modo que las tablas se agregan por códigos enteros y cambiar el ancho
+# solo vuelve a calcular los códigos a partir de YEAR_INT, sin cadenas por fila. Las etiquetas
+# ('1990s', '1995-1999', '2003') solo se generan para los ejes de los gráficos, con label().
+#
+# DurationBins son los bins de TOTDAYS de la pestaña de duración; los recuentos por bin salen
+# de peak_index.DurationIndex, así que cambiar el binning no recorre las expediciones.
+import re
+
+import numpy as np
+
+from himalaya.cube import DURATION_BINS
+
+# Anchos predefinidos del selector de la barra lateral (años por intervalo)
+BUCKET_WIDTHS = {'1 year': 1, '5 years': 5, '10 years': 10}
+DURATION_WIDTHS = {'5 days': 5, '10 days': 10, '15 days': 15, '30 days': 30}
+
+
+class TimeBuckets:
+
+    def __init__(self, edges):
+        edges = np.unique(np.asarray(edges, dtype='int64'))
+        if len(edges) < 2:
+            raise ValueError("time buckets need at least two edges")
+        self.edges = edges
+        # Clave hashable para las cachés de gráficos
+        self.key = tuple(edges.tolist())
+
+    @classmethod
+    def fixed(cls, width, first_year, last_year):
+        # Intervalos de `width` años alineados con los múltiplos de `width` (décadas, quinquenios)
+        start = first_year // width * width
+        stop = last_year // width * width + width
+        return cls(np.arange(start, stop + 1, width))
+
+    @classmethod
+    def custom(cls, cuts, first_year, last_year):
+        # Un intervalo desde first_year y otro desde cada año de corte dentro del rango
+        inner = [cut for cut in cuts if first_year < cut <= last_year]
+        return cls([first_year, *inner, last_year + 1])
+
+    def __len__(self):
+        return len(self.edges) - 1
+
+    def codes(self, years):
+        # Número de intervalo de cada año (int16; -1 si queda fuera de los límites)
+        years = np.asarray(years)
+        codes = np.searchsorted(self.edges, years, side='right') - 1
+        codes[(years < self.edges[0]) | (years >= self.edges[-1])] = -1
+        return codes.astype('int16')
+
+    def _is_decades(self):
+        return bool(np.all(np.diff(self.edges) == 10) and np.all(self.edges % 10 == 0))
+
+    def labels(self):
+        # Etiqueta de cada intervalo: '1990s' para décadas, '2003' para un solo año y, si no,
+        # 'primer año-último año'
+        starts, ends = self.edges[:-1], self.edges[1:] - 1
+        if self._is_decades():
+            return [f'{start}s' for start in starts]
+        return [str(start) if start == end else f'{start}-{end}' for start, end in zip(starts, ends)]
+
+    @property
+    def title(self):
+        # Título del eje para los gráficos
+        if self._is_decades():
+            return 'Decade'
+        if np.all(np.diff(self.edges) == 1):
+            return 'Year'
+        return 'Time Period'
+
+    def label(self, table, column, name=None):
+        # Sustituir los códigos de `column` por sus etiquetas (en la columna `name`)
+        labels = np.array(self.labels(), dtype=object)
+        table = table.assign(**{column: labels[table[column].to_numpy()]})
+        return table.rename(columns={column: name}) if name else table
+
+
+class DurationBins:
+    # Bins [edges[i], edges[i + 1]) de TOTDAYS, en días. El último bin se etiqueta 'inicio+': con
+    # open_end las duraciones de edges[-1] días o más también caen en él (como en el histograma
+    # automático). Los bins por defecto conservan el corte de la aplicación original: sin
+    # open_end, las duraciones de DURATION_BINS[-1] días o más quedan fuera
+
+    def __init__(self, edges, open_end=True):
+        edges = np.unique(np.asarray(edges, dtype='int64'))
+        if len(edges) < 2:
+            raise ValueError("duration bins need at least two edges")
+        self.edges = edges
+        self.open_end = open_end
+        self.key = (tuple(edges.tolist()), open_end)
+
+    @classmethod
+    def default(cls):
+        return cls(DURATION_BINS, open_end=False)
+
+    @classmethod
+    def fixed(cls, width):
+        return cls(np.append(np.arange(0, DURATION_BINS[-1], width), DURATION_BINS[-1]))
+
+    @classmethod
+    def custom(cls, cuts):
+        return cls([0, *[cut for cut in cuts if 0 < cut < DURATION_BINS[-1]], DURATION_BINS[-1]])
+
+    def __len__(self):
+        return len(self.edges) - 1
+
+    def labels(self):
+        # '1-15', '16-30', ... y el último 'inicio+' ('90+')
+        starts, ends = self.edges[:-1], self.edges[1:]
+        labels = [f'{start + 1}-{end}' for start, end in zip(starts, ends)]
+        labels[-1] = f'{starts[-1]}+'
+        return labels
+
+
+def parse_edges(text, digits=4):
+    # Cortes escritos por el usuario ("1960, 1980, 2000" o, con digits=None, "7, 14, 30")
+    pattern = r'\d+' if digits is None else rf'\d{{{digits}}}'
+    return sorted({int(value) for value in re.findall(pattern, text)})
@@ -0,0 +1,56 @@
+# Construcción sin interfaz del paquete precalculado que sirve la aplicación (HIMALAYA_BUNDLE).
+#
+# Ejecuta una vez el pipeline completo (load_data, process_data y todas las etapas de
+# himalaya.stages) y escribe una versión nueva del paquete con himalaya.bundle.
+#
+# Uso:
+#   python -m himalaya.build [--data-dir input_data] [--out bundles] [--workers N] [--format arrow]
+import argparse
+import logging
+import time
+
+from himalaya.bundle import TABLE_FORMATS, write_bundle
+from himalaya.pipeline import DATA_DIR, PIPELINE_VERSION, load_data, process_data
+from himalaya.precompute import PRECOMPUTE_WORKERS, log_timings, run_stages
+from himalaya.snapshot import input_fingerprint
+from himalaya.stages import STAGE_FUNCTIONS, STAGE_INPUTS, peak_heights
+
+logger = logging.getLogger(__name__)
+
+
+def build(data_dir=DATA_DIR, out_dir='bundles', workers=PRECOMPUTE_WORKERS, table_format='arrow'):
+    # Devuelve el nombre de la versión escrita en `out_dir`
+    started = time.perf_counter()
+    raw = load_data(data_dir)
+    df_merged, top_peaks = process_data(*raw)
+    _, peaks_df, coords_df = raw
+
+    stages = {name: (STAGE_FUNCTIONS[name], needs) for name, needs in STAGE_INPUTS.items()}
+    inputs = {'df_merged': df_merged, 'peak_heights': peak_heights(peaks_df), 'top_peaks': top_peaks,
+              'peaks_df': peaks_df, 'coords_df': coords_df}
+    stages_started = time.perf_counter()
+    prepared, timings = run_stages(stages, inputs, workers)
+    log_timings(timings, (time.perf_counter() - stages_started) * 1000)
+
+    version = write_bundle(out_dir, prepared, df_merged, top_peaks, peaks_df, coords_df,
+                           input_fingerprint(data_dir), PIPELINE_VERSION, table_format)
+    logger.info("bundle %s: %d expeditions in %.1f s", version, len(df_merged), time.perf_counter() - started)
+    return version
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the precomputed data bundle served with HIMALAYA_BUNDLE")
+    parser.add_argument('--data-dir', default=DATA_DIR)
+    parser.add_argument('--out', default='bundles')
+    parser.add_argument('--workers', type=int, default=PRECOMPUTE_WORKERS)
+    parser.add_argument('--format', choices=TABLE_FORMATS, default='arrow',
+                        help="arrow: memory-mapped Arrow IPC tables shared by every worker process; parquet: smaller files")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    version = build(args.data_dir, args.out, args.workers, args.format)
+    print(f'{args.out}/{version}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,198 @@
+# Paquete precalculado con todas las tablas de la aplicación (generado con `python -m himalaya.build`).
+#
+# Cada versión es un directorio <raíz>/<versión>/ con una tabla por cada resultado de las
+# etapas de himalaya.stages, el dataset combinado, picos y coordenadas, y un manifest.json
+# con la versión del formato y del pipeline, la huella de los CSV de entrada, los tipos
+# categóricos de cada tabla y qué tablas forman cada etapa. El archivo LATEST de la raíz
+# indica la última versión publicada. Este módulo no importa el pipeline de los CSV: la
+# aplicación en modo "solo servir" (HIMALAYA_BUNDLE) solo lee el paquete.
+#
+# Desde el formato 2 las tablas se guardan en Arrow IPC (un solo lote, sin comprimir) y los
+# arrays de las sumas por año en .npy. Ambos se abren proyectados en memoria y de solo lectura:
+# las columnas numéricas pasan a pandas sin copiarse, así que todos los procesos que sirven
+# la misma versión en un nodo comparten una sola copia física en la caché del sistema operativo.
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from himalaya.intervals import INTERVAL_METHOD
+from himalaya.peak_index import DurationIndex, YearPrefixSums
+from himalaya.stages import peak_locations, peak_partitions
+
+# Raíz o directorio de versión del paquete que sirve la aplicación (vacío: calcular desde los CSV)
+BUNDLE_DIR = os.environ.get('HIMALAYA_BUNDLE', '')
+
+# 1: tablas Parquet; 2: tablas Arrow IPC o Parquet y sumas por año en .npy; 3: tablas de países
+# y de terminación por año (los intervalos de tiempo se forman al mostrarlas); 4: tasas por ruta
+# con intervalo de confianza (ci_low, ci_high) del método indicado en 'intervals'
+BUNDLE_FORMAT = 4
+READABLE_FORMATS = (4,)
+TABLE_FORMATS = ('arrow', 'parquet')
+MANIFEST_FILE = 'manifest.json'
+LATEST_FILE = 'LATEST'
+
+# Tablas de cada etapa guardada en el paquete (las etapas con varios resultados guardan una
+# tabla por resultado). Las particiones por pico y la rejilla espacial se reconstruyen al cargar;
+# las sumas por año y el índice de duraciones se guardan como arrays .npy.
+BUNDLE_STAGES = {
+    'expedition_cube': ['expedition_cube'],
+    'route_success_data': ['route_success_data'],
+    'country_data': ['country_expeditions_top', 'country_exped_by_peak'],
+    'duration_data': ['duration_success', 'duration_avg'],
+    'termination_data': ['termination_data'],
+    'route_comparison': ['route_comparison'],
+    'duration_comparison': ['duration_comparison'],
+    'termination_comparison': ['termination_comparison'],
+}
+
+
+def _categories(df):
+    # Categorías de cada columna categórica (Parquet no conserva las que no tienen valores)
+    return {col: {'categories': df[col].cat.categories.tolist(), 'ordered': bool(df[col].cat.ordered)}
+            for col in df.columns if isinstance(df[col].dtype, pd.CategoricalDtype)}
+
+
+def _write_arrow(df, path):
+    # Un solo lote sin comprimir, para que las columnas se puedan leer sin copiarlas. Los NaN de
+    # las columnas float se guardan como valores y no como nulos (los nulos obligan a copiar) y
+    # el texto con offsets de 64 bits, los del tipo str de pandas
+    table = pa.Table.from_pandas(df)
+    for col in df.columns:
+        index = table.schema.get_field_index(str(col))
+        if pd.api.types.is_float_dtype(df[col].dtype):
+            table = table.set_column(index, table.field(index), pa.array(df[col].to_numpy(), from_pandas=False))
+        elif table.field(index).type == pa.string():
+            table = table.set_column(index, table.field(index).with_type(pa.large_string()),
+                                     table.column(index).cast(pa.large_string()))
+    table = table.combine_chunks()
+    with pa.OSFile(path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+
+
+def _write_table(table, directory, name, table_format):
+    if table_format == 'arrow':
+        file = f'{name}.arrow'
+        _write_arrow(table, os.path.join(directory, file))
+    else:
+        file = f'{name}.parquet'
+        table.to_parquet(os.path.join(directory, file))
+    return {'file': file, 'rows': len(table), 'columns': list(map(str, table.columns)),
+            'categories': _categories(table)}
+
+
+def _write_arrays(index, directory, name):
+    # Arrays de un YearPrefixSums o DurationIndex en .npy (se abren con mmap_mode='r') y tramos
+    # de cada grupo
+    arrays = {}
+    for array_name, values in index.to_arrays().items():
+        arrays[array_name] = f'{name}.{array_name}.npy'
+        np.save(os.path.join(directory, arrays[array_name]), values)
+    return {'arrays': arrays, 'slices': index.slices}
+
+
+def write_bundle(root, prepared, df_merged, top_peaks, peaks_df, coords_df, input_fingerprint,
+                 pipeline_version, table_format='arrow'):
+    # Escribe una versión nueva en `root`, actualiza LATEST y devuelve el nombre de la versión
+    if table_format not in TABLE_FORMATS:
+        raise ValueError(f"unknown table format {table_format!r} (expected one of {TABLE_FORMATS})")
+    version = f"{time.strftime('%Y%m%d-%H%M%S')}-{input_fingerprint[:12]}"
+    tables = {'df_merged': df_merged, 'peaks_df': peaks_df, 'coords_df': coords_df}
+    for stage, names in BUNDLE_STAGES.items():
+        results = prepared[stage] if len(names) > 1 else (prepared[stage],)
+        tables.update(zip(names, results))
+
+    # Directorio temporal que se renombra al final: nunca se sirve un paquete a medio escribir
+    os.makedirs(root, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix=f'.{version}-', dir=root)
+    os.chmod(tmp_dir, 0o755)
+    manifest = {
+        'format': BUNDLE_FORMAT,
+        'version': version,
+        'pipeline_version': pipeline_version,
+        'input_fingerprint': input_fingerprint,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'top_peaks': top_peaks,
+        'intervals': INTERVAL_METHOD,
+        'stages': BUNDLE_STAGES,
+        'tables': {},
+        'year_prefix_sums': [],
+    }
+    try:
+        for name, table in tables.items():
+            manifest['tables'][name] = _write_table(table, tmp_dir, name, table_format)
+        for name, sums in zip(('peak_years', 'all_years'), prepared['year_prefix_sums']):
+            manifest['year_prefix_sums'].append(_write_arrays(sums, tmp_dir, name))
+        manifest['duration_index'] = _write_arrays(prepared['duration_index'], tmp_dir, 'duration_index')
+        with open(os.path.join(tmp_dir, MANIFEST_FILE), 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_dir, os.path.join(root, version))
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    latest_tmp = os.path.join(root, f'.{LATEST_FILE}-{version}')
+    with open(latest_tmp, 'w') as f:
+        f.write(version + '\n')
+    os.replace(latest_tmp, os.path.join(root, LATEST_FILE))
+    return version
+
+
+def resolve_bundle(path=BUNDLE_DIR):
+    # Directorio de versión: `path` si contiene un manifiesto, si no la versión de <path>/LATEST
+    if os.path.exists(os.path.join(path, MANIFEST_FILE)):
+        return path
+    latest = os.path.join(path, LATEST_FILE)
+    if not os.path.exists(latest):
+        raise FileNotFoundError(f"{path} is not a data bundle (no {MANIFEST_FILE} or {LATEST_FILE}); "
+                                "build one with `python -m himalaya.build`")
+    with open(latest) as f:
+        return os.path.join(path, f.read().strip())
+
+
+def _read_table(version_dir, info):
+    path = os.path.join(version_dir, info['file'])
+    if path.endswith('.arrow'):
+        # Proyección en memoria de solo lectura (Arrow conserva las categorías de cada columna)
+        return pa.ipc.open_file(pa.memory_map(path)).read_all().to_pandas(split_blocks=True)
+    table = pd.read_parquet(path)
+    for col, dtype in info['categories'].items():
+        table[col] = pd.Categorical(table[col], categories=dtype['categories'], ordered=dtype['ordered'])
+    return table
+
+
+def _read_arrays(cls, version_dir, info):
+    arrays = {name: np.asarray(np.load(os.path.join(version_dir, file), mmap_mode='r'))
+              for name, file in info['arrays'].items()}
+    return cls.from_arrays(arrays, info['slices'])
+
+
+def load_bundle(version_dir):
+    # Devuelve (manifest, prepared, df_merged, peaks_df, coords_df); `prepared` tiene las mismas
+    # claves que el resultado de run_stages (salvo aggregate_counts, que la aplicación no usa)
+    with open(os.path.join(version_dir, MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+    if manifest['format'] not in READABLE_FORMATS:
+        raise ValueError(f"bundle format {manifest['format']} is not supported (expected one of {READABLE_FORMATS})")
+
+    tables = {name: _read_table(version_dir, info) for name, info in manifest['tables'].items()}
+
+    prepared = {}
+    for stage, names in manifest['stages'].items():
+        results = tuple(tables[name] for name in names)
+        prepared[stage] = results if len(results) > 1 else results[0]
+    prepared['peak_partitions'] = peak_partitions(tables['df_merged'], prepared['route_success_data'],
+                                                  prepared['country_data'], prepared['duration_data'],
+                                                  prepared['termination_data'])
+    # Los formatos de READABLE_FORMATS siempre guardan las sumas por año y el índice de duraciones
+    prepared['year_prefix_sums'] = tuple(_read_arrays(YearPrefixSums, version_dir, info)
+                                         for info in manifest['year_prefix_sums'])
+    prepared['duration_index'] = _read_arrays(DurationIndex, version_dir, manifest['duration_index'])
+    # La rejilla espacial se construye en milisegundos a partir de las coordenadas
+    prepared['peak_locations'] = peak_locations(tables['coords_df'], tables['peaks_df'])
+    return manifest, prepared, tables['df_merged'], tables['peaks_df'], tables['coords_df']
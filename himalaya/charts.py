@@ -0,0 +1,183 @@
+# Agregación en el servidor y medición del tamaño de las especificaciones Vega-Lite.
+#
+# En modo "aggregated" (por defecto) cada gráfico recibe solo filas ya agregadas en Python:
+# los histogramas se calculan aquí en lugar de dejar que Vega agrupe en el navegador las
+# expediciones individuales, y de cada conjunto de datos embebido se eliminan las columnas
+# que la especificación no usa. El modo "raw" conserva el comportamiento original.
+import json
+import logging
+import math
+import os
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+RENDER_MODE = os.environ.get('HIMALAYA_RENDER_MODE', 'aggregated')
+
+# Límite de tamaño (bytes de JSON) de la especificación de cada gráfico
+MAX_SPEC_BYTES = int(os.environ.get('HIMALAYA_MAX_SPEC_BYTES', 500_000))
+
+
+def parse_spec_limits(text):
+    # Límites por gráfico con el formato "nombre=bytes,nombre=bytes"
+    limits = {}
+    for item in filter(None, (part.strip() for part in text.split(','))):
+        name, _, value = item.partition('=')
+        limits[name.strip()] = int(value)
+    return limits
+
+
+# Límites de los gráficos que más crecen con el archivo: el mapa lleva un punto por pico y la
+# evolución de las causas de fin y la duración una fila por año o bin y categoría.
+# HIMALAYA_CHART_SPEC_LIMITS los sustituye o añade otros
+CHART_SPEC_LIMITS = {
+    'peaks_map': 2_000_000,
+    'duration_line': 100_000,
+    'termination_area': 250_000,
+    'termination_line': 250_000,
+    **parse_spec_limits(os.environ.get('HIMALAYA_CHART_SPEC_LIMITS', '')),
+}
+
+# Número máximo de especificaciones serializadas que se conservan en memoria
+CHART_CACHE_SIZE = int(os.environ.get('HIMALAYA_CHART_CACHE_SIZE', 256))
+
+
+def nice_bin_edges(values, maxbins=30):
+    # Bordes de bins "redondos" (pasos 1, 2 o 5 x 10^k) con la misma regla que bin de Vega
+    values = np.asarray(values, dtype=np.float64)
+    values = values[~np.isnan(values)]
+    if len(values) == 0:
+        return np.array([0.0, 1.0])
+    lo, hi = values.min(), values.max()
+    span = hi - lo if hi > lo else 1.0
+
+    level = math.ceil(math.log10(maxbins))
+    step = 10.0 ** (round(math.log10(span)) - level)
+    while math.ceil(span / step) > maxbins:
+        step *= 10
+    for divisor in (5, 2):
+        candidate = step / divisor
+        if span / candidate <= maxbins:
+            step = candidate
+
+    start = math.floor(lo / step) * step
+    stop = math.ceil(hi / step) * step
+    if stop <= start:
+        stop = start + step
+    # Como en Vega, el valor máximo cae en el último bin [stop - step, stop]
+    return np.arange(start, stop + step / 2, step)
+
+
+def binned_counts(df, value_column, group_column, maxbins=30):
+    # Histograma agregado: una fila por (bin, grupo) con bin_start, bin_end y count
+    edges = nice_bin_edges(df[value_column], maxbins)
+    bins = np.clip(np.searchsorted(edges, df[value_column].to_numpy(dtype=np.float64), side='right') - 1,
+                   0, len(edges) - 2)
+    counts = (pd.DataFrame({'bin': bins, group_column: df[group_column].to_numpy()})
+              .groupby(['bin', group_column], observed=True).size().reset_index(name='count'))
+    counts['bin_start'] = edges[counts['bin']]
+    counts['bin_end'] = edges[counts['bin'] + 1]
+    return counts.drop(columns='bin')
+
+
+def binned_rows(edges, totals, successes, group_column):
+    # Mismo formato que binned_counts a partir de los recuentos por bin (p. ej. de
+    # peak_index.DurationIndex): una fila por (bin, éxito) con expediciones
+    bins = np.repeat(np.arange(len(totals)), 2)
+    counts = pd.DataFrame({
+        'bin': bins,
+        group_column: np.tile([False, True], len(totals)),
+        'count': np.column_stack([totals - successes, successes]).ravel(),
+    })
+    counts = counts[counts['count'] > 0].reset_index(drop=True)
+    counts['bin_start'] = edges[counts['bin']]
+    counts['bin_end'] = edges[counts['bin'] + 1]
+    return counts.drop(columns='bin')
+
+
+def _referenced_fields(spec):
+    # Campos que puede usar la especificación: cualquier cadena fuera de los datos embebidos
+    # (field, groupby, sort, ...) y datum.X o datum['X'] en las expresiones de codificaciones,
+    # transformaciones, params y subgráficos (layer, concat, facet). Conservar de más solo
+    # cuesta bytes; quitar un campo usado cambia el gráfico
+    strings = set()
+
+    def walk(node):
+        if isinstance(node, dict):
+            for key, value in node.items():
+                if key != 'datasets':
+                    walk(value)
+        elif isinstance(node, list):
+            for item in node:
+                walk(item)
+        elif isinstance(node, str):
+            strings.add(node)
+
+    walk(spec)
+    fields = set(strings)
+    for text in strings:
+        fields.update(re.findall(r'datum\.(\w+)', text))
+        fields.update(re.findall(r"""datum\[['"]([^'"]+)['"]\]""", text))
+    return fields
+
+
+def trim_datasets(spec):
+    # Quitar de los datos embebidos las columnas que ningún canal utiliza
+    fields = _referenced_fields(spec)
+    for name, records in spec.get('datasets', {}).items():
+        spec['datasets'][name] = [{k: v for k, v in record.items() if k in fields} for record in records]
+    return spec
+
+
+def chart_spec(chart, mode=RENDER_MODE):
+    # Especificación final del gráfico serializada en JSON y su tamaño en bytes
+    spec = chart.to_dict()
+    if mode == 'aggregated':
+        spec = trim_datasets(spec)
+    text = json.dumps(spec, default=str)
+    return text, len(text)
+
+
+def spec_limit(name):
+    return CHART_SPEC_LIMITS.get(name, MAX_SPEC_BYTES)
+
+
+class ChartSpecCache:
+    # Caché LRU acotada de especificaciones ya serializadas (texto JSON y tamaño en bytes).
+    # La clave la forma quien llama con las entradas de las que depende cada gráfico, de modo
+    # que dos sesiones con los mismos filtros comparten la misma especificación.
+    def __init__(self, maxsize=CHART_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_build(self, key, build, mode=RENDER_MODE):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+
+        # Construir fuera del candado: otra sesión puede estar sirviendo otros gráficos
+        entry = chart_spec(build(), mode)
+
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return entry
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._entries),
+                    'bytes': sum(size for _, size in self._entries.values())}
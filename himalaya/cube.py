@@ -0,0 +1,80 @@
+# Cubo pre-agregado de expediciones.
+#
+# Cada celda del cubo es una combinación distinta de (pico, año, temporada, país, razón de
+# terminación, éxito, bin de duración) con sus medidas aditivas: número de expediciones,
+# éxitos y suma/cuenta de TOTDAYS. Los filtros de la barra lateral y los paneles se
+# resuelven cortando y agregando celdas, de modo que el coste de cada interacción depende
+# del número de celdas y no del número de expediciones.
+import pandas as pd
+
+DURATION_BINS = [0, 15, 30, 45, 60, 75, 90, 365]
+DURATION_LABELS = ['1-15', '16-30', '31-45', '46-60', '61-75', '76-90', '90+']
+
+# PKNAME depende funcionalmente de PEAKID: no añade celdas pero evita un merge por panel
+CUBE_DIMENSIONS = ['PEAKID', 'PKNAME', 'YEAR_INT', 'SEASON_FACTOR', 'HOST_FACTOR',
+                   'TERMREASON_FACTOR', 'ANY_SUCCESS', 'duration_bin']
+CUBE_MEASURES = ['expeditions', 'successes', 'totdays_sum', 'totdays_count']
+
+# Dimensión derivada del año: código entero del intervalo de tiempo (ver himalaya.buckets)
+BUCKET = 'bucket'
+
+
+def duration_bins(totdays):
+    # Mismos bins que prepare_duration_data (solo duraciones positivas)
+    return pd.cut(totdays.where(totdays > 0), bins=DURATION_BINS, labels=DURATION_LABELS, right=False)
+
+
+def build_cube(df_merged):
+    df = df_merged[['EXPID', 'TOTDAYS'] + CUBE_DIMENSIONS[:-1]].assign(
+        duration_bin=duration_bins(df_merged['TOTDAYS']),
+        TOTDAYS=df_merged['TOTDAYS'].astype('float64'),
+    )
+
+    # dropna=False conserva las celdas con razón, temporada o bin desconocidos
+    cube = df.groupby(CUBE_DIMENSIONS, observed=True, dropna=False).agg(
+        expeditions=('EXPID', 'count'),
+        successes=('ANY_SUCCESS', 'sum'),
+        totdays_sum=('TOTDAYS', 'sum'),
+        totdays_count=('TOTDAYS', 'count'),
+    ).reset_index()
+
+    return cube
+
+
+def slice_cube(cube, year_range=None, **filters):
+    # Seleccionar celdas por rango de años y por igualdad en otras dimensiones
+    mask = pd.Series(True, index=cube.index)
+    if year_range is not None:
+        mask &= cube['YEAR_INT'].between(year_range[0], year_range[1])
+    for column, value in filters.items():
+        mask &= cube[column] == value
+    return cube[mask]
+
+
+def with_rates(table):
+    table['success_rate'] = table['successes'] / table['expeditions']
+    table['avg_duration'] = table['totdays_sum'] / table['totdays_count'].where(table['totdays_count'] > 0)
+    return table
+
+
+def rollup(cells, by, buckets=None):
+    # Agregar las medidas de las celdas por las dimensiones `by`; si incluye BUCKET, las celdas
+    # se agrupan además por el código de su intervalo en `buckets`
+    if BUCKET in by:
+        codes = buckets.codes(cells['YEAR_INT'])
+        cells = cells.assign(**{BUCKET: codes})[codes >= 0]
+    table = cells.groupby(by, observed=True)[CUBE_MEASURES].sum().reset_index()
+    return with_rates(table)
+
+
+def totals(cells):
+    # Medidas totales de un conjunto de celdas (sin agrupar)
+    return with_rates(cells[CUBE_MEASURES].sum().to_frame().T).iloc[0]
+
+
+def group_reasons(cube, min_count=100, other_label='Other reasons'):
+    # Razones de terminación con al menos `min_count` expediciones; el resto pasa a "Other"
+    reason_counts = rollup(cube, ['TERMREASON_FACTOR'])
+    common = reason_counts.loc[reason_counts['expeditions'] >= min_count, 'TERMREASON_FACTOR']
+    reasons = cube['TERMREASON_FACTOR']
+    return reasons.astype(object).where(reasons.isin(common) | reasons.isna(), other_label)
@@ -0,0 +1,134 @@
+# Modo de diagnóstico: tiempos, memoria y aciertos de caché de cada ejecución.
+#
+# Se activa con HIMALAYA_DIAGNOSTICS=1 o con el parámetro ?diagnostics=1 en la URL. Para cada
+# ejecución se registran el tiempo y la variación de memoria residente (RSS) de cada etapa del
+# pipeline (carga de los CSV, process_data, instantánea, cada prepare_*), de cada pestaña y de
+# la serialización de los gráficos, junto con las llamadas, aciertos y fallos de cada función
+# en caché. En cada función en caché se separa el tiempo de cálculo (solo en los fallos) del
+# tiempo añadido por la caché (hash de los argumentos y (de)serialización del resultado).
+# Cada ejecución se añade como una línea JSON a HIMALAYA_DIAGNOSTICS_LOG.
+import contextlib
+import functools
+import json
+import os
+import resource
+import threading
+import time
+
+DIAGNOSTICS = os.environ.get('HIMALAYA_DIAGNOSTICS', '').lower() in ('1', 'true', 'yes')
+DIAGNOSTICS_LOG = os.environ.get('HIMALAYA_DIAGNOSTICS_LOG', os.path.join('.cache', 'diagnostics.jsonl'))
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def rss_mb():
+    # Memoria residente actual; donde no hay /proc, la máxima del proceso
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE / 2**20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class CacheCounters:
+    # Contadores por función en caché, para el proceso y para cada ámbito (p. ej. cada sesión)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.totals = {}
+        self.scopes = {}
+
+    def _add(self, scope, name, **values):
+        with self._lock:
+            for table in (self.totals, self.scopes.setdefault(scope, {})):
+                entry = table.setdefault(name, {'calls': 0, 'misses': 0, 'compute_ms': 0.0, 'total_ms': 0.0})
+                for key, value in values.items():
+                    entry[key] += value
+
+    def track(self, cache, scope=lambda: None):
+        # Decorador equivalente a `cache` (p. ej. st.cache_data) que cuenta las llamadas: la
+        # función solo se ejecuta en los fallos y el resto del tiempo lo añade la caché
+        def decorate(func):
+            name = func.__name__
+
+            @functools.wraps(func)
+            def compute(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self._add(scope(), name, misses=1, compute_ms=(time.perf_counter() - started) * 1000)
+
+            cached = cache(compute)
+
+            @functools.wraps(func)
+            def call(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return cached(*args, **kwargs)
+                finally:
+                    self._add(scope(), name, calls=1, total_ms=(time.perf_counter() - started) * 1000)
+
+            call.clear = cached.clear
+            return call
+        return decorate
+
+    def pop(self, scope):
+        # Contadores del ámbito desde la última llamada, con aciertos y tiempo de la caché
+        with self._lock:
+            counters = self.scopes.pop(scope, {})
+        return {name: summarize(entry) for name, entry in counters.items()}
+
+
+def summarize(entry):
+    return {
+        'calls': entry['calls'],
+        'hits': entry['calls'] - entry['misses'],
+        'misses': entry['misses'],
+        'compute_ms': round(entry['compute_ms'], 2),
+        'cache_ms': round(max(entry['total_ms'] - entry['compute_ms'], 0.0), 2),
+    }
+
+
+class Profiler:
+    # Mediciones de una ejecución: cada medición es (tipo, nombre, ms, MB de RSS al terminar, variación)
+
+    def __init__(self, enabled=DIAGNOSTICS):
+        self.enabled = enabled
+        self.records = []
+
+    @contextlib.contextmanager
+    def measure(self, kind, name):
+        if not self.enabled:
+            yield
+            return
+        before, started = rss_mb(), time.perf_counter()
+        try:
+            yield
+        finally:
+            after = rss_mb()
+            self.records.append({'kind': kind, 'name': name,
+                                 'ms': round((time.perf_counter() - started) * 1000, 2),
+                                 'rss_mb': round(after, 1), 'rss_delta_mb': round(after - before, 1)})
+
+    def measured(self, kind, name, func):
+        # `func` con sus llamadas medidas (p. ej. para las etapas que se ejecutan en otros hilos)
+        @functools.wraps(func)
+        def run(*args, **kwargs):
+            with self.measure(kind, name):
+                return func(*args, **kwargs)
+        return run
+
+    def stage(self, name):
+        return self.measure('stage', name)
+
+    def total(self, kind):
+        return sum(record['ms'] for record in self.records if record['kind'] == kind)
+
+
+def append_log(record, path=DIAGNOSTICS_LOG):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'a') as f:
+        f.write(json.dumps(record, default=str) + '\n')
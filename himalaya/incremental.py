@@ -0,0 +1,132 @@
+# Ingesta incremental de expediciones nuevas o modificadas.
+#
+# Cada temporada se añaden filas a exped_tidy.csv. En lugar de repetir process_data y los
+# agregados sobre todo el dataset, un lote de filas (identificadas por EXPID) se limpia y se
+# une con picos y coordenadas por separado y sustituye en df_merged a las versiones anteriores
+# de esos EXPID. df_merged ya está ordenado por (PEAKID, YEAR_INT, EXPID): las filas del lote
+# se ordenan entre sí y se insertan en su posición (un searchsorted dentro del tramo de su
+# pico), sin volver a ordenar ni a codificar todo el dataset. Las tablas de conteos se
+# actualizan restando los conteos de las filas antiguas y sumando los de las nuevas, y las
+# sumas por año y la partición de expediciones solo se recalculan para los picos que cambian.
+# El resultado es idéntico a reconstruirlo todo (ver tests/test_incremental.py).
+#
+# snapshot.load_or_build usa merge_batch cuando exped_tidy.csv solo ha crecido por el final.
+import io
+
+import numpy as np
+import pandas as pd
+
+from himalaya.aggregates import count_tables, merge_counts
+from himalaya.pipeline import clean_expeditions, popular_peaks, read_csv
+from himalaya.schema import DOWNCAST_COLUMNS, EXPED_DTYPES, compact, downcast
+
+# Columnas por las que está ordenado df_merged (ver pipeline.finish_merged)
+SORT_COLUMNS = ['PEAKID', 'YEAR_INT', 'EXPID']
+
+
+def load_batch(path):
+    # Lote de filas con el mismo formato que exped_tidy.csv
+    return read_csv(path, EXPED_DTYPES)
+
+
+def parse_batch(header, data):
+    # Lote a partir de la cabecera y de las líneas (bytes) añadidas al final de exped_tidy.csv
+    return read_csv(io.BytesIO(header + data), EXPED_DTYPES)
+
+
+def align_categories(df, new_rows):
+    # Dar a las columnas categóricas de ambos frames la unión (ordenada) de sus categorías; el
+    # frame grande solo se vuelve a codificar si el lote trae categorías nuevas
+    df_updates, new_updates = {}, {}
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            categories = df[col].cat.categories
+            extra = set(new_rows[col].dropna().unique()) - set(categories)
+            if extra:
+                categories = sorted(set(categories) | extra)
+                df_updates[col] = df[col].cat.set_categories(categories)
+            new_updates[col] = pd.Categorical(new_rows[col], categories=categories)
+    return df.assign(**df_updates), new_rows.assign(**new_updates)
+
+
+def drop_unused_categories(df):
+    # Como compact(): solo las categorías presentes (las de las filas sustituidas pueden sobrar)
+    updates = {}
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            codes = df[col].cat.codes.to_numpy()
+            used = np.bincount(codes[codes >= 0], minlength=len(df[col].cat.categories))
+            if not used.all():
+                updates[col] = df[col].cat.remove_unused_categories()
+    return df.assign(**updates) if updates else df
+
+
+def insert_positions(kept, new_rows):
+    # Posición de cada fila de `new_rows` (ordenadas por SORT_COLUMNS) en `kept`: dentro del
+    # tramo de su pico, primero por año y, dentro del año, por EXPID
+    peak_codes = kept['PEAKID'].cat.codes.to_numpy()
+    years = kept['YEAR_INT'].to_numpy()
+    expids = kept['EXPID']
+    new_codes = new_rows['PEAKID'].cat.codes.to_numpy()
+    new_years = new_rows['YEAR_INT'].to_numpy()
+    new_expids = new_rows['EXPID'].to_numpy()
+
+    positions = np.empty(len(new_rows), dtype=np.int64)
+    for code in np.unique(new_codes):
+        start, stop = np.searchsorted(peak_codes, [code, code + 1])
+        peak_years = years[start:stop]
+        for row in np.flatnonzero(new_codes == code):
+            lo = start + np.searchsorted(peak_years, new_years[row], side='left')
+            hi = start + np.searchsorted(peak_years, new_years[row], side='right')
+            # A igual clave, después de las filas existentes (como el orden estable)
+            year_expids = expids.iloc[lo:hi].to_numpy()
+            positions[row] = lo + np.searchsorted(year_expids, new_expids[row], side='right')
+    return positions
+
+
+def merge_batch(df_merged, exped_batch, peaks_df, coords_df):
+    # Devuelve (df_merged, top_peaks, filas sustituidas) con las filas de `exped_batch`
+    new_rows = compact(clean_expeditions(exped_batch, peaks_df, coords_df))
+
+    # Filas anteriores de los EXPID del lote (expediciones modificadas)
+    replaced = df_merged['EXPID'].isin(exped_batch['EXPID']).to_numpy()
+    old_rows = df_merged[replaced]
+
+    kept, new_rows = align_categories(df_merged[~replaced] if replaced.any() else df_merged, new_rows)
+    new_rows = new_rows[kept.columns].sort_values(SORT_COLUMNS, kind='stable')
+
+    # Las filas del lote se intercalan en el orden de df_merged
+    positions = insert_positions(kept, new_rows)
+    order = np.insert(np.arange(len(kept)), positions, np.arange(len(kept), len(kept) + len(new_rows)))
+    merged = pd.concat([kept, new_rows], ignore_index=True).take(order).reset_index(drop=True)
+
+    # Categorías y tipos numéricos canónicos, como en una reconstrucción completa
+    merged = drop_unused_categories(merged)
+    merged = merged.assign(**{col: downcast(merged[col]) for col in DOWNCAST_COLUMNS if col in merged.columns})
+    return merged, popular_peaks(merged.groupby('PEAKID', observed=True).size()), old_rows
+
+
+def batch_changes(old_rows, new_rows):
+    # Picos y primer año afectados por un lote: los de sus filas y los de las sustituidas
+    rows = pd.concat([old_rows[['PEAKID', 'YEAR_INT']], new_rows[['PEAKID', 'YEAR_INT']]])
+    return sorted(set(rows['PEAKID'].astype(str))), int(rows['YEAR_INT'].min())
+
+
+def apply_batch(df_merged, counts, exped_batch, peaks_df, coords_df):
+    # Devuelve (df_merged, top_peaks, counts, cambios) actualizados con las filas de
+    # `exped_batch`; los cambios son los de batch_changes, para update_peak_indexes
+    merged, top_peaks, old_rows = merge_batch(df_merged, exped_batch, peaks_df, coords_df)
+
+    new_rows = merged[merged['EXPID'].isin(exped_batch['EXPID'])]
+    removed = count_tables(old_rows) if len(old_rows) else None
+    counts = merge_counts(counts, added=count_tables(new_rows), removed=removed)
+    return merged, top_peaks, counts, batch_changes(old_rows, new_rows)
+
+
+def update_peak_indexes(df_merged, year_prefix_sums, expeditions, changes):
+    # Sumas por año (por pico y de todas las expediciones) y partición de expediciones de
+    # `df_merged` recalculadas solo a partir del primer pico y del primer año que cambian
+    peaks, first_year = changes
+    peak_years, all_years = year_prefix_sums
+    return ((peak_years.replace_groups(df_merged, peaks), all_years.replace_years(df_merged, first_year)),
+            expeditions.replace_groups(df_merged, peaks))
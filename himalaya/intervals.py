@@ -0,0 +1,124 @@
+# Intervalos de confianza de las tasas de éxito (éxitos / intentos de cada grupo).
+#
+# Todas las funciones reciben los arrays de éxitos y de totales de todos los grupos a la vez y
+# devuelven dos arrays (límite inferior y superior, entre 0 y 1; NaN si el total es 0):
+#   - wilson: intervalo de Wilson en forma cerrada, unas pocas operaciones vectorizadas;
+#   - bootstrap: intervalo percentil de `resamples` remuestreos. Remuestrear con reemplazo los n
+#     intentos de un grupo con k éxitos es sacar una binomial(n, k/n), así que cada lote de
+#     grupos es una matriz (grupos x remuestreos) de binomiales y dos cuantiles por fila. Los
+#     grupos con los mismos éxitos y total se remuestrean una sola vez y los lotes grandes se
+#     reparten en un pool de procesos (HIMALAYA_BOOTSTRAP_WORKERS).
+# Cada lote tiene su propia semilla derivada de `seed`: el resultado no depende del número de
+# procesos y es el mismo en cada rerun.
+import atexit
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from statistics import NormalDist
+
+import numpy as np
+
+# Método de los intervalos de la aplicación: 'wilson' o 'bootstrap'
+INTERVAL_METHOD = os.environ.get('HIMALAYA_INTERVALS', 'wilson')
+INTERVAL_METHODS = ('wilson', 'bootstrap')
+CONFIDENCE = 0.95
+BOOTSTRAP_RESAMPLES = int(os.environ.get('HIMALAYA_BOOTSTRAP_RESAMPLES', 1000))
+# Procesos del bootstrap (1 = en el proceso que llama)
+BOOTSTRAP_WORKERS = int(os.environ.get('HIMALAYA_BOOTSTRAP_WORKERS', min(8, os.cpu_count() or 1)))
+# Celdas (grupos x remuestreos) de cada lote: acota la memoria de cada matriz
+BATCH_CELLS = 2_000_000
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _arrays(successes, totals):
+    return np.asarray(successes, dtype=np.float64), np.asarray(totals, dtype=np.float64)
+
+
+def wilson_interval(successes, totals, confidence=CONFIDENCE):
+    successes, totals = _arrays(successes, totals)
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        p = successes / totals
+        denominator = 1 + z ** 2 / totals
+        center = (p + z ** 2 / (2 * totals)) / denominator
+        half = z * np.sqrt(p * (1 - p) / totals + z ** 2 / (4 * totals ** 2)) / denominator
+    # Sin éxitos (o sin fracasos) el límite es exactamente 0 (o 1), sin errores de redondeo
+    low = np.where(successes == 0, 0.0, np.clip(center - half, 0, 1))
+    high = np.where(successes == totals, 1.0, np.clip(center + half, 0, 1))
+    return np.where(totals > 0, low, np.nan), np.where(totals > 0, high, np.nan)
+
+
+def _bootstrap_batch(successes, totals, resamples, confidence, seed):
+    # Límites percentiles de un lote de grupos (todos con total > 0)
+    rng = np.random.default_rng(seed)
+    totals = totals.astype(np.int64)
+    draws = rng.binomial(totals[:, None], (successes / totals)[:, None], size=(len(totals), resamples))
+    alpha = 1 - confidence
+    low, high = np.quantile(draws, [alpha / 2, 1 - alpha / 2], axis=1)
+    return low / totals, high / totals
+
+
+def _process_pool(workers):
+    # Pool compartido por todas las llamadas del proceso: los procesos se arrancan una sola vez
+    # ('spawn' porque el servidor de Streamlit usa hilos)
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'))
+            atexit.register(_shutdown_pool)
+        return _pool
+
+
+def _shutdown_pool():
+    # Al salir del proceso: parar los procesos del pool (se vuelve a crear si hace falta)
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True, cancel_futures=True)
+            _pool = None
+
+
+def bootstrap_interval(successes, totals, confidence=CONFIDENCE, resamples=BOOTSTRAP_RESAMPLES, seed=0,
+                       workers=BOOTSTRAP_WORKERS):
+    successes, totals = _arrays(successes, totals)
+    low = np.full(len(totals), np.nan)
+    high = np.full(len(totals), np.nan)
+    valid = np.flatnonzero(totals > 0)
+    if not len(valid):
+        return low, high
+
+    # Un remuestreo por par (éxitos, total) distinto
+    pairs, inverse = np.unique(np.stack([successes[valid], totals[valid]]), axis=1, return_inverse=True)
+    batch_size = max(BATCH_CELLS // resamples, 1)
+    starts = range(0, pairs.shape[1], batch_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(starts))
+    args = [(pairs[0, start:start + batch_size], pairs[1, start:start + batch_size], resamples, confidence,
+             batch_seed) for start, batch_seed in zip(starts, seeds)]
+    if workers <= 1 or len(args) == 1:
+        results = [_bootstrap_batch(*batch_args) for batch_args in args]
+    else:
+        results = _process_pool(workers).map(_bootstrap_batch, *zip(*args))
+    results = list(results)
+    pair_low = np.concatenate([batch_low for batch_low, _ in results])
+    pair_high = np.concatenate([batch_high for _, batch_high in results])
+    low[valid], high[valid] = pair_low[inverse.ravel()], pair_high[inverse.ravel()]
+    return low, high
+
+
+def success_interval(successes, totals, method=INTERVAL_METHOD, confidence=CONFIDENCE):
+    # Intervalo de confianza de cada tasa de éxito con el método configurado
+    if method == 'wilson':
+        return wilson_interval(successes, totals, confidence)
+    if method == 'bootstrap':
+        return bootstrap_interval(successes, totals, confidence)
+    raise ValueError(f"unknown interval method {method!r} (expected one of {INTERVAL_METHODS})")
+
+
+def add_intervals(table, successes, totals, scale=1, method=INTERVAL_METHOD):
+    # `table` con las columnas ci_low y ci_high (multiplicadas por `scale`, p. ej. 100 para
+    # porcentajes) calculadas a partir de sus columnas `successes` y `totals`
+    low, high = success_interval(table[successes].to_numpy(), table[totals].to_numpy(), method)
+    return table.assign(ci_low=low * scale, ci_high=high * scale)
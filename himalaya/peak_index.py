@@ -0,0 +1,300 @@
+# Índice particionado por pico.
+#
+# Cada tabla se ordena una sola vez por PEAKID (orden estable) y se guarda, para cada
+# pico, el rango contiguo de filas que le corresponde. Una consulta por pico es entonces
+# un corte iloc[start:stop], O(filas del pico), en lugar de comparar toda la tabla.
+import numpy as np
+import pandas as pd
+
+# Campos del pico que se muestran en la barra lateral y en el selector
+PEAK_RECORD_COLUMNS = ['PKNAME', 'HEIGHTM', 'REGION_FACTOR', 'HIMAL_FACTOR', 'LATITUDE', 'LONGITUDE']
+
+
+class PeakPartition:
+    def __init__(self, df, column='PEAKID'):
+        codes, peaks = pd.factorize(df[column], sort=True)
+
+        # Ordenar por código de pico (estable: conserva el orden original dentro de cada pico)
+        order = np.argsort(codes, kind='stable')
+        if np.array_equal(order, np.arange(len(order))):
+            self.frame = df.reset_index(drop=True)
+        else:
+            self.frame = df.take(order).reset_index(drop=True)
+
+        # Las filas sin pico (código -1) quedan al principio y no pertenecen a ninguna partición
+        counts = np.bincount(codes[codes >= 0], minlength=len(peaks))
+        stops = np.cumsum(counts) + np.count_nonzero(codes < 0)
+        starts = stops - counts
+        self.slices = {peak: (int(start), int(stop)) for peak, start, stop in zip(peaks, starts, stops)}
+
+    def replace_groups(self, df, peaks, column='PEAKID'):
+        # Partición de `df`, ya ordenado por `column` como df_merged, cuando solo han cambiado las
+        # filas de los picos `peaks`: los tramos de los picos anteriores se conservan y solo se
+        # factoriza el resto de la tabla
+        first = min(peaks)
+        partition = PeakPartition.__new__(PeakPartition)
+        partition.frame = df.reset_index(drop=True)
+        partition.slices = {peak: bounds for peak, bounds in self.slices.items() if peak < first}
+        start = max((stop for _, stop in partition.slices.values()), default=0)
+        codes, tail_peaks = pd.factorize(df[column].iloc[start:], sort=True)
+        stops = start + np.cumsum(np.bincount(codes, minlength=len(tail_peaks)))
+        starts = np.concatenate([[start], stops[:-1]])
+        partition.slices.update({peak: (int(lo), int(hi)) for peak, lo, hi in zip(tail_peaks, starts, stops)})
+        return partition
+
+    def __contains__(self, peak):
+        return peak in self.slices
+
+    def get(self, peak):
+        # Filas del pico (DataFrame vacío con las mismas columnas si no existe)
+        start, stop = self.slices.get(peak, (0, 0))
+        return self.frame.iloc[start:stop]
+
+
+def peak_records(df, column='PEAKID'):
+    # Metadatos de cada pico tomados de su primera fila: {PEAKID: {PKNAME: ..., HEIGHTM: ...}}
+    first_rows = df.drop_duplicates(column).set_index(column)
+    columns = [col for col in PEAK_RECORD_COLUMNS if col in first_rows.columns]
+    return first_rows[columns].to_dict('index')
+
+
+class YearPrefixSums:
+    # Sumas acumuladas por (pico, año) para consultas de rango de años en O(log n).
+    #
+    # Las expediciones se ordenan por (grupo, YEAR_INT) y se guardan los acumulados de
+    # éxitos y de TOTDAYS. Cualquier ventana de años de un grupo son dos searchsorted
+    # sobre los años del grupo y una resta de acumulados.
+    ALL = '__all__'
+    ARRAYS = ('years', 'cum_successes', 'cum_totdays', 'cum_totdays_count', 'run_starts')
+
+    def __init__(self, groups, years, successes, totdays):
+        codes, keys = pd.factorize(groups, sort=True)
+        years = np.asarray(years, dtype=np.int64)
+        order = np.lexsort((years, codes))
+        codes = codes[order]
+
+        self.years = years[order]
+        totdays = np.asarray(totdays, dtype=np.float64)[order]
+        has_days = ~np.isnan(totdays)
+
+        # Acumulados con un 0 inicial: la suma de [lo, hi) es cum[hi] - cum[lo]
+        self.cum_successes = np.concatenate(
+            [[0], np.cumsum(np.asarray(successes, dtype=bool)[order], dtype=np.int64)])
+        self.cum_totdays = np.concatenate([[0.0], np.cumsum(np.where(has_days, totdays, 0.0))])
+        self.cum_totdays_count = np.concatenate([[0], np.cumsum(has_days, dtype=np.int64)])
+
+        # Inicio de cada tramo (grupo, año) para las series anuales
+        changes = np.ones(len(codes), dtype=bool)
+        changes[1:] = (codes[1:] != codes[:-1]) | (self.years[1:] != self.years[:-1])
+        self.run_starts = np.flatnonzero(changes)
+
+        valid = codes >= 0
+        counts = np.bincount(codes[valid], minlength=len(keys))
+        stops = np.cumsum(counts) + np.count_nonzero(~valid)
+        self.slices = {key: (int(stop - count), int(stop)) for key, count, stop in zip(keys, counts, stops)}
+
+    @classmethod
+    def from_frame(cls, df, column='PEAKID'):
+        # column=None agrupa todas las expediciones bajo YearPrefixSums.ALL
+        groups = df[column] if column is not None else np.full(len(df), cls.ALL, dtype=object)
+        return cls(groups, df['YEAR_INT'], df['ANY_SUCCESS'], df['TOTDAYS'])
+
+    @classmethod
+    def from_arrays(cls, arrays, slices):
+        # Reconstruir a partir de los arrays de to_arrays() (p. ej. proyectados en memoria desde
+        # un paquete) y de los tramos de cada grupo, sin volver a ordenar ni acumular
+        sums = cls.__new__(cls)
+        for name in cls.ARRAYS:
+            setattr(sums, name, arrays[name])
+        sums.slices = {key: (int(start), int(stop)) for key, (start, stop) in slices.items()}
+        return sums
+
+    def to_arrays(self):
+        return {name: getattr(self, name) for name in self.ARRAYS}
+
+    def _splice(self, keep, years, successes, totdays, codes, slices):
+        # Copia con las `keep` primeras posiciones de estas sumas y las filas dadas a
+        # continuación. Los acumulados siguen desde cum[keep] (np.cumsum suma en orden, así que
+        # el resultado es idéntico a acumular desde cero)
+        sums = YearPrefixSums.__new__(YearPrefixSums)
+        years = np.asarray(years, dtype=np.int64)
+        totdays = np.asarray(totdays, dtype=np.float64)
+        has_days = ~np.isnan(totdays)
+        sums.years = np.concatenate([self.years[:keep], years])
+        sums.cum_successes = np.concatenate([self.cum_successes[:keep], np.cumsum(
+            np.concatenate([[self.cum_successes[keep]], np.asarray(successes, dtype=bool)]), dtype=np.int64)])
+        sums.cum_totdays = np.concatenate([self.cum_totdays[:keep], np.cumsum(
+            np.concatenate([[self.cum_totdays[keep]], np.where(has_days, totdays, 0.0)]))])
+        sums.cum_totdays_count = np.concatenate([self.cum_totdays_count[:keep], np.cumsum(
+            np.concatenate([[self.cum_totdays_count[keep]], has_days]), dtype=np.int64)])
+
+        # La primera fila nueva siempre empieza tramo: su grupo o su año difieren de la anterior
+        changes = np.ones(len(years), dtype=bool)
+        changes[1:] = (codes[1:] != codes[:-1]) | (years[1:] != years[:-1])
+        sums.run_starts = np.concatenate([self.run_starts[self.run_starts < keep], keep + np.flatnonzero(changes)])
+        sums.slices = slices
+        return sums
+
+    def replace_groups(self, df, keys, column='PEAKID'):
+        # Sumas de `df`, ordenado por (column, YEAR_INT) como df_merged, cuando solo han cambiado
+        # las filas de los grupos `keys`: se conservan los acumulados de los grupos anteriores y se
+        # acumula de nuevo desde ahí, sin ordenar ni factorizar todo el dataset
+        first = min(keys)
+        slices = {key: bounds for key, bounds in self.slices.items() if key < first}
+        keep = max((stop for _, stop in slices.values()), default=0)
+        tail = df.iloc[keep:]
+        codes, tail_keys = pd.factorize(tail[column], sort=True)
+        stops = keep + np.cumsum(np.bincount(codes, minlength=len(tail_keys)))
+        starts = np.concatenate([[keep], stops[:-1]])
+        slices.update({key: (int(start), int(stop)) for key, start, stop in zip(tail_keys, starts, stops)})
+        return self._splice(keep, tail['YEAR_INT'], tail['ANY_SUCCESS'], tail['TOTDAYS'], codes, slices)
+
+    def replace_years(self, df, first_year):
+        # Igual que replace_groups para las sumas de todas las expediciones (column=None) cuando
+        # solo han cambiado filas de `first_year` en adelante: solo se ordenan esas filas
+        keep = int(np.searchsorted(self.years, first_year, side='left'))
+        years = df['YEAR_INT'].to_numpy(dtype=np.int64)
+        rows = np.flatnonzero(years >= first_year)
+        rows = rows[np.argsort(years[rows], kind='stable')]
+        tail = df.take(rows)
+        return self._splice(keep, tail['YEAR_INT'], tail['ANY_SUCCESS'], tail['TOTDAYS'],
+                            np.zeros(len(rows), dtype=np.int64), {self.ALL: (0, len(df))})
+
+    def window(self, key, year_range):
+        # Posiciones [lo, hi) de las expediciones del grupo dentro del rango de años (inclusivo)
+        start, stop = self.slices.get(key, (0, 0))
+        years = self.years[start:stop]
+        lo = start + np.searchsorted(years, year_range[0], side='left')
+        hi = start + np.searchsorted(years, year_range[1], side='right')
+        return int(lo), int(hi)
+
+    def totals(self, key, year_range):
+        lo, hi = self.window(key, year_range)
+        expeditions = hi - lo
+        successes = int(self.cum_successes[hi] - self.cum_successes[lo])
+        days_count = int(self.cum_totdays_count[hi] - self.cum_totdays_count[lo])
+        days_sum = self.cum_totdays[hi] - self.cum_totdays[lo]
+        return {
+            'expeditions': expeditions,
+            'successes': successes,
+            'success_rate': successes / expeditions if expeditions > 0 else 0,
+            'avg_duration': days_sum / days_count if days_count > 0 else np.nan,
+        }
+
+    def yearly(self, key, year_range):
+        # Expediciones, éxitos y tasa de éxito por año dentro de la ventana
+        lo, hi = self.window(key, year_range)
+        first = np.searchsorted(self.run_starts, lo, side='left')
+        last = np.searchsorted(self.run_starts, hi, side='left')
+        bounds = np.append(self.run_starts[first:last], hi)
+
+        expeditions = np.diff(bounds)
+        successes = np.diff(self.cum_successes[bounds])
+        return pd.DataFrame({
+            'YEAR_INT': self.years[bounds[:-1]],
+            'expeditions': expeditions,
+            'successes': successes,
+            'success_rate': successes / expeditions,
+        })
+
+
+class DurationIndex:
+    # Duraciones ordenadas por (pico, temporada) con los éxitos alineados, para contar
+    # expediciones y éxitos con cualquier binning de TOTDAYS.
+    #
+    # Solo entran las duraciones positivas. Las expediciones se ordenan por (pico, temporada,
+    # TOTDAYS) y se guarda el acumulado de éxitos: las expediciones de cada bin de un tramo son
+    # la diferencia entre los searchsorted de sus bordes y los éxitos, una resta de acumulados.
+    # Los años van alineados para aplicar el filtro de rango de años.
+    ARRAYS = ('totdays', 'successes', 'years', 'cum_successes')
+
+    def __init__(self, peaks, seasons, totdays, successes, years):
+        totdays = np.asarray(totdays, dtype=np.float64)
+        valid = totdays > 0
+        peak_codes, peak_keys = pd.factorize(np.asarray(peaks, dtype=object)[valid], sort=True)
+        season_codes, season_keys = pd.factorize(np.asarray(seasons, dtype=object)[valid], sort=True)
+        totdays = totdays[valid]
+        order = np.lexsort((totdays, season_codes, peak_codes))
+        peak_codes, season_codes = peak_codes[order], season_codes[order]
+
+        self.totdays = totdays[order]
+        self.successes = np.asarray(successes, dtype=bool)[valid][order]
+        self.years = np.asarray(years, dtype=np.int64)[valid][order]
+        self.cum_successes = np.concatenate([[0], np.cumsum(self.successes, dtype=np.int64)])
+
+        # Tramos (temporada, inicio, fin) de cada pico; la temporada desconocida es None
+        changes = np.ones(len(order), dtype=bool)
+        changes[1:] = (peak_codes[1:] != peak_codes[:-1]) | (season_codes[1:] != season_codes[:-1])
+        starts = np.flatnonzero(changes)
+        stops = np.append(starts[1:], len(order))
+        self.slices = {}
+        for start, stop in zip(starts, stops):
+            code = season_codes[start]
+            season = season_keys[code] if code >= 0 else None
+            self.slices.setdefault(peak_keys[peak_codes[start]], []).append((season, int(start), int(stop)))
+
+    @classmethod
+    def from_frame(cls, df):
+        return cls(df['PEAKID'], df['SEASON_FACTOR'], df['TOTDAYS'], df['ANY_SUCCESS'], df['YEAR_INT'])
+
+    @classmethod
+    def from_arrays(cls, arrays, slices):
+        # Igual que YearPrefixSums.from_arrays
+        index = cls.__new__(cls)
+        for name in cls.ARRAYS:
+            setattr(index, name, arrays[name])
+        index.slices = {peak: [(season, int(start), int(stop)) for season, start, stop in runs]
+                        for peak, runs in slices.items()}
+        return index
+
+    def to_arrays(self):
+        return {name: getattr(self, name) for name in self.ARRAYS}
+
+    def runs(self, peak, season=None):
+        # Tramos del pico: todos (season=None) o solo los de una temporada
+        return [run for run in self.slices.get(peak, []) if season is None or run[0] == season]
+
+    def _window(self, start, stop, year_range):
+        # Duraciones ordenadas del tramo dentro del rango de años y acumulado de sus éxitos
+        # (con 0 inicial); sin rango se usa directamente el acumulado global
+        if year_range is None:
+            return self.totdays[start:stop], self.cum_successes, start
+        years = self.years[start:stop]
+        inside = (years >= year_range[0]) & (years <= year_range[1])
+        cum = np.concatenate([[0], np.cumsum(self.successes[start:stop][inside], dtype=np.int64)])
+        return self.totdays[start:stop][inside], cum, 0
+
+    def _counts(self, start, stop, edges, year_range, clip):
+        totdays, cum, offset = self._window(start, stop, year_range)
+        positions = np.searchsorted(totdays, edges, side='left')
+        if clip:
+            positions[0], positions[-1] = 0, len(totdays)
+        return np.diff(positions), np.diff(cum[positions + offset])
+
+    def histogram(self, peak, edges, season=None, year_range=None, clip=False):
+        # Expediciones y éxitos por bin [edges[i], edges[i + 1]), sumando los tramos de las
+        # temporadas seleccionadas; con clip, las duraciones fuera de los bordes van al primer o
+        # al último bin (como en charts.binned_counts)
+        edges = np.asarray(edges, dtype=np.float64)
+        totals = np.zeros(len(edges) - 1, dtype=np.int64)
+        successes = np.zeros(len(edges) - 1, dtype=np.int64)
+        for _, start, stop in self.runs(peak, season):
+            run_totals, run_successes = self._counts(start, stop, edges, year_range, clip)
+            totals += run_totals
+            successes += run_successes
+        return totals, successes
+
+    def by_season(self, peak, edges, season=None, clip=False):
+        # Expediciones y éxitos por (temporada conocida, bin): [(temporada, totales, éxitos)]
+        edges = np.asarray(edges, dtype=np.float64)
+        return [(run_season, *self._counts(start, stop, edges, None, clip))
+                for run_season, start, stop in self.runs(peak, season) if run_season is not None]
+
+    def extent(self, peak, season=None, year_range=None):
+        # Duración mínima y máxima del pico dentro de los filtros (None si no hay ninguna)
+        bounds = []
+        for _, start, stop in self.runs(peak, season):
+            totdays = self._window(start, stop, year_range)[0]
+            if len(totdays):
+                bounds.extend([totdays[0], totdays[-1]])
+        return (min(bounds), max(bounds)) if bounds else None
@@ -0,0 +1,133 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from himalaya.routes import ROUTE_COLUMNS, SUCCESS_COLUMNS
+from himalaya.schema import COORDS_DTYPES, EXPED_DTYPES, PEAKS_DTYPES, arrow_convert_options, compact, read_options
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    ARROW_CSV_AVAILABLE = True
+except ImportError:
+    ARROW_CSV_AVAILABLE = False
+
+# Directorio y ficheros de entrada del pipeline
+DATA_DIR = os.environ.get('HIMALAYA_DATA_DIR', "input_data")
+EXPED_FILE = "exped_tidy.csv"
+PEAKS_FILE = "peaks_tidy.csv"
+COORDS_FILE = "unique_peaks_coords.csv"
+
+# Versión del pipeline de procesamiento: incrementarla cada vez que cambie el resultado
+# de process_data para invalidar las instantáneas guardadas en disco
+PIPELINE_VERSION = 6
+
+# Lector de los CSV: 'arrow' (pyarrow.csv, multihilo) o 'pandas'; sin pyarrow se usa pandas
+CSV_READER = os.environ.get('HIMALAYA_CSV_READER', 'arrow')
+
+
+def input_paths(data_dir=DATA_DIR):
+    # Rutas para los archivos de datos
+    return (
+        os.path.join(data_dir, EXPED_FILE),
+        os.path.join(data_dir, PEAKS_FILE),
+        os.path.join(data_dir, COORDS_FILE),
+    )
+
+
+def read_csv(path, dtypes, reader=CSV_READER):
+    # Lee solo las columnas declaradas en el esquema, con sus tipos y valores nulos. Con pyarrow
+    # el fichero se convierte por bloques en varios hilos y las categóricas salen ya codificadas
+    if reader != 'arrow' or not ARROW_CSV_AVAILABLE:
+        return pd.read_csv(path, encoding='latin-1', **read_options(dtypes))
+    table = pa_csv.read_csv(
+        path,
+        read_options=pa_csv.ReadOptions(encoding='latin-1', use_threads=True),
+        # Algunos campos de texto entre comillas contienen saltos de línea
+        parse_options=pa_csv.ParseOptions(newlines_in_values=True),
+        convert_options=arrow_convert_options(dtypes),
+    )
+    df = table.to_pandas(types_mapper={pa.bool_(): pd.BooleanDtype()}.get)
+    # Mismo orden de categorías que pd.read_csv (ordenadas, no por aparición)
+    for col, dtype in dtypes.items():
+        if dtype == 'category':
+            df[col] = df[col].cat.reorder_categories(df[col].cat.categories.sort_values())
+    return df
+
+
+def load_dimensions(data_dir=DATA_DIR):
+    # Tablas pequeñas de picos y coordenadas
+    _, peaks_path, coords_path = input_paths(data_dir)
+    peaks_df = read_csv(peaks_path, PEAKS_DTYPES)
+    coords_df = read_csv(coords_path, COORDS_DTYPES)
+    return peaks_df, coords_df
+
+
+def load_data(data_dir=DATA_DIR):
+    exped_path, peaks_path, coords_path = input_paths(data_dir)
+
+    # Los tres ficheros se leen a la vez (pyarrow libera el GIL mientras convierte)
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        exped_df, peaks_df, coords_df = pool.map(
+            read_csv, [exped_path, peaks_path, coords_path], [EXPED_DTYPES, PEAKS_DTYPES, COORDS_DTYPES])
+
+    return exped_df, peaks_df, coords_df
+
+
+def clean_expeditions(exped_df, peaks_df, coords_df):
+    # Limpieza de expediciones y merge con picos y coordenadas; cada fila se trata por
+    # separado, así que puede aplicarse a un lote de filas nuevas (ver incremental.py)
+    df_clean = exped_df.copy()
+
+    # Unificar valores nulos para rutas
+    for col in ROUTE_COLUMNS:
+        df_clean[col] = df_clean[col].where(~df_clean[col].isin(['NA', '']))
+
+    # Convertir columnas de éxito en booleanas explícitas
+    for col in SUCCESS_COLUMNS:
+        df_clean[col] = df_clean[col].fillna(False).astype(bool)
+
+    # Asegurarse de que TOTDAYS sea numérico
+    df_clean['TOTDAYS'] = pd.to_numeric(df_clean['TOTDAYS'], errors='coerce')
+
+    # Crear año como entero para facilitar filtrado
+    df_clean['YEAR_INT'] = pd.to_numeric(df_clean['YEAR'], errors='coerce')
+
+    # Verificar que al menos tengamos PEAKID y YEAR en todos los registros
+    df_clean = df_clean.dropna(subset=['PEAKID', 'YEAR_INT'])
+
+    # Crear un indicador de éxito general para la expedición
+    df_clean['ANY_SUCCESS'] = df_clean[SUCCESS_COLUMNS].any(axis=1)
+
+    # Merge con datos de picos y coordenadas
+    df_merged = pd.merge(df_clean, peaks_df[['PEAKID', 'PKNAME', 'HEIGHTM', 'HIMAL_FACTOR', 'REGION_FACTOR']],
+                         on='PEAKID', how='left')
+    df_merged = pd.merge(df_merged, coords_df[['PEAKID', 'LATITUDE', 'LONGITUDE']], on='PEAKID', how='left')
+
+    # Las décadas y los períodos no se guardan por fila: se derivan de YEAR_INT como códigos
+    # enteros al agregar (ver himalaya.buckets)
+    return df_merged
+
+
+def finish_merged(df_merged):
+    # Tipos compactos: categóricas y numéricos reducidos
+    df_merged = compact(df_merged)
+
+    # Guardar ordenado por (PEAKID, YEAR_INT): las filas de cada pico quedan contiguas y en
+    # orden cronológico, lo que permite consultas por pico y rango de años sin recorrer todo.
+    # EXPID desempata, así el orden no depende del orden en que llegaron las filas
+    df_merged = df_merged.sort_values(['PEAKID', 'YEAR_INT', 'EXPID'], kind='stable').reset_index(drop=True)
+
+    return df_merged, popular_peaks(df_merged.groupby('PEAKID', observed=True).size())
+
+
+def popular_peaks(peak_counts, min_expeditions=30):
+    # Picos más populares (al menos 30 expediciones), de más a menos expediciones; los
+    # empates se ordenan por PEAKID
+    peak_counts = peak_counts.sort_index().sort_values(ascending=False, kind='stable')
+    return peak_counts[peak_counts >= min_expeditions].index.astype(str).tolist()
+
+
+def process_data(exped_df, peaks_df, coords_df):
+    return finish_merged(clean_expeditions(exped_df, peaks_df, coords_df))
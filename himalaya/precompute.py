@@ -0,0 +1,66 @@
+# Precálculo de arranque en paralelo.
+#
+# Cada etapa es una función y la lista de entradas que recibe, que pueden ser valores iniciales
+# (por ejemplo df_merged) o resultados de otras etapas. run_stages() lanza cada etapa en un pool
+# de hilos en cuanto sus entradas están listas, de modo que las etapas independientes se
+# ejecutan a la vez. Los hilos comparten los objetos del proceso: df_merged no se copia ni se
+# serializa para cada etapa. Con pandas y DuckDB buena parte del trabajo se hace fuera del GIL,
+# así que con varios núcleos el tiempo total se acerca al del camino más lento de etapas
+# dependientes en lugar de a la suma de todas.
+import logging
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+logger = logging.getLogger(__name__)
+
+# Hilos del precálculo (1 = secuencial, en el hilo que llama)
+PRECOMPUTE_WORKERS = int(os.environ.get('HIMALAYA_PRECOMPUTE_WORKERS', min(8, os.cpu_count() or 1)))
+
+
+def _timed(func, args):
+    started = time.perf_counter()
+    result = func(*args)
+    return result, (time.perf_counter() - started) * 1000
+
+
+def run_stages(stages, inputs, workers=PRECOMPUTE_WORKERS, wrap=None):
+    # `stages`: {nombre: (función, [entradas])}, en orden de dependencias. Devuelve
+    # (resultados de las etapas, milisegundos de cada etapa). `wrap` se aplica a cada
+    # función antes de enviarla al pool (p. ej. para propagar el contexto de Streamlit)
+    values = dict(inputs)
+    timings = {}
+    for name, (_, needs) in stages.items():
+        unknown = [need for need in needs if need not in inputs and need not in stages]
+        if unknown:
+            raise ValueError(f"stage {name!r} depends on unknown inputs {unknown}")
+
+    if workers <= 1:
+        for name, (func, needs) in stages.items():
+            values[name], timings[name] = _timed(func, [values[need] for need in needs])
+        return {name: values[name] for name in stages}, timings
+
+    pending = dict(stages)
+    running = {}
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='precompute') as pool:
+        while pending or running:
+            for name, (func, needs) in list(pending.items()):
+                if all(need in values for need in needs):
+                    task = wrap(_timed) if wrap else _timed
+                    running[pool.submit(task, func, [values[need] for need in needs])] = name
+                    del pending[name]
+            if not running:
+                raise ValueError(f"stages with circular dependencies: {list(pending)}")
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                values[name], timings[name] = future.result()
+    return {name: values[name] for name in stages}, {name: timings[name] for name in stages}
+
+
+def log_timings(timings, elapsed_ms):
+    for name, ms in timings.items():
+        logger.info("stage %s: %.1f ms", name, ms)
+    logger.info("precompute: %.1f ms (sum of stages %.1f ms, slowest %.1f ms)",
+                elapsed_ms, sum(timings.values()), max(timings.values(), default=0.0))
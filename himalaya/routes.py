@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+
+ROUTE_COLUMNS = ['ROUTE1', 'ROUTE2', 'ROUTE3', 'ROUTE4']
+SUCCESS_COLUMNS = ['SUCCESS1', 'SUCCESS2', 'SUCCESS3', 'SUCCESS4']
+
+# Columnas de la expedición que se copian a cada par ruta-éxito
+ROUTE_ID_COLUMNS = ['EXPID', 'PEAKID', 'PKNAME', 'YEAR', 'SEASON_FACTOR', 'HEIGHTM']
+
+
+def explode_routes(df, id_columns=ROUTE_ID_COLUMNS):
+    # Pasar ROUTE1-4/SUCCESS1-4 de formato ancho a largo en una sola pasada columnar.
+    # Se recorre la matriz (filas x 4) en orden de fila para conservar el mismo orden
+    # que el bucle original: expedición por expedición, ROUTE1 antes que ROUTE2, etc.
+    n_slots = len(ROUTE_COLUMNS)
+    route_values = df[ROUTE_COLUMNS].to_numpy(dtype=object).ravel()
+
+    # Códigos enteros compartidos por las cuatro columnas; las rutas nulas reciben -1
+    codes, categories = pd.factorize(route_values, sort=True, use_na_sentinel=True)
+    mask = codes >= 0
+
+    row_positions = np.repeat(np.arange(len(df)), n_slots)[mask]
+    success = df[SUCCESS_COLUMNS].fillna(False).to_numpy(dtype=bool).ravel()[mask]
+
+    routes_df = df[list(id_columns)].take(row_positions).reset_index(drop=True)
+    routes_df['ROUTE'] = pd.Categorical.from_codes(codes[mask], categories=categories)
+    routes_df['SUCCESS'] = success
+
+    return routes_df
+
+
+def route_success_rates(routes_df, min_attempts=5):
+    # Calcular tasas de éxito por ruta y pico
+    rates = routes_df.groupby(['PEAKID', 'PKNAME', 'ROUTE'], observed=True).agg(
+        total_attempts=('SUCCESS', 'count'),
+        successful_attempts=('SUCCESS', 'sum'),
+        height=('HEIGHTM', 'first')
+    ).reset_index()
+
+    rates['success_rate'] = rates['successful_attempts'] / rates['total_attempts']
+
+    # Filtrar rutas con al menos `min_attempts` intentos
+    return rates[rates['total_attempts'] >= min_attempts]
@@ -0,0 +1,121 @@
+# Esquema declarado del pipeline: qué columnas se leen de cada CSV y con qué tipos.
+#
+# Solo se leen las columnas que usa el dashboard; las columnas de texto con pocos valores
+# distintos se guardan como categóricas y los numéricos se reducen al tipo más pequeño
+# que los representa, para minimizar la memoria residente por worker.
+import pandas as pd
+
+from himalaya.routes import ROUTE_COLUMNS, SUCCESS_COLUMNS
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+# Columnas de exped_tidy.csv que usa el dashboard y su tipo en lectura
+EXPED_DTYPES = {
+    'EXPID': None,
+    'PEAKID': 'category',
+    'YEAR': None,
+    'SEASON_FACTOR': 'category',
+    'HOST_FACTOR': 'category',
+    **{col: 'category' for col in ROUTE_COLUMNS},
+    **{col: 'boolean' for col in SUCCESS_COLUMNS},
+    'TOTDAYS': 'float32',
+    'TERMREASON_FACTOR': 'category',
+}
+
+PEAKS_DTYPES = {
+    'PEAKID': None,
+    'PKNAME': None,
+    'HEIGHTM': 'float32',
+    'HIMAL_FACTOR': 'category',
+    'REGION_FACTOR': 'category',
+}
+
+COORDS_DTYPES = {
+    'PEAKID': None,
+    'LATITUDE': 'float64',
+    'LONGITUDE': 'float64',
+}
+
+# Valores que se leen como nulos en los tres CSV y literales de las columnas booleanas
+NULL_VALUES = ['', 'NA']
+TRUE_VALUES = ['TRUE', 'True', 'true']
+FALSE_VALUES = ['FALSE', 'False', 'false']
+
+# Columnas del dataset combinado que se guardan como categóricas
+CATEGORICAL_COLUMNS = [
+    'PEAKID', 'PKNAME', 'HOST_FACTOR', 'SEASON_FACTOR', 'TERMREASON_FACTOR',
+    'HIMAL_FACTOR', 'REGION_FACTOR',
+] + ROUTE_COLUMNS
+
+# Columnas numéricas que se reducen al entero/flotante más pequeño posible
+DOWNCAST_COLUMNS = ['YEAR', 'YEAR_INT', 'TOTDAYS', 'HEIGHTM']
+
+
+def read_options(dtypes):
+    # Argumentos de pd.read_csv para leer solo las columnas declaradas con su tipo
+    return {
+        'usecols': list(dtypes),
+        'dtype': {col: dtype for col, dtype in dtypes.items() if dtype is not None},
+        'na_values': NULL_VALUES,
+        'keep_default_na': False,
+    }
+
+
+def arrow_type(dtype):
+    # Tipo de Arrow con el que se lee una columna declarada (None: se infiere)
+    return {
+        'category': pa.dictionary(pa.int32(), pa.string()),
+        'boolean': pa.bool_(),
+        'float32': pa.float32(),
+        'float64': pa.float64(),
+    }.get(dtype)
+
+
+def arrow_convert_options(dtypes):
+    # Opciones de pyarrow.csv equivalentes a read_options: columnas, tipos y valores nulos
+    import pyarrow.csv as pa_csv
+    column_types = {col: arrow_type(dtype) for col, dtype in dtypes.items() if arrow_type(dtype) is not None}
+    return pa_csv.ConvertOptions(
+        include_columns=list(dtypes),
+        column_types=column_types,
+        null_values=NULL_VALUES,
+        strings_can_be_null=True,
+        true_values=TRUE_VALUES,
+        false_values=FALSE_VALUES,
+    )
+
+
+def downcast(series):
+    # Enteros si no hay nulos y todos los valores son enteros; si no, float32
+    values = pd.to_numeric(series, errors='coerce')
+    if values.notna().all() and (values == values.round()).all():
+        return pd.to_numeric(values.astype('int64'), downcast='integer')
+    return values.astype('float32')
+
+
+def compact(df):
+    # Aplicar tipos categóricos y reducidos a las columnas presentes en `df`
+    df = df.copy()
+    for col in CATEGORICAL_COLUMNS:
+        if col in df.columns:
+            # Categorías canónicas (solo los valores presentes, ordenados): no dependen de
+            # cómo se leyeron o combinaron las filas
+            if isinstance(df[col].dtype, pd.CategoricalDtype):
+                values = df[col].cat.remove_unused_categories()
+                df[col] = values.cat.reorder_categories(sorted(values.cat.categories), ordered=False)
+            else:
+                df[col] = pd.Categorical(df[col], categories=sorted(df[col].dropna().unique()))
+    for col in DOWNCAST_COLUMNS:
+        if col in df.columns:
+            df[col] = downcast(df[col])
+    return df
+
+
+def bytes_per_row(df):
+    # Memoria residente (incluyendo cadenas) por fila del DataFrame
+    if len(df) == 0:
+        return 0.0
+    return df.memory_usage(deep=True).sum() / len(df)
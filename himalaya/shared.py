@@ -0,0 +1,126 @@
+# Datos compartidos por todas las sesiones del proceso, sin copias y de solo lectura.
+#
+# st.cache_data serializa cada resultado y entrega a cada llamada una copia deserializada:
+# con muchas sesiones, cada rerun vuelve a copiar df_merged y todas las tablas precalculadas.
+# La aplicación guarda estos resultados con st.cache_resource, que devuelve el mismo objeto a
+# todas las sesiones, después de pasarlos por freeze():
+#   - los DataFrames pasan a ser FrozenFrame: asignar o borrar columnas, escribir con
+#     loc/iloc/at/iat o cualquier operación con inplace=True lanza ReadOnlyDataError, y
+#     index/columns devuelven vistas cuyo nombre se puede cambiar sin tocar el original;
+#   - los arrays de NumPy (también los de cada columna) se marcan como no escribibles;
+#   - los diccionarios pasan a ser MappingProxyType y las listas, tuplas.
+# Todo lo que se deriva de un FrozenFrame (filtros, merges, copy(), ...) es un DataFrame normal
+# que, con copy-on-write, solo copia los datos si se modifica.
+import types
+
+import numpy as np
+import pandas as pd
+
+
+class ReadOnlyDataError(TypeError):
+    pass
+
+
+def _read_only(*args, **kwargs):
+    raise ReadOnlyDataError("shared dataset tables are read-only; use .copy() to get a modifiable frame")
+
+
+class _ReadOnlyIndexer:
+    # loc, iloc, at e iat de un FrozenFrame: solo lectura
+
+    def __init__(self, indexer):
+        self._indexer = indexer
+
+    def __getitem__(self, key):
+        return self._indexer[key]
+
+    __setitem__ = _read_only
+
+    def __call__(self, axis=None):
+        return _ReadOnlyIndexer(self._indexer(axis))
+
+    def __getattr__(self, name):
+        return getattr(self._indexer, name)
+
+
+class FrozenFrame(pd.DataFrame):
+    # DataFrame de solo lectura que comparte los datos del original (sin copiarlos)
+
+    @property
+    def _constructor(self):
+        # Los resultados de cualquier operación son DataFrames normales
+        return pd.DataFrame
+
+    __setitem__ = __delitem__ = insert = pop = _update_inplace = _read_only
+
+    def __setattr__(self, name, value):
+        if name in ('index', 'columns'):
+            _read_only()
+        super().__setattr__(name, value)
+
+    # Los ejes se entregan como vistas nuevas (comparten los datos): cambiar su nombre, p. ej.
+    # df.index.name = ..., no modifica el frame compartido
+    @property
+    def index(self):
+        return super().index._view()
+
+    @property
+    def columns(self):
+        return super().columns._view()
+
+    @property
+    def loc(self):
+        return _ReadOnlyIndexer(super().loc)
+
+    @property
+    def iloc(self):
+        return _ReadOnlyIndexer(super().iloc)
+
+    @property
+    def at(self):
+        return _ReadOnlyIndexer(super().at)
+
+    @property
+    def iat(self):
+        return _ReadOnlyIndexer(super().iat)
+
+
+def _buffers(values):
+    # Arrays de NumPy de los datos de una columna o bloque (los de Arrow ya son inmutables)
+    if isinstance(values, np.ndarray):
+        yield values
+    for attr in ('_ndarray', '_codes', '_data', '_mask'):
+        buffer = getattr(values, attr, None)
+        if isinstance(buffer, np.ndarray):
+            yield buffer
+
+
+def _lock(values):
+    for buffer in _buffers(values):
+        buffer.flags.writeable = False
+
+
+def freeze(obj):
+    # Versión de solo lectura de `obj` que comparte sus datos (los objetos con atributos,
+    # p. ej. PeakPartition, se congelan en su sitio)
+    if isinstance(obj, FrozenFrame):
+        return obj
+    if isinstance(obj, pd.DataFrame):
+        frozen = FrozenFrame(obj)
+        for block in frozen._mgr.blocks:
+            _lock(block.values)
+        return frozen
+    if isinstance(obj, pd.Series):
+        _lock(obj._values)
+        return obj
+    if isinstance(obj, np.ndarray):
+        obj.flags.writeable = False
+        return obj
+    if isinstance(obj, (dict, types.MappingProxyType)):
+        return types.MappingProxyType({key: freeze(value) for key, value in obj.items()})
+    if isinstance(obj, (list, tuple)):
+        return tuple(freeze(value) for value in obj)
+    if hasattr(obj, '__dict__') and not isinstance(obj, type):
+        for name, value in vars(obj).items():
+            vars(obj)[name] = freeze(value)
+    return obj
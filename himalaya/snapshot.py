@@ -0,0 +1,204 @@
+# Caché en disco, direccionada por contenido, del resultado de load_data + process_data.
+#
+# La clave es un hash de los CSV de entrada y de PIPELINE_VERSION, de modo que una
+# instantánea solo se reconstruye cuando cambia una entrada o la lógica del pipeline.
+# Cada instantánea es un directorio con las tablas en Parquet y un manifest.json.
+#
+# El manifest guarda también el tamaño y el hash de cada CSV. Si no hay instantánea para la
+# clave actual pero sí una de la misma versión cuyo exped_tidy.csv es un prefijo del actual (y
+# con los mismos picos y coordenadas), solo se leen las líneas añadidas al final y se insertan en
+# su df_merged con himalaya.incremental.merge_batch, sin repetir process_data.
+import contextlib
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import pandas as pd
+
+from himalaya.incremental import merge_batch, parse_batch
+from himalaya.pipeline import DATA_DIR, PIPELINE_VERSION, input_paths, load_data, process_data
+from himalaya.schema import compact
+
+try:
+    import pyarrow  # noqa: F401
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+SNAPSHOT_DIR = os.environ.get('HIMALAYA_SNAPSHOT_DIR', os.path.join('.cache', 'snapshots'))
+
+# Tablas guardadas en cada instantánea
+SNAPSHOT_TABLES = ('df_merged', 'peaks_df', 'coords_df')
+MANIFEST_FILE = 'manifest.json'
+
+
+def input_fingerprint(data_dir=DATA_DIR, version=PIPELINE_VERSION):
+    # Hash SHA-256 del contenido de los tres CSV y de la versión del pipeline
+    digest = hashlib.sha256(f'pipeline-v{version}'.encode())
+    for path in input_paths(data_dir):
+        digest.update(os.path.basename(path).encode())
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def file_digest(path, size=None):
+    # SHA-256 de los `size` primeros bytes del fichero (todo el fichero por defecto)
+    digest = hashlib.sha256()
+    remaining = os.path.getsize(path) if size is None else size
+    with open(path, 'rb') as f:
+        while remaining > 0:
+            block = f.read(min(1 << 20, remaining))
+            if not block:
+                break
+            digest.update(block)
+            remaining -= len(block)
+    return digest.hexdigest()
+
+
+def input_digests(data_dir=DATA_DIR):
+    # Tamaño y hash de cada CSV de entrada, para el manifest
+    return {os.path.basename(path): {'size': os.path.getsize(path), 'sha256': file_digest(path)}
+            for path in input_paths(data_dir)}
+
+
+def table_path(key, name, cache_dir=SNAPSHOT_DIR):
+    # Ruta del Parquet de una tabla de la instantánea (p. ej. para consultarla con SQL)
+    return os.path.join(cache_dir, key, f'{name}.parquet')
+
+
+def load_snapshot(key, cache_dir=SNAPSHOT_DIR):
+    snapshot_dir = os.path.join(cache_dir, key)
+    manifest_path = os.path.join(snapshot_dir, MANIFEST_FILE)
+    if not PARQUET_AVAILABLE or not os.path.exists(manifest_path):
+        return None
+
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+
+    tables = {name: pd.read_parquet(table_path(key, name, cache_dir)) for name in SNAPSHOT_TABLES}
+
+    # Parquet no conserva las categóricas sin valores: una columna nula en todas las filas (p. ej.
+    # ROUTE4) vuelve como float64 lleno de NaN. compact() la vuelve a convertir en categórica, con
+    # los mismos tipos que deja process_data
+    tables['df_merged'] = compact(tables['df_merged'])
+    return tables['df_merged'], manifest['top_peaks'], tables['peaks_df'], tables['coords_df']
+
+
+def save_snapshot(key, df_merged, top_peaks, peaks_df, coords_df, cache_dir=SNAPSHOT_DIR, inputs=None):
+    if not PARQUET_AVAILABLE:
+        return
+
+    # Escribir en un directorio temporal y renombrarlo al final para que un proceso
+    # concurrente nunca lea una instantánea a medio escribir
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix=f'.{key}-', dir=cache_dir)
+    os.chmod(tmp_dir, 0o755)
+    try:
+        tables = {'df_merged': df_merged, 'peaks_df': peaks_df, 'coords_df': coords_df}
+        for name, table in tables.items():
+            table.to_parquet(os.path.join(tmp_dir, f'{name}.parquet'), index=False)
+
+        manifest = {'key': key, 'pipeline_version': PIPELINE_VERSION, 'top_peaks': top_peaks,
+                    'rows': len(df_merged), 'inputs': inputs}
+        with open(os.path.join(tmp_dir, MANIFEST_FILE), 'w') as f:
+            json.dump(manifest, f, indent=2)
+
+        os.replace(tmp_dir, os.path.join(cache_dir, key))
+    except OSError:
+        # Otro proceso ya publicó la misma instantánea
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def find_base_snapshot(data_dir=DATA_DIR, cache_dir=SNAPSHOT_DIR):
+    # Manifest de la instantánea más reciente de esta versión del pipeline cuyo exped_tidy.csv
+    # es un prefijo (terminado en salto de línea) del actual, con picos y coordenadas iguales
+    if not os.path.isdir(cache_dir):
+        return None
+    exped_path, peaks_path, coords_path = input_paths(data_dir)
+    exped_file = os.path.basename(exped_path)
+    exped_size = os.path.getsize(exped_path)
+    dimensions = None
+    best, best_size = None, 0
+    for name in os.listdir(cache_dir):
+        manifest_path = os.path.join(cache_dir, name, MANIFEST_FILE)
+        if name.startswith('.') or not os.path.exists(manifest_path):
+            continue
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        inputs = manifest.get('inputs')
+        if manifest.get('pipeline_version') != PIPELINE_VERSION or not inputs:
+            continue
+        base = inputs[exped_file]
+        if not best_size < base['size'] < exped_size:
+            continue
+        if dimensions is None:
+            dimensions = {os.path.basename(path): file_digest(path) for path in (peaks_path, coords_path)}
+        if any(inputs[file]['sha256'] != digest for file, digest in dimensions.items()):
+            continue
+        with open(exped_path, 'rb') as f:
+            f.seek(base['size'] - 1)
+            ends_line = f.read(1) == b'\n'
+        if ends_line and file_digest(exped_path, base['size']) == base['sha256']:
+            best, best_size = manifest, base['size']
+    return best
+
+
+def extend_snapshot(key, data_dir=DATA_DIR, cache_dir=SNAPSHOT_DIR):
+    # Instantánea de `key` a partir de una anterior de la que exped_tidy.csv solo ha crecido por
+    # el final (None si no hay ninguna o si las filas añadidas repiten algún EXPID: una
+    # reconstrucción completa las conservaría duplicadas)
+    base = find_base_snapshot(data_dir, cache_dir)
+    if base is None:
+        return None
+    cached = load_snapshot(base['key'], cache_dir)
+    if cached is None:
+        return None
+    df_merged, _, peaks_df, coords_df = cached
+
+    exped_path = input_paths(data_dir)[0]
+    with open(exped_path, 'rb') as f:
+        header = f.readline()
+        f.seek(base['inputs'][os.path.basename(exped_path)]['size'])
+        batch = parse_batch(header, f.read())
+    if df_merged['EXPID'].isin(batch['EXPID']).any() or batch['EXPID'].duplicated().any():
+        return None
+
+    df_merged, top_peaks, _ = merge_batch(df_merged, batch, peaks_df, coords_df)
+    save_snapshot(key, df_merged, top_peaks, peaks_df, coords_df, cache_dir, input_digests(data_dir))
+    return df_merged, top_peaks, peaks_df, coords_df
+
+
+def _no_stage(name):
+    return contextlib.nullcontext()
+
+
+def load_or_build(data_dir=DATA_DIR, cache_dir=SNAPSHOT_DIR, stage=_no_stage, key=None):
+    # Devuelve (df_merged, top_peaks, peaks_df, coords_df), desde la instantánea si existe.
+    # `stage(nombre)` devuelve un gestor de contexto que envuelve cada paso (p. ej. para medirlo);
+    # `key` es la huella de las entradas si ya se ha calculado
+    if key is None:
+        with stage('input_fingerprint'):
+            key = input_fingerprint(data_dir)
+    if cache_dir:
+        with stage('load_snapshot'):
+            cached = load_snapshot(key, cache_dir)
+        if cached is not None:
+            return cached
+        with stage('extend_snapshot'):
+            extended = extend_snapshot(key, data_dir, cache_dir)
+        if extended is not None:
+            return extended
+
+    with stage('load_data'):
+        exped_df, peaks_df, coords_df = load_data(data_dir)
+    with stage('process_data'):
+        df_merged, top_peaks = process_data(exped_df, peaks_df, coords_df)
+
+    if cache_dir:
+        with stage('save_snapshot'):
+            save_snapshot(key, df_merged, top_peaks, peaks_df, coords_df, cache_dir, input_digests(data_dir))
+    return df_merged, top_peaks, peaks_df, coords_df
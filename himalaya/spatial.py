@@ -0,0 +1,100 @@
+# Índice espacial de los picos (rejilla de latitud/longitud) para consultas por radio y por
+# rectángulo.
+#
+# Los picos con coordenadas se ordenan por la celda de la rejilla que los contiene (fila de
+# latitud * columnas + columna de longitud). Las celdas de una misma fila son contiguas en ese
+# orden, así que un rectángulo son, para cada fila de celdas que cruza, dos searchsorted sobre
+# los identificadores de celda; solo los picos de esas celdas se comparan con los límites
+# exactos. Una consulta por radio usa el rectángulo que contiene el círculo y filtra con la
+# distancia haversine. El coste depende de los picos cercanos, no del tamaño del catálogo.
+import math
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def haversine_km(lat, lon, lats, lons):
+    # Distancia de círculo máximo (km) de (lat, lon) a cada punto de (lats, lons)
+    lat, lon = math.radians(lat), math.radians(lon)
+    lats, lons = np.radians(lats), np.radians(lons)
+    a = np.sin((lats - lat) / 2) ** 2 + math.cos(lat) * np.cos(lats) * np.sin((lons - lon) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class PeakGrid:
+
+    def __init__(self, peaks, lats, lons, cell_deg=0.5):
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        valid = ~(np.isnan(lats) | np.isnan(lons))
+        self.cell_deg = cell_deg
+        self.n_rows = math.ceil(180 / cell_deg)
+        self.n_cols = math.ceil(360 / cell_deg)
+
+        cells = self._row(lats[valid]) * self.n_cols + self._col(lons[valid])
+        order = np.argsort(cells, kind='stable')
+        self.cells = cells[order]
+        self.peaks = np.asarray(peaks, dtype=object)[valid][order]
+        self.lats = lats[valid][order]
+        self.lons = lons[valid][order]
+        self.positions = {peak: position for position, peak in enumerate(self.peaks)}
+
+    @classmethod
+    def from_frame(cls, coords_df, cell_deg=0.5):
+        return cls(coords_df['PEAKID'], coords_df['LATITUDE'], coords_df['LONGITUDE'], cell_deg)
+
+    def __len__(self):
+        return len(self.peaks)
+
+    def location(self, peak):
+        # (lat, lon) del pico o None si no tiene coordenadas
+        position = self.positions.get(peak)
+        return None if position is None else (float(self.lats[position]), float(self.lons[position]))
+
+    def _row(self, lats):
+        return np.clip(((np.asarray(lats) + 90) // self.cell_deg).astype(np.int64), 0, self.n_rows - 1)
+
+    def _col(self, lons):
+        return np.clip(((np.asarray(lons) + 180) // self.cell_deg).astype(np.int64), 0, self.n_cols - 1)
+
+    def _candidates(self, south, west, north, east):
+        # Posiciones de los picos de las celdas que cruza el rectángulo (west > east: cruza el
+        # antimeridiano y se parte en dos tramos de columnas)
+        col_spans = [(west, east)] if west <= east else [(west, 180.0), (-180.0, east)]
+        bounds = []
+        for row in range(int(self._row(south)), int(self._row(north)) + 1):
+            for lo, hi in col_spans:
+                first = row * self.n_cols + int(self._col(lo))
+                last = row * self.n_cols + int(self._col(hi))
+                bounds.append(np.searchsorted(self.cells, [first, last + 1]))
+        if not bounds:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate([np.arange(start, stop) for start, stop in bounds])
+
+    def bbox(self, south, west, north, east):
+        # PEAKID de los picos dentro del rectángulo (límites incluidos; west > east si cruza el
+        # antimeridiano)
+        positions = self._candidates(south, west, north, east)
+        lats, lons = self.lats[positions], self.lons[positions]
+        inside_lon = (lons >= west) & (lons <= east) if west <= east else (lons >= west) | (lons <= east)
+        return self.peaks[positions[(lats >= south) & (lats <= north) & inside_lon]]
+
+    def radius(self, lat, lon, km):
+        # (PEAKID, distancias en km) de los picos a `km` o menos de (lat, lon), de más cercano a
+        # más lejano
+        dlat = math.degrees(km / EARTH_RADIUS_KM)
+        south, north = max(lat - dlat, -90.0), min(lat + dlat, 90.0)
+        # El círculo es más ancho en longitud en la latitud más alejada del ecuador
+        edge = math.radians(max(abs(south), abs(north)))
+        dlon = 180.0 if edge >= math.pi / 2 else math.degrees(km / (EARTH_RADIUS_KM * math.cos(edge)))
+        if dlon >= 180:
+            west, east = -180.0, 180.0
+        else:
+            west = (lon - dlon + 180) % 360 - 180
+            east = (lon + dlon + 180) % 360 - 180
+        positions = self._candidates(south, west, north, east)
+        distances = haversine_km(lat, lon, self.lats[positions], self.lons[positions])
+        near = distances <= km
+        order = np.argsort(distances[near], kind='stable')
+        return self.peaks[positions[near][order]], distances[near][order]
@@ -0,0 +1,80 @@
+# Backend SQL opcional para las tablas de conteos de los paneles.
+#
+# Con HIMALAYA_QUERY_BACKEND=sql las mismas agregaciones de count_tables() se ejecutan como
+# SQL en DuckDB (embebido, sin servidor) directamente sobre el Parquet de df_merged de la
+# instantánea: DuckDB lee solo las columnas que usa cada consulta y a pandas solo llegan las
+# tablas ya agregadas. Como con pandas, las tablas cubren todos los años: el filtro de años de
+# la barra lateral se aplica después, sobre el cubo y las tablas por año. Las tasas, porcentajes y umbrales se siguen
+# calculando con las funciones de himalaya.aggregates sobre esas tablas pequeñas.
+import logging
+import os
+
+from himalaya.aggregates import COUNT_KEYS, canonical_counts, count_tables
+from himalaya.cube import DURATION_BINS, DURATION_LABELS
+from himalaya.routes import ROUTE_COLUMNS, SUCCESS_COLUMNS
+
+try:
+    import duckdb
+    SQL_AVAILABLE = True
+except ImportError:
+    SQL_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# 'pandas' (por defecto) o 'sql'
+QUERY_BACKEND = os.environ.get('HIMALAYA_QUERY_BACKEND', 'pandas')
+
+
+def _duration_bin_sql(column):
+    # Mismos bins que cube.duration_bins: intervalos [a, b) y NULL fuera de [0, 365)
+    cases = ' '.join(f"WHEN {column} < {upper} THEN '{label}'"
+                     for upper, label in zip(DURATION_BINS[1:], DURATION_LABELS))
+    return f'CASE WHEN {column} >= {DURATION_BINS[0]} THEN (CASE {cases} END) END'
+
+
+def _not_null(keys):
+    # groupby de pandas descarta las claves nulas
+    return ' AND '.join(f'{key} IS NOT NULL' for key in keys)
+
+
+def count_queries(source):
+    # Una consulta por tabla de conteos; `source` es la expresión FROM
+    filtered = f'(SELECT * FROM {source})'
+    routes = '(' + ' UNION ALL '.join(
+        f'SELECT PEAKID, PKNAME, {route} AS ROUTE, {success} AS SUCCESS FROM {filtered}'
+        for route, success in zip(ROUTE_COLUMNS, SUCCESS_COLUMNS)) + ')'
+    durations = f'(SELECT *, {_duration_bin_sql("TOTDAYS")} AS duration_bin FROM {filtered} WHERE TOTDAYS > 0)'
+
+    def grouped(name, measures, rows=filtered):
+        keys = ', '.join(COUNT_KEYS[name])
+        return f'SELECT {keys}, {measures} FROM {rows} WHERE {_not_null(COUNT_KEYS[name])} GROUP BY {keys}'
+
+    return {
+        'routes': grouped('routes', 'count(SUCCESS) AS total_attempts, '
+                          'sum(SUCCESS::BIGINT)::BIGINT AS successful_attempts', routes),
+        'country_year': grouped('country_year', 'count(*) AS count'),
+        'country_peak': grouped('country_peak', 'count(*) AS count'),
+        'duration': grouped('duration', 'count(EXPID) AS total, sum(ANY_SUCCESS::BIGINT)::BIGINT AS success',
+                            durations),
+        'duration_avg': grouped('duration_avg', 'sum(TOTDAYS::DOUBLE) AS totdays_sum, count(EXPID) AS count',
+                                durations),
+        'reasons': grouped('reasons', 'count(*) AS count'),
+        'termination': grouped('termination', 'count(*) AS count'),
+    }
+
+
+def sql_count_tables(parquet_path):
+    # count_tables() ejecutado en DuckDB sobre el Parquet de df_merged
+    source = "read_parquet('{}')".format(parquet_path.replace("'", "''"))
+    with duckdb.connect() as con:
+        return {name: canonical_counts(con.execute(query).df(), COUNT_KEYS[name])
+                for name, query in count_queries(source).items()}
+
+
+def backend_count_tables(df_merged, parquet_path=None, backend=QUERY_BACKEND):
+    # Tablas de conteos con el backend configurado; si SQL no está disponible se usa pandas
+    if backend == 'sql':
+        if SQL_AVAILABLE and parquet_path and os.path.exists(parquet_path):
+            return sql_count_tables(parquet_path)
+        logger.warning("HIMALAYA_QUERY_BACKEND=sql requires duckdb and a Parquet snapshot; using pandas")
+    return count_tables(df_merged)
@@ -0,0 +1,154 @@
+# Etapas del precálculo de la aplicación, sin dependencias de Streamlit.
+#
+# app.py envuelve cada etapa con st.cache_resource y las ejecuta con himalaya.precompute;
+# himalaya.build las ejecuta una sola vez para generar un paquete precalculado. STAGE_INPUTS
+# declara las entradas de cada etapa: valores iniciales (df_merged, peak_heights, top_peaks,
+# peaks_df, coords_df) o resultados de otras etapas.
+import numpy as np
+import pandas as pd
+
+from himalaya.aggregates import count_tables, country_tables, duration_tables, route_table, termination_table
+from himalaya.cube import build_cube, group_reasons, rollup
+from himalaya.peak_index import DurationIndex, PeakPartition, YearPrefixSums, peak_records
+from himalaya.spatial import PeakGrid
+
+STAGE_INPUTS = {
+    'aggregate_counts': ['df_merged'],
+    'expedition_cube': ['df_merged'],
+    'year_prefix_sums': ['df_merged'],
+    'duration_index': ['df_merged'],
+    'peak_locations': ['coords_df', 'peaks_df'],
+    'route_success_data': ['aggregate_counts', 'peak_heights'],
+    'country_data': ['aggregate_counts'],
+    'duration_data': ['aggregate_counts'],
+    'termination_data': ['aggregate_counts'],
+    'peak_partitions': ['df_merged', 'route_success_data', 'country_data', 'duration_data', 'termination_data'],
+    'route_comparison': ['route_success_data'],
+    'duration_comparison': ['expedition_cube'],
+    'termination_comparison': ['expedition_cube', 'top_peaks'],
+}
+
+
+def peak_heights(peaks_df):
+    # Altura de cada pico (para las tasas por ruta y la comparación entre picos)
+    return peaks_df.drop_duplicates('PEAKID').set_index('PEAKID')['HEIGHTM']
+
+
+def route_success_data(counts, heights):
+    # Calcular tasas de éxito por ruta y pico (al menos 5 intentos)
+    return route_table(counts, heights, min_attempts=5)
+
+
+def country_data(counts):
+    # Expediciones por país y año (10 países principales) y por país para cada pico
+    return country_tables(counts, top_n=10)
+
+
+def duration_data(counts):
+    # Tasas de éxito por pico, temporada y bin de duración (al menos 3 expediciones por bin)
+    return duration_tables(counts, min_total=3)
+
+
+def termination_data(counts):
+    # Razones de terminación por pico y año ("Other reasons" por debajo de 100); los períodos y
+    # sus porcentajes se calculan al mostrar la pestaña, con los intervalos elegidos
+    return termination_table(counts, min_count=100)
+
+
+def expedition_cube(df_merged):
+    # Cubo pre-agregado para los paneles que dependen de los filtros de la barra lateral
+    cube = build_cube(df_merged)
+    cube['reason_grouped'] = group_reasons(cube)
+    return cube
+
+
+def peak_partitions(df_merged, route_success_rates, country_data, duration_data, term_evolution):
+    # Particionar por pico, una sola vez, cada tabla que se consulta para el pico seleccionado
+    (_, country_exped_by_peak), (duration_success, _) = country_data, duration_data
+    partitions = {
+        'expeditions': PeakPartition(df_merged),
+        'routes': PeakPartition(route_success_rates),
+        'countries': PeakPartition(country_exped_by_peak),
+        'duration': PeakPartition(duration_success),
+        'termination': PeakPartition(term_evolution),
+    }
+    return partitions, peak_records(df_merged)
+
+
+def year_prefix_sums(df_merged):
+    # Sumas acumuladas por año para cada pico y para el conjunto de todos los picos
+    return YearPrefixSums.from_frame(df_merged), YearPrefixSums.from_frame(df_merged, column=None)
+
+
+def duration_index(df_merged):
+    # Duraciones ordenadas por pico y temporada para los bins de duración elegidos en la barra lateral
+    return DurationIndex.from_frame(df_merged)
+
+
+def peak_locations(coords_df, peaks_df):
+    # Coordenadas, nombre y altura de cada pico para el mapa y rejilla espacial para el filtro
+    # de picos cercanos
+    locations = pd.merge(coords_df, peaks_df[['PEAKID', 'PKNAME', 'HEIGHTM']], on='PEAKID', how='inner')
+    return locations, PeakGrid.from_frame(coords_df)
+
+
+def route_comparison(route_success_rates):
+    # Rutas más comunes (la comparación entre picos no depende de ningún filtro). A igual número
+    # de picos va antes la ruta que aparece antes en la tabla, ordenada por pico y ruta, como
+    # value_counts().head(10) en la versión original
+    ranking = pd.DataFrame({'ROUTE': route_success_rates['ROUTE'].to_numpy(),
+                            'position': np.arange(len(route_success_rates))})
+    ranking = ranking.groupby('ROUTE').agg(peaks=('position', 'size'), first=('position', 'min'))
+    common_routes = ranking.sort_values(['peaks', 'first'], ascending=[False, True]).head(10).index.tolist()
+
+    # Filtrar datos para las rutas comunes
+    return route_success_rates[route_success_rates['ROUTE'].isin(common_routes)]
+
+
+def duration_comparison(cube):
+    # Duración media por pico y resultado
+    comparison = rollup(cube, ['PEAKID', 'PKNAME', 'ANY_SUCCESS'])
+    comparison = comparison[['PEAKID', 'PKNAME', 'ANY_SUCCESS', 'avg_duration', 'expeditions']].rename(
+        columns={'expeditions': 'count'})
+
+    # Filtrar para incluir solo picos con suficientes datos
+    peak_counts = comparison.groupby('PEAKID', observed=True)['count'].sum()
+    valid_peaks = peak_counts[peak_counts >= 20].index.tolist()
+    return comparison[comparison['PEAKID'].isin(valid_peaks)]
+
+
+def termination_comparison(cube, top_peaks):
+    # Porcentaje de cada razón de terminación por pico
+    comparison = rollup(cube, ['PEAKID', 'PKNAME', 'reason_grouped'])
+    comparison = comparison[['PEAKID', 'PKNAME', 'reason_grouped', 'expeditions']].rename(columns={'expeditions': 'count'})
+    comparison = comparison.merge(
+        comparison.groupby(['PEAKID'], observed=True)['count'].sum().reset_index(name='total'),
+        on=['PEAKID']
+    )
+    comparison['percentage'] = comparison['count'] / comparison['total'] * 100
+
+    # Filtrar para incluir solo los picos principales
+    comparison = comparison[comparison['PEAKID'].isin(top_peaks)]
+
+    # Mostrar solo las razones más comunes
+    reason_totals = rollup(cube, ['reason_grouped'])
+    common_reasons = reason_totals.sort_values('expeditions', ascending=False, kind='stable')['reason_grouped'].head(5).tolist()
+    return comparison[comparison['reason_grouped'].isin(common_reasons)]
+
+
+# Función de cada etapa (sin caché)
+STAGE_FUNCTIONS = {
+    'aggregate_counts': count_tables,
+    'expedition_cube': expedition_cube,
+    'year_prefix_sums': year_prefix_sums,
+    'duration_index': duration_index,
+    'peak_locations': peak_locations,
+    'route_success_data': route_success_data,
+    'country_data': country_data,
+    'duration_data': duration_data,
+    'termination_data': termination_data,
+    'peak_partitions': peak_partitions,
+    'route_comparison': route_comparison,
+    'duration_comparison': duration_comparison,
+    'termination_comparison': termination_comparison,
+}
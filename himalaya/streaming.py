@@ -0,0 +1,39 @@
+# Modo streaming: agregados de archivos de expediciones que no caben en memoria.
+#
+# exped_tidy.csv se lee por bloques de filas. Cada bloque se limpia y se une con las tablas
+# de picos y coordenadas (pequeñas, en memoria) con la misma clean_expeditions del pipeline,
+# se resume en tablas de conteos y se acumula con merge_counts. La memoria depende del tamaño
+# del bloque y del número de claves distintas de los agregados, no del número de expediciones.
+import os
+
+import pandas as pd
+
+from himalaya.aggregates import count_tables, merge_counts
+from himalaya.pipeline import DATA_DIR, clean_expeditions, input_paths, load_dimensions, popular_peaks
+from himalaya.schema import EXPED_DTYPES, read_options
+
+# Filas de exped_tidy.csv por bloque
+STREAM_CHUNK_ROWS = int(os.environ.get('HIMALAYA_STREAM_CHUNK_ROWS', 100_000))
+
+
+def read_chunks(path, chunksize=STREAM_CHUNK_ROWS):
+    return pd.read_csv(path, encoding='latin-1', chunksize=chunksize, **read_options(EXPED_DTYPES))
+
+
+def stream_aggregates(data_dir=DATA_DIR, chunksize=STREAM_CHUNK_ROWS):
+    # Devuelve (counts, top_peaks) iguales a count_tables(process_data(...)) sin cargar el CSV entero
+    peaks_df, coords_df = load_dimensions(data_dir)
+
+    counts = None
+    peak_counts = pd.Series(dtype='int64')
+    for chunk in read_chunks(input_paths(data_dir)[0], chunksize):
+        rows = clean_expeditions(chunk, peaks_df, coords_df)
+
+        chunk_counts = count_tables(rows)
+        counts = chunk_counts if counts is None else merge_counts(counts, added=chunk_counts)
+
+        chunk_peaks = rows.groupby('PEAKID', observed=True).size()
+        chunk_peaks.index = chunk_peaks.index.astype(object)
+        peak_counts = pd.concat([peak_counts, chunk_peaks]).groupby(level=0).sum()
+
+    return counts, popular_peaks(peak_counts)
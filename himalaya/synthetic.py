@@ -0,0 +1,155 @@
+# Generador de datos sintéticos con la distribución del dataset incluido, para pruebas de carga.
+#
+# Cada expedición sintética parte de una expedición real elegida al azar (donante), que aporta
+# el pico, el año, la temporada, el conjunto de rutas y el resto de columnas. Sobre ella:
+#   - SUCCESS1-4 se sortean con la tasa de éxito real de cada (pico, ruta);
+#   - HOST_FACTOR (con HOST y NATION) se toma de otra expedición real de la misma década;
+#   - TOTDAYS y TERMREASON_FACTOR se toman juntos de otra expedición real con el mismo
+#     resultado (éxito o no), así se conservan la distribución de duraciones, su relación con
+#     el éxito y la frecuencia de cada razón de terminación.
+# peak_factor, route_factor y country_factor multiplican el número de picos, rutas y países
+# con variantes de los reales (pico EVER-2 "Everest 2", ruta "N Col-NE Ridge (2)", país
+# "Nepal 2") que siguen las mismas distribuciones. Los archivos tienen las mismas columnas que
+# los originales y se escriben por bloques de tamaño fijo, cada uno con su propio generador
+# aleatorio derivado de la semilla: para una misma semilla y los mismos parámetros el
+# resultado es idéntico.
+import os
+
+import numpy as np
+import pandas as pd
+
+from himalaya.pipeline import COORDS_FILE, DATA_DIR, EXPED_FILE, PEAKS_FILE, input_paths
+from himalaya.routes import ROUTE_COLUMNS, SUCCESS_COLUMNS
+
+# Filas por bloque (forma parte de la definición del resultado para una semilla)
+SYNTHETIC_BLOCK_ROWS = 100_000
+
+# Columnas que se toman del donante de país y del donante de resultado
+HOST_COLUMNS = ['HOST', 'HOST_FACTOR', 'NATION']
+OUTCOME_COLUMNS = ['TOTDAYS', 'TERMREASON', 'TERMREASON_FACTOR']
+
+# Desplazamiento (grados) de las coordenadas de cada variante de un pico
+PEAK_VARIANT_OFFSET = 0.05
+
+MISSING = 'NA'
+
+
+def read_raw(path):
+    # Valores tal como están en el CSV (texto, con "NA" literal)
+    return pd.read_csv(path, encoding='latin-1', dtype=str, keep_default_na=False)
+
+
+def variant(values, index, template):
+    # Variante `index` de cada valor; la 0 es el propio valor y la i-ésima template.format(valor, i + 1)
+    values = np.array(values, dtype=object)
+    index = np.broadcast_to(index, len(values))
+    mask = index > 0
+    if mask.any():
+        before, between, after = template.split('{}')
+        labels = (before + pd.Series(values[mask], dtype=str) + between
+                  + pd.Series(index[mask] + 1).astype(str) + after)
+        values[mask] = labels.to_numpy(dtype=object)
+    return values
+
+
+class ExpeditionModel:
+    # Distribuciones de referencia ajustadas sobre las expediciones reales
+
+    def __init__(self, exped):
+        self.exped = exped.reset_index(drop=True)
+        success = self.exped[SUCCESS_COLUMNS].eq('TRUE').to_numpy()
+        any_success = success.any(axis=1)
+
+        # Tasa de éxito por (pico, ruta) sobre todas las posiciones ROUTE1-4
+        attempts = pd.DataFrame({
+            'PEAKID': np.tile(self.exped['PEAKID'].to_numpy(), len(ROUTE_COLUMNS)),
+            'ROUTE': self.exped[ROUTE_COLUMNS].to_numpy().T.ravel(),
+            'SUCCESS': success.T.ravel(),
+        })
+        attempts = attempts[attempts['ROUTE'] != MISSING]
+        self.route_rates = attempts.groupby(['PEAKID', 'ROUTE'])['SUCCESS'].mean()
+
+        # Filas de cada década y de cada resultado
+        decade = (pd.to_numeric(self.exped['YEAR'], errors='coerce') // 10).fillna(-1).to_numpy()
+        self.decade_rows = {key: np.flatnonzero(decade == key) for key in np.unique(decade)}
+        self.decade = decade
+        self.outcome_rows = {outcome: np.flatnonzero(any_success == outcome) for outcome in (True, False)}
+
+    def _choose(self, rng, groups, keys):
+        # Una fila al azar del grupo de cada clave (o de todas las filas si el grupo está vacío)
+        chosen = np.empty(len(keys), dtype=np.int64)
+        for key in np.unique(keys):
+            mask = keys == key
+            rows = groups.get(key)
+            if rows is None or len(rows) == 0:
+                rows = np.arange(len(self.exped))
+            chosen[mask] = rows[rng.integers(len(rows), size=mask.sum())]
+        return chosen
+
+    def sample(self, rng, size, peak_factor=1, route_factor=1, country_factor=1):
+        donors = rng.integers(len(self.exped), size=size)
+        block = self.exped.iloc[donors].reset_index(drop=True)
+
+        # Éxito de cada ruta con la tasa real del par (pico, ruta)
+        for route_col, success_col in zip(ROUTE_COLUMNS, SUCCESS_COLUMNS):
+            keys = pd.MultiIndex.from_arrays([block['PEAKID'], block[route_col]])
+            rates = self.route_rates.reindex(keys).fillna(0).to_numpy()
+            block[success_col] = np.where(rng.random(size) < rates, 'TRUE', 'FALSE')
+        any_success = block[SUCCESS_COLUMNS].eq('TRUE').any(axis=1).to_numpy()
+
+        # País de una expedición de la misma década; duración y terminación de una con el mismo resultado
+        hosts = self._choose(rng, self.decade_rows, self.decade[donors])
+        block[HOST_COLUMNS] = self.exped.loc[hosts, HOST_COLUMNS].to_numpy()
+        outcomes = self._choose(rng, self.outcome_rows, any_success)
+        block[OUTCOME_COLUMNS] = self.exped.loc[outcomes, OUTCOME_COLUMNS].to_numpy()
+
+        # Variantes de picos, rutas y países
+        if peak_factor > 1:
+            block['PEAKID'] = variant(block['PEAKID'], rng.integers(peak_factor, size=size), '{}-{}')
+        if route_factor > 1:
+            index = rng.integers(route_factor, size=size)
+            for route_col in ROUTE_COLUMNS:
+                routes = block[route_col].to_numpy()
+                block[route_col] = np.where(routes == MISSING, routes, variant(routes, index, '{} ({})'))
+        if country_factor > 1:
+            block['HOST_FACTOR'] = variant(block['HOST_FACTOR'], rng.integers(country_factor, size=size), '{} {}')
+        return block
+
+
+def peak_variants(peaks, coords, peak_factor):
+    # Tablas de picos y coordenadas con `peak_factor` variantes de cada pico
+    peak_tables, coord_tables = [], []
+    for i in range(peak_factor):
+        peak_tables.append(peaks.assign(PEAKID=variant(peaks['PEAKID'], i, '{}-{}'),
+                                        PKNAME=variant(peaks['PKNAME'], i, '{} {}')))
+        moved = coords.assign(PEAKID=variant(coords['PEAKID'], i, '{}-{}'),
+                              PKNAME=variant(coords['PKNAME'], i, '{} {}'))
+        if i > 0:
+            for col in ('LATITUDE', 'LONGITUDE'):
+                moved[col] = (pd.to_numeric(coords[col]) + i * PEAK_VARIANT_OFFSET).map('{:.4f}'.format)
+        coord_tables.append(moved)
+    return pd.concat(peak_tables, ignore_index=True), pd.concat(coord_tables, ignore_index=True)
+
+
+def generate(out_dir, rows=None, seed=0, peak_factor=1, route_factor=1, country_factor=1,
+             data_dir=DATA_DIR, block_rows=SYNTHETIC_BLOCK_ROWS):
+    # Escribe en `out_dir` los tres CSV con `rows` expediciones sintéticas (por defecto, tantas
+    # como el original) y devuelve el número de expediciones escritas
+    exped_path, peaks_path, coords_path = input_paths(data_dir)
+    exped = read_raw(exped_path)
+    rows = len(exped) if rows is None else rows
+    model = ExpeditionModel(exped)
+
+    os.makedirs(out_dir, exist_ok=True)
+    peaks, coords = peak_variants(read_raw(peaks_path), read_raw(coords_path), peak_factor)
+    peaks.to_csv(os.path.join(out_dir, PEAKS_FILE), index=False, encoding='latin-1')
+    coords.to_csv(os.path.join(out_dir, COORDS_FILE), index=False, encoding='latin-1')
+
+    with open(os.path.join(out_dir, EXPED_FILE), 'w', encoding='latin-1', newline='') as f:
+        for number, start in enumerate(range(0, rows, block_rows)):
+            size = min(block_rows, rows - start)
+            rng = np.random.default_rng([seed, number])
+            block = model.sample(rng, size, peak_factor, route_factor, country_factor)
+            block['EXPID'] = block['PEAKID'] + 'S' + pd.Series(np.arange(start, start + size)).astype(str)
+            block.to_csv(f, index=False, header=number == 0)
+    return rows
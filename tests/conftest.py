@@ -0,0 +1,5 @@
+# Las pruebas importan el paquete himalaya desde la raíz del repositorio
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
@@ -0,0 +1,40 @@
+# Aplicación completa con AppTest: los gráficos llegan al navegador con las columnas que usan.
+import json
+import os
+
+import pyarrow as pa
+import pytest
+from streamlit.testing.v1 import AppTest
+
+ROOT = os.path.join(os.path.dirname(__file__), '..')
+
+
+def vega_charts(node):
+    # Especificación y columnas de cada conjunto de datos de los gráficos Vega-Lite del árbol
+    proto = getattr(node, 'proto', None)
+    if type(proto).__name__.endswith('VegaLiteChart'):
+        columns = [pa.ipc.open_stream(dataset.data.data).schema.names for dataset in proto.datasets]
+        yield json.loads(proto.spec), columns
+    children = getattr(node, 'children', None)
+    if isinstance(children, dict):
+        for child in children.values():
+            yield from vega_charts(child)
+
+
+@pytest.fixture(scope='module')
+def app():
+    cwd = os.getcwd()
+    os.chdir(ROOT)
+    try:
+        yield AppTest.from_file(os.path.join(ROOT, 'app.py'), default_timeout=300).run()
+    finally:
+        os.chdir(cwd)
+
+
+def test_peaks_map_keeps_selected_column(app):
+    assert not app.exception
+    maps = [columns for spec, columns in vega_charts(app._tree)
+            if any('projection' in child for child in spec.get('vconcat', []))]
+    assert len(maps) == 1
+    # El mapa y la franja de intervalos resaltan el pico seleccionado con datum.selected
+    assert all('selected' in names for names in maps[0])
@@ -0,0 +1,104 @@
+# Intervalos de años (himalaya.buckets.TimeBuckets) y bins de duración (DurationBins) contados
+# con peak_index.DurationIndex frente a un recuento directo de las expediciones.
+import numpy as np
+import pandas as pd
+import pytest
+
+from himalaya.buckets import DurationBins, TimeBuckets, parse_edges
+from himalaya.peak_index import DurationIndex
+
+
+@pytest.fixture
+def expeditions():
+    return pd.DataFrame({
+        'PEAKID': ['EVER'] * 7,
+        'SEASON_FACTOR': ['Spring', 'Spring', 'Spring', 'Autumn', 'Autumn', 'Spring', 'Spring'],
+        'TOTDAYS': [0, 10, 29, 30, 364, 365, 500],
+        'ANY_SUCCESS': [False, True, False, True, True, False, True],
+        'YEAR_INT': [2020, 2020, 2021, 2021, 2022, 2023, 2024],
+    })
+
+
+def reference_counts(df, bins):
+    # Duraciones positivas por bin; con open_end el último bin no tiene límite superior
+    totdays = df['TOTDAYS'].to_numpy()
+    upper = np.append(bins.edges[1:-1], np.inf if bins.open_end else bins.edges[-1])
+    totals, successes = [], []
+    for start, stop in zip(bins.edges[:-1], upper):
+        inside = (totdays > 0) & (totdays >= start) & (totdays < stop)
+        totals.append(inside.sum())
+        successes.append((inside & df['ANY_SUCCESS'].to_numpy()).sum())
+    return totals, successes
+
+
+@pytest.mark.parametrize('bins', [DurationBins.default(), DurationBins.fixed(30), DurationBins.custom([7, 30])])
+def test_histogram_matches_reference(expeditions, bins):
+    index = DurationIndex.from_frame(expeditions)
+    totals, successes = index.histogram('EVER', bins.edges, clip=bins.open_end)
+    assert (totals.tolist(), successes.tolist()) == tuple(map(list, reference_counts(expeditions, bins)))
+
+
+def test_open_last_bin_keeps_long_expeditions(expeditions):
+    bins = DurationBins.fixed(30)
+    assert bins.labels()[-1] == '360+'
+    totals, _ = DurationIndex.from_frame(expeditions).histogram('EVER', bins.edges, clip=bins.open_end)
+    # 364, 365 y 500 días caen en el último bin; solo la duración 0 queda fuera
+    assert totals[-1] == 3
+    assert totals.sum() == 6
+
+
+def test_default_bins_keep_original_cut(expeditions):
+    bins = DurationBins.default()
+    assert bins.labels() == ['1-15', '16-30', '31-45', '46-60', '61-75', '76-90', '90+']
+    totals, _ = DurationIndex.from_frame(expeditions).histogram('EVER', bins.edges, clip=bins.open_end)
+    assert totals.sum() == 4
+
+
+def test_by_season_uses_open_end(expeditions):
+    bins = DurationBins.custom([30])
+    runs = DurationIndex.from_frame(expeditions).by_season('EVER', bins.edges, clip=bins.open_end)
+    assert {season: totals.tolist() for season, totals, _ in runs} == {'Autumn': [0, 2], 'Spring': [2, 2]}
+
+
+def reference_codes(buckets, years):
+    # Intervalo de cada año recorriendo los límites uno a uno
+    codes = []
+    for year in years:
+        inside = [i for i in range(len(buckets)) if buckets.edges[i] <= year < buckets.edges[i + 1]]
+        codes.append(inside[0] if inside else -1)
+    return codes
+
+
+@pytest.mark.parametrize('buckets', [TimeBuckets.fixed(10, 1905, 2024), TimeBuckets.fixed(5, 1905, 2024),
+                                     TimeBuckets.fixed(1, 2019, 2024),
+                                     TimeBuckets.custom([1950, 1980, 2000, 2030], 1905, 2024)])
+def test_codes_match_reference(buckets):
+    years = np.arange(1895, 2035)
+    assert buckets.codes(years).tolist() == reference_codes(buckets, years)
+
+
+def test_fixed_buckets_align_to_width():
+    decades = TimeBuckets.fixed(10, 1905, 2024)
+    assert decades.edges[0] == 1900 and decades.edges[-1] == 2030
+    assert decades.labels()[:2] == ['1900s', '1910s'] and decades.title == 'Decade'
+    assert TimeBuckets.fixed(5, 1995, 2004).labels() == ['1995-1999', '2000-2004']
+    years = TimeBuckets.fixed(1, 2003, 2004)
+    assert years.labels() == ['2003', '2004'] and years.title == 'Year'
+
+
+def test_custom_buckets_ignore_cuts_out_of_range():
+    buckets = TimeBuckets.custom([1900, 1950, 2000, 2030], 1920, 2024)
+    assert buckets.labels() == ['1920-1949', '1950-1999', '2000-2024']
+    assert buckets.title == 'Time Period'
+
+
+def test_label_replaces_codes():
+    buckets = TimeBuckets.fixed(10, 1990, 2009)
+    table = pd.DataFrame({'bucket': [1, 0], 'total': [3, 4]})
+    labelled = buckets.label(table, 'bucket', 'Decade')
+    assert labelled['Decade'].tolist() == ['2000s', '1990s']
+
+
+def test_parse_edges():
+    assert parse_edges('2000, 1960;1980 1960') == [1960, 1980, 2000]
+    assert parse_edges('7, 30 14', digits=None) == [7, 14, 30]
@@ -0,0 +1,17 @@
+# Paquete precalculado en Arrow: lo que sirve la aplicación se queda en la proyección en memoria
+# de sus archivos (benchmarks/bench_memory.py hace la misma comprobación con --bundle).
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+
+from bench_memory import copied_data  # noqa: E402
+from himalaya.build import build  # noqa: E402
+
+
+@pytest.mark.skipif(not os.path.exists('/proc/self/maps'), reason='needs /proc/self/maps')
+def test_bundle_is_served_without_copies(tmp_path):
+    version = build(os.path.join(os.path.dirname(__file__), '..', 'input_data'), str(tmp_path), workers=1)
+    assert copied_data(os.path.join(tmp_path, version)) == []
@@ -0,0 +1,55 @@
+# Agregación en el servidor (himalaya.charts): bins iguales a los de Vega y datos embebidos sin
+# las columnas que ningún canal, transformación o subgráfico utiliza.
+import altair as alt
+import numpy as np
+import pandas as pd
+
+from himalaya.charts import binned_counts, nice_bin_edges, trim_datasets
+
+
+def dataset_columns(chart):
+    spec = trim_datasets(chart.to_dict())
+    return [set(records[0]) for records in spec['datasets'].values()]
+
+
+def frame():
+    return pd.DataFrame({'x': [1, 2, 3], 'y': [0.1, 0.5, 0.9], 'selected': [True, False, False],
+                         'unused': ['a', 'b', 'c']})
+
+
+def test_unused_columns_are_dropped():
+    chart = alt.Chart(frame()).mark_point().encode(x='x:Q', y='y:Q')
+    assert dataset_columns(chart) == [{'x', 'y'}]
+
+
+def test_layered_condition_keeps_field():
+    base = alt.Chart(frame()).encode(x='x:Q')
+    chart = alt.layer(base.mark_line().encode(y='y:Q'),
+                      base.mark_point().encode(y='y:Q', stroke=alt.condition(alt.datum.selected, alt.value('black'),
+                                                                             alt.value(None))))
+    assert dataset_columns(chart) == [{'x', 'y', 'selected'}]
+
+
+def test_concatenated_condition_keeps_field():
+    points = alt.Chart(frame()).mark_point().encode(x='x:Q', y='y:Q')
+    outlined = alt.Chart(frame()).mark_point().encode(
+        x='y:Q', y='x:Q', stroke=alt.condition(alt.datum.selected, alt.value('black'), alt.value(None)))
+    assert dataset_columns(alt.vconcat(points, outlined)) == [{'x', 'y', 'selected'}]
+
+
+def test_transform_expression_keeps_field():
+    chart = alt.Chart(frame()).transform_filter("datum['selected']").transform_calculate(
+        scaled='datum.y * 100').mark_point().encode(x='x:Q', y='scaled:Q')
+    assert dataset_columns(chart) == [{'x', 'y', 'selected'}]
+
+
+def test_binned_counts_match_reference():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({'days': rng.integers(1, 90, 500), 'ok': rng.random(500) < 0.4})
+    counts = binned_counts(df, 'days', 'ok')
+    edges = nice_bin_edges(df['days'])
+    for (start, end, ok), count in counts.set_index(['bin_start', 'bin_end', 'ok'])['count'].items():
+        last = end == edges[-1]
+        in_bin = (df['days'] >= start) & ((df['days'] <= end) if last else (df['days'] < end))
+        assert count == (in_bin & (df['ok'] == ok)).sum()
+    assert counts['count'].sum() == len(df)
@@ -0,0 +1,69 @@
+# Cubo de expediciones (himalaya.cube): cortes y agregados del cubo iguales a agrupar
+# directamente las expediciones filtradas.
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from himalaya.buckets import TimeBuckets
+from himalaya.cube import BUCKET, build_cube, rollup, slice_cube, totals
+from himalaya.pipeline import load_data, process_data
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'input_data')
+
+
+@pytest.fixture(scope='module')
+def df_merged():
+    exped_df, peaks_df, coords_df = load_data(DATA_DIR)
+    return process_data(exped_df, peaks_df, coords_df)[0]
+
+
+@pytest.fixture(scope='module')
+def cube(df_merged):
+    return build_cube(df_merged)
+
+
+def direct(df, by):
+    # Expediciones, éxitos y duración media agrupando las filas
+    table = df.groupby(by, observed=True).agg(expeditions=('EXPID', 'count'), successes=('ANY_SUCCESS', 'sum'),
+                                              avg_duration=('TOTDAYS', 'mean')).reset_index()
+    return table.assign(success_rate=table['successes'] / table['expeditions'])
+
+
+def assert_same(table, expected, by):
+    columns = by + ['expeditions', 'successes', 'success_rate', 'avg_duration']
+    pd.testing.assert_frame_equal(table[columns].astype({column: object for column in by}).reset_index(drop=True),
+                                  expected[columns].astype({column: object for column in by}).reset_index(drop=True),
+                                  check_dtype=False)
+
+
+def test_cube_keeps_every_expedition(cube, df_merged):
+    assert cube['expeditions'].sum() == len(df_merged)
+    assert len(cube) <= len(df_merged)
+    summary = totals(cube)
+    assert summary['successes'] == df_merged['ANY_SUCCESS'].sum()
+    assert summary['avg_duration'] == pytest.approx(df_merged['TOTDAYS'].mean())
+
+
+@pytest.mark.parametrize('by', [['SEASON_FACTOR'], ['HOST_FACTOR'], ['PEAKID', 'YEAR_INT']])
+def test_rollup_matches_groupby(cube, df_merged, by):
+    assert_same(rollup(cube, by), direct(df_merged, by), by)
+
+
+def test_slice_matches_filtered_groupby(cube, df_merged):
+    peak = df_merged['PEAKID'].value_counts().index[0]
+    cells = slice_cube(cube, (2021, 2023), PEAKID=peak)
+    rows = df_merged[df_merged['YEAR_INT'].between(2021, 2023) & (df_merged['PEAKID'] == peak)]
+    assert len(rows)
+    assert_same(rollup(cells, ['SEASON_FACTOR']), direct(rows, ['SEASON_FACTOR']), ['SEASON_FACTOR'])
+
+
+def test_rollup_by_bucket_drops_years_out_of_range(cube, df_merged):
+    buckets = TimeBuckets.custom([2022], 2021, 2023)
+    table = rollup(cube, [BUCKET], buckets)
+    codes = buckets.codes(df_merged['YEAR_INT'])
+    expected = direct(df_merged.assign(**{BUCKET: codes})[codes >= 0], [BUCKET])
+    assert table[BUCKET].tolist() == [0, 1]
+    assert np.array_equal(table['expeditions'], expected['expeditions'])
+    assert np.array_equal(table['successes'], expected['successes'])
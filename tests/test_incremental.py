@@ -0,0 +1,174 @@
+# Ingesta incremental (himalaya.incremental) frente a una reconstrucción completa.
+#
+# Parte del dataset sin las últimas temporadas, aplica como lotes las temporadas nuevas y un lote
+# de expediciones modificadas, y comprueba que df_merged, top_peaks, las tablas de conteos, las
+# tablas de los paneles y los índices por pico son idénticos a procesar desde cero el CSV final.
+# También comprueba que snapshot.load_or_build amplía una instantánea cuando el CSV de
+# expediciones solo ha crecido por el final.
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from himalaya import snapshot
+from himalaya.aggregates import count_tables, country_tables, duration_tables, route_table, termination_table
+from himalaya.incremental import apply_batch, update_peak_indexes
+from himalaya.peak_index import PeakPartition, YearPrefixSums
+from himalaya.pipeline import COORDS_FILE, EXPED_FILE, PEAKS_FILE, load_data, process_data
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'input_data')
+
+
+def changed_rows(exped_df, n, seed):
+    # Copia modificada de `n` expediciones: duración, éxito, razón, ruta y, en una, el pico
+    rng = np.random.default_rng(seed)
+    rows = exped_df.iloc[np.sort(rng.choice(len(exped_df), n, replace=False))].copy()
+    rows['TOTDAYS'] = rows['TOTDAYS'] + 3
+    rows['SUCCESS1'] = ~rows['SUCCESS1'].fillna(False)
+    reasons = exped_df['TERMREASON_FACTOR'].dropna().unique()
+    rows['TERMREASON_FACTOR'] = rng.choice(reasons, n)
+    rows['ROUTE1'] = rows['ROUTE1'].cat.add_categories(['Check route'])
+    rows.iloc[::5, rows.columns.get_loc('ROUTE1')] = 'Check route'
+    rows.iloc[0, rows.columns.get_loc('PEAKID')] = exped_df['PEAKID'].iloc[-1]
+    return rows
+
+
+def panel_tables(counts, peaks_df):
+    heights = peaks_df.drop_duplicates('PEAKID').set_index('PEAKID')['HEIGHTM']
+    return {
+        'route_success_rates': route_table(counts, heights),
+        'country': country_tables(counts),
+        'duration': duration_tables(counts),
+        'term_evolution': termination_table(counts),
+    }
+
+
+def assert_same(full, incremental):
+    if isinstance(full, pd.DataFrame):
+        pd.testing.assert_frame_equal(full, incremental)
+    elif isinstance(full, dict):
+        assert full.keys() == incremental.keys()
+        for key in full:
+            assert_same(full[key], incremental[key])
+    elif isinstance(full, (tuple, list)):
+        assert len(full) == len(incremental)
+        for a, b in zip(full, incremental):
+            assert_same(a, b)
+    elif isinstance(full, np.ndarray):
+        np.testing.assert_array_equal(full, incremental)
+        assert full.dtype == incremental.dtype
+    else:
+        assert full == incremental, (full, incremental)
+
+
+def assert_same_indexes(full, incremental):
+    for full_sums, sums in zip(full[0], incremental[0]):
+        assert_same(full_sums.to_arrays(), sums.to_arrays())
+        assert_same(full_sums.slices, sums.slices)
+    assert_same(full[1].slices, incremental[1].slices)
+    assert_same(full[1].frame, incremental[1].frame)
+
+
+def peak_indexes(df_merged):
+    return ((YearPrefixSums.from_frame(df_merged), YearPrefixSums.from_frame(df_merged, column=None)),
+            PeakPartition(df_merged))
+
+
+@pytest.fixture(scope='module')
+def inputs():
+    return load_data(DATA_DIR)
+
+
+def season_batches(exped_df):
+    # Temporadas nuevas: 2023 (otoño) y 2024, en dos lotes
+    season_key = exped_df['YEAR'].astype(str) + '-' + exped_df['SEASON_FACTOR'].astype(str)
+    return [exped_df[season_key == '2023-Autumn'], exped_df[exped_df['YEAR'] == 2024]]
+
+
+def test_batches_match_full_rebuild(inputs):
+    exped_df, peaks_df, coords_df = inputs
+    new_batches = season_batches(exped_df)
+    base = exped_df.drop(index=pd.concat(new_batches).index)
+    changed = changed_rows(base, 25, seed=0)
+
+    # Estado inicial y lotes incrementales
+    df_merged, top_peaks = process_data(base, peaks_df, coords_df)
+    counts = count_tables(df_merged)
+    indexes = peak_indexes(df_merged)
+    for batch in new_batches + [changed]:
+        df_merged, top_peaks, counts, changes = apply_batch(df_merged, counts, batch, peaks_df, coords_df)
+        indexes = update_peak_indexes(df_merged, *indexes, changes)
+
+    # CSV final: filas modificadas en su sitio y temporadas nuevas al final
+    final = pd.concat([base.drop(index=changed.index), changed]).sort_index()
+    final = pd.concat([final] + new_batches, ignore_index=True)
+    full_merged, full_top_peaks = process_data(final, peaks_df, coords_df)
+    full_counts = count_tables(full_merged)
+
+    assert_same(full_merged, df_merged)
+    assert_same(full_top_peaks, top_peaks)
+    assert_same(full_counts, counts)
+    assert_same(panel_tables(full_counts, peaks_df), panel_tables(counts, peaks_df))
+    assert_same_indexes(peak_indexes(full_merged), indexes)
+
+
+def write_exped(data_dir, rows, mode='w'):
+    rows.to_csv(os.path.join(data_dir, EXPED_FILE), index=False, header=mode == 'w', mode=mode,
+                encoding='latin-1')
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    # Directorio de datos con picos y coordenadas originales; exped_tidy.csv lo escribe cada prueba
+    data_dir = tmp_path / 'data'
+    data_dir.mkdir()
+    for name in (PEAKS_FILE, COORDS_FILE):
+        shutil.copy(os.path.join(DATA_DIR, name), data_dir / name)
+    return str(data_dir)
+
+
+@pytest.fixture(scope='module')
+def raw_exped():
+    # Texto original de cada campo, para escribir CSV parciales sin cambiar ningún valor
+    return pd.read_csv(os.path.join(DATA_DIR, EXPED_FILE), dtype=str, keep_default_na=False, encoding='latin-1')
+
+
+def build(data_dir, cache_dir):
+    stages = []
+    result = snapshot.load_or_build(data_dir, cache_dir, stage=lambda name: stages.append(name) or
+                                    snapshot._no_stage(name))
+    return result, stages
+
+
+def test_snapshot_extends_appended_rows(data_dir, raw_exped, tmp_path):
+    cache_dir = str(tmp_path / 'snapshots')
+    recent = raw_exped['YEAR'].astype(int) >= 2023
+    write_exped(data_dir, raw_exped[~recent])
+    build(data_dir, cache_dir)
+
+    write_exped(data_dir, raw_exped[recent], mode='a')
+    (df_merged, top_peaks, _, _), stages = build(data_dir, cache_dir)
+    assert 'extend_snapshot' in stages and 'process_data' not in stages
+
+    full_merged, full_top_peaks = process_data(*load_data(data_dir))
+    assert_same(full_merged, df_merged)
+    assert_same(full_top_peaks, top_peaks)
+
+    # La instantánea ampliada queda guardada con la nueva clave
+    (cached_merged, _, _, _), stages = build(data_dir, cache_dir)
+    assert 'extend_snapshot' not in stages
+    assert_same(full_merged, cached_merged)
+
+
+def test_snapshot_rebuilds_repeated_expids(data_dir, raw_exped, tmp_path):
+    # Filas añadidas con EXPID ya existentes: la reconstrucción completa las conserva duplicadas
+    cache_dir = str(tmp_path / 'snapshots')
+    write_exped(data_dir, raw_exped)
+    build(data_dir, cache_dir)
+
+    write_exped(data_dir, raw_exped.tail(10), mode='a')
+    (df_merged, _, _, _), stages = build(data_dir, cache_dir)
+    assert 'process_data' in stages
+    assert_same(process_data(*load_data(data_dir))[0], df_merged)
@@ -0,0 +1,66 @@
+# Intervalos de confianza de las tasas de éxito (himalaya.intervals): Wilson frente a la fórmula
+# grupo a grupo y bootstrap reproducible e independiente del número de procesos.
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from himalaya import intervals
+from himalaya.intervals import add_intervals, bootstrap_interval, success_interval, wilson_interval
+
+Z95 = 1.959963984540054
+
+
+def reference_wilson(k, n, z=Z95):
+    p = k / n
+    center = (p + z ** 2 / (2 * n)) / (1 + z ** 2 / n)
+    half = z / (1 + z ** 2 / n) * math.sqrt(p * (1 - p) / n + z ** 2 / (4 * n ** 2))
+    return center - half, center + half
+
+
+def test_wilson_matches_reference():
+    successes, totals = [1, 5, 30, 7, 199], [3, 10, 40, 200, 200]
+    low, high = wilson_interval(successes, totals)
+    for k, n, lo, hi in zip(successes, totals, low, high):
+        assert (lo, hi) == pytest.approx(reference_wilson(k, n))
+    assert (low[1], high[1]) == pytest.approx((0.2366, 0.7634), abs=1e-4)
+
+
+def test_wilson_edges():
+    low, high = wilson_interval([0, 4, 0], [4, 4, 0])
+    assert low[0] == 0.0 and 0 < high[0] < 1
+    assert 0 < low[1] < 1 and high[1] == 1.0
+    assert np.isnan(low[2]) and np.isnan(high[2])
+
+
+def test_bootstrap_close_to_wilson_for_large_totals():
+    successes, totals = np.array([300, 1500, 4200]), np.array([1000, 5000, 6000])
+    low, high = bootstrap_interval(successes, totals, resamples=4000, workers=1)
+    wilson_low, wilson_high = wilson_interval(successes, totals)
+    assert low == pytest.approx(wilson_low, abs=0.01)
+    assert high == pytest.approx(wilson_high, abs=0.01)
+
+
+def test_bootstrap_does_not_depend_on_workers(monkeypatch):
+    # Un grupo por lote, para que el pool reparta varios lotes
+    monkeypatch.setattr(intervals, 'BATCH_CELLS', 200)
+    successes, totals = [3, 0, 5, 3, 12, 8], [10, 0, 5, 10, 40, 9]
+    serial = bootstrap_interval(successes, totals, resamples=200, workers=1)
+    assert np.array_equal(serial[0], bootstrap_interval(successes, totals, resamples=200, workers=1)[0],
+                          equal_nan=True)
+    parallel = bootstrap_interval(successes, totals, resamples=200, workers=2)
+    for a, b in zip(serial, parallel):
+        assert np.array_equal(a, b, equal_nan=True)
+    # Los grupos iguales comparten remuestreo y los grupos vacíos no tienen intervalo
+    assert serial[0][0] == serial[0][3] and serial[1][0] == serial[1][3]
+    assert np.isnan(serial[0][1]) and serial[0][2] == serial[1][2] == 1.0
+
+
+def test_add_intervals_scales_and_rejects_unknown_method():
+    table = pd.DataFrame({'ok': [5, 0], 'n': [10, 3]})
+    scaled = add_intervals(table, 'ok', 'n', scale=100, method='wilson')
+    low, high = wilson_interval(table['ok'], table['n'])
+    assert np.allclose(scaled['ci_low'], low * 100) and np.allclose(scaled['ci_high'], high * 100)
+    with pytest.raises(ValueError):
+        success_interval([1], [2], method='exact')
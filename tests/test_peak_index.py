@@ -0,0 +1,117 @@
+# Índices por pico (himalaya.peak_index): particiones, sumas acumuladas por año y duraciones
+# frente a filtrar y agrupar directamente las expediciones.
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from himalaya.peak_index import DurationIndex, PeakPartition, YearPrefixSums, peak_records
+from himalaya.pipeline import load_data, process_data
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'input_data')
+
+
+@pytest.fixture(scope='module')
+def df_merged():
+    exped_df, peaks_df, coords_df = load_data(DATA_DIR)
+    return process_data(exped_df, peaks_df, coords_df)[0]
+
+
+@pytest.fixture(scope='module')
+def peaks(df_merged):
+    # Los picos con más expediciones, uno con pocas y uno que no existe
+    counts = df_merged['PEAKID'].value_counts()
+    return [*counts.index[:3].astype(str), str(counts.index[-1]), 'NOPE']
+
+
+def test_partition_matches_boolean_filter(df_merged, peaks):
+    # Orden distinto del de df_merged: la partición reordena de forma estable
+    df = df_merged.sample(frac=1, random_state=0)
+    partition = PeakPartition(df)
+    for peak in peaks:
+        expected = df[df['PEAKID'] == peak].reset_index(drop=True)
+        pd.testing.assert_frame_equal(partition.get(peak).reset_index(drop=True), expected)
+        assert (peak in partition) == bool(len(expected))
+
+
+def test_peak_records_use_first_row(df_merged, peaks):
+    records = peak_records(df_merged)
+    first = df_merged[df_merged['PEAKID'] == peaks[0]].iloc[0]
+    assert records[peaks[0]]['PKNAME'] == first['PKNAME']
+    assert records[peaks[0]]['HEIGHTM'] == first['HEIGHTM']
+
+
+@pytest.mark.parametrize('year_range', [(1900, 2100), (2021, 2022), (2030, 2040)])
+def test_year_sums_match_groupby(df_merged, peaks, year_range):
+    by_peak = YearPrefixSums.from_frame(df_merged)
+    everything = YearPrefixSums.from_frame(df_merged, column=None)
+    in_range = df_merged['YEAR_INT'].between(*year_range)
+    for sums, key, rows in [(everything, YearPrefixSums.ALL, df_merged[in_range])] + [
+            (by_peak, peak, df_merged[in_range & (df_merged['PEAKID'] == peak)]) for peak in peaks]:
+        totals = sums.totals(key, year_range)
+        assert totals['expeditions'] == len(rows)
+        assert totals['successes'] == rows['ANY_SUCCESS'].sum()
+        if rows['TOTDAYS'].notna().any():
+            assert totals['avg_duration'] == pytest.approx(rows['TOTDAYS'].mean())
+        else:
+            assert np.isnan(totals['avg_duration'])
+
+        expected = rows.groupby('YEAR_INT').agg(expeditions=('EXPID', 'count'),
+                                                successes=('ANY_SUCCESS', 'sum')).reset_index()
+        yearly = sums.yearly(key, year_range)
+        assert yearly['YEAR_INT'].tolist() == expected['YEAR_INT'].tolist()
+        assert yearly['expeditions'].tolist() == expected['expeditions'].tolist()
+        assert yearly['successes'].tolist() == expected['successes'].tolist()
+
+
+@pytest.mark.parametrize('season, year_range', [(None, None), ('Spring', None), (None, (2021, 2022))])
+def test_duration_histogram_matches_reference(df_merged, peaks, season, year_range):
+    index = DurationIndex.from_frame(df_merged)
+    edges = [0, 10, 30, 60, 365]
+    for peak in peaks:
+        rows = df_merged[(df_merged['PEAKID'] == peak) & (df_merged['TOTDAYS'] > 0)]
+        if season is not None:
+            rows = rows[rows['SEASON_FACTOR'] == season]
+        if year_range is not None:
+            rows = rows[rows['YEAR_INT'].between(*year_range)]
+        bins = pd.cut(rows['TOTDAYS'], edges, right=False)
+        totals, successes = index.histogram(peak, edges, season, year_range)
+        assert totals.tolist() == bins.value_counts(sort=False).tolist()
+        assert successes.tolist() == rows['ANY_SUCCESS'].groupby(bins, observed=False).sum().tolist()
+        extent = index.extent(peak, season, year_range)
+        assert extent == ((rows['TOTDAYS'].min(), rows['TOTDAYS'].max()) if len(rows) else None)
+
+
+def sorted_frame(df):
+    return df.sort_values(['PEAKID', 'YEAR_INT', 'EXPID'], kind='stable').reset_index(drop=True)
+
+
+def assert_same_sums(expected, actual):
+    for name in YearPrefixSums.ARRAYS:
+        np.testing.assert_array_equal(getattr(expected, name), getattr(actual, name))
+    assert expected.slices == actual.slices
+
+
+@pytest.mark.parametrize('position', [0, 1, -1])
+def test_replace_matches_rebuild(df_merged, position):
+    # Filas cambiadas de un pico (el primero, el segundo o el último), una expedición nueva en
+    # otro año y un pico nuevo al final
+    all_peaks = sorted(df_merged['PEAKID'].astype(str).unique())
+    peak = all_peaks[position]
+    df = df_merged.astype({'PEAKID': object})
+    rows = df[df['PEAKID'] == peak].head(3).assign(ANY_SUCCESS=lambda rows: ~rows['ANY_SUCCESS'],
+                                                   TOTDAYS=lambda rows: rows['TOTDAYS'] + 1)
+    added = rows.head(1).assign(EXPID='NEW01', YEAR_INT=2024)
+    newcomer = rows.head(1).assign(EXPID='NEW02', PEAKID='ZZZZ', YEAR_INT=2022)
+    updated = sorted_frame(pd.concat([df.drop(index=rows.index), rows, added, newcomer]))
+    df = sorted_frame(df)
+    changed = [peak, 'ZZZZ']
+    first_year = int(min(rows['YEAR_INT'].min(), 2022))
+
+    partition = PeakPartition(df).replace_groups(updated, changed)
+    assert partition.slices == PeakPartition(updated).slices
+    pd.testing.assert_frame_equal(partition.frame, PeakPartition(updated).frame)
+    assert_same_sums(YearPrefixSums.from_frame(updated), YearPrefixSums.from_frame(df).replace_groups(updated, changed))
+    assert_same_sums(YearPrefixSums.from_frame(updated, column=None),
+                     YearPrefixSums.from_frame(df, column=None).replace_years(updated, first_year))
@@ -0,0 +1,57 @@
+# Tasas de éxito por ruta y ranking de rutas comunes por el camino de la aplicación
+# (aggregates.count_tables -> stages.route_success_data / route_comparison) frente a la
+# implementación original con iterrows (benchmarks/bench_routes.py la usa como referencia).
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+
+from bench_routes import legacy_route_success_data, scale_frame  # noqa: E402
+from himalaya.aggregates import count_tables  # noqa: E402
+from himalaya.pipeline import load_data, process_data  # noqa: E402
+from himalaya.stages import peak_heights, route_comparison, route_success_data  # noqa: E402
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'input_data')
+LEGACY_COLUMNS = ['PEAKID', 'PKNAME', 'ROUTE', 'total_attempts', 'successful_attempts', 'height', 'success_rate']
+
+
+@pytest.fixture(scope='module')
+def dataset():
+    exped_df, peaks_df, coords_df = load_data(DATA_DIR)
+    df_merged, _ = process_data(exped_df, peaks_df, coords_df)
+    return df_merged, peak_heights(peaks_df)
+
+
+def app_route_rates(df_merged, heights):
+    # Mismo camino que la aplicación: tablas de conteos y etapa route_success_data
+    rates = route_success_data(count_tables(df_merged), heights)
+    return rates.astype({'PEAKID': object, 'PKNAME': object, 'ROUTE': object})
+
+
+def legacy_rates(df_merged):
+    rates = legacy_route_success_data(df_merged)
+    return rates.astype({'PEAKID': object, 'PKNAME': object, 'ROUTE': object})
+
+
+@pytest.mark.parametrize('factor', [1, 3])
+def test_route_rates_match_legacy(dataset, factor):
+    df_merged, heights = dataset
+    df = scale_frame(df_merged, factor)
+    expected = legacy_rates(df).reset_index(drop=True)
+    actual = app_route_rates(df, heights)[LEGACY_COLUMNS].reset_index(drop=True)
+    pd.testing.assert_frame_equal(actual, expected, check_dtype=False)
+
+
+def test_common_routes_break_ties_like_value_counts(dataset):
+    # Con el dataset incluido hay empates en el corte de las 10 rutas más comunes
+    df_merged, heights = dataset
+    rates = legacy_rates(df_merged)
+    counts = rates['ROUTE'].value_counts()
+    assert counts.iloc[9] == counts.iloc[10]
+
+    expected = rates[rates['ROUTE'].isin(counts.head(10).index)].reset_index(drop=True)
+    actual = route_comparison(app_route_rates(df_merged, heights))[LEGACY_COLUMNS].reset_index(drop=True)
+    pd.testing.assert_frame_equal(actual, expected, check_dtype=False)
@@ -0,0 +1,40 @@
+# Tablas compartidas entre sesiones (himalaya.shared): ninguna operación sobre un FrozenFrame
+# modifica los datos, los ejes ni sus nombres.
+import numpy as np
+import pandas as pd
+import pytest
+
+from himalaya.shared import ReadOnlyDataError, freeze
+
+
+@pytest.fixture
+def frozen():
+    return freeze(pd.DataFrame({'a': [1, 2], 'b': [3.0, 4.0]}, index=pd.Index(['x', 'y'], name='key')))
+
+
+@pytest.mark.parametrize('write', [
+    lambda df: df.__setitem__('c', 0),
+    lambda df: df.loc.__setitem__(('x', 'a'), 0),
+    lambda df: df.iloc.__setitem__((0, 0), 0),
+    lambda df: df.drop(columns='a', inplace=True),
+    lambda df: setattr(df, 'index', ['p', 'q']),
+    lambda df: setattr(df, 'columns', ['c', 'd']),
+])
+def test_writes_raise(frozen, write):
+    with pytest.raises(ReadOnlyDataError):
+        write(frozen)
+
+
+def test_axis_names_are_not_shared(frozen):
+    frozen.index.name = 'changed'
+    frozen.columns.name = 'changed'
+    frozen.index.names = ['changed']
+    frozen.columns.rename('changed', inplace=True)
+    assert frozen.index.name == 'key'
+    assert frozen.columns.name is None
+
+
+def test_arrays_are_read_only(frozen):
+    with pytest.raises(ValueError):
+        frozen['a'].to_numpy()[0] = 0
+    assert np.array_equal(frozen['a'].to_numpy(), [1, 2])
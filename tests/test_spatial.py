@@ -0,0 +1,51 @@
+# Rejilla espacial de picos (himalaya.spatial.PeakGrid): consultas por radio y por rectángulo
+# frente a una comparación directa con todos los picos.
+import numpy as np
+import pytest
+
+from himalaya.spatial import EARTH_RADIUS_KM, PeakGrid, haversine_km
+
+
+@pytest.fixture(scope='module')
+def points():
+    # Picos del Himalaya, alrededor del antimeridiano y cerca del polo; el último sin coordenadas
+    rng = np.random.default_rng(0)
+    lats = np.concatenate([rng.uniform(26, 36, 300), rng.uniform(-10, 10, 50), rng.uniform(85, 90, 20), [np.nan]])
+    lons = np.concatenate([rng.uniform(75, 95, 300), rng.uniform(175, 180, 25), rng.uniform(-180, -175, 25),
+                           rng.uniform(-180, 180, 20), [86.9]])
+    peaks = np.array([f'P{i:03d}' for i in range(len(lats))], dtype=object)
+    return peaks, lats, lons
+
+
+def test_haversine_one_degree_of_latitude():
+    expected = 2 * np.pi * EARTH_RADIUS_KM / 360
+    assert haversine_km(27.0, 86.0, [28.0], [86.0])[0] == pytest.approx(expected)
+
+
+@pytest.mark.parametrize('lat, lon, km', [(28.0, 86.9, 50), (30.0, 85.0, 400), (0.0, 179.5, 300),
+                                          (0.0, -179.9, 120), (88.0, 0.0, 500)])
+def test_radius_matches_brute_force(points, lat, lon, km):
+    peaks, lats, lons = points
+    grid = PeakGrid(peaks, lats, lons)
+    found, distances = grid.radius(lat, lon, km)
+    valid = ~np.isnan(lats)
+    all_distances = haversine_km(lat, lon, lats[valid], lons[valid])
+    assert set(found) == set(peaks[valid][all_distances <= km])
+    assert np.all(np.diff(distances) >= 0)
+    assert np.all(distances <= km)
+
+
+@pytest.mark.parametrize('south, west, north, east', [(27, 80, 30, 90), (-5, 177, 5, -178), (26, 75, 36, 95)])
+def test_bbox_matches_brute_force(points, south, west, north, east):
+    peaks, lats, lons = points
+    grid = PeakGrid(peaks, lats, lons, cell_deg=1.0)
+    inside_lon = (lons >= west) & (lons <= east) if west <= east else (lons >= west) | (lons <= east)
+    assert set(grid.bbox(south, west, north, east)) == set(peaks[(lats >= south) & (lats <= north) & inside_lon])
+
+
+def test_peaks_without_coordinates_are_skipped(points):
+    peaks, lats, lons = points
+    grid = PeakGrid(peaks, lats, lons)
+    assert len(grid) == len(peaks) - 1
+    assert grid.location(peaks[-1]) is None
+    assert grid.location(peaks[0]) == (lats[0], lons[0])
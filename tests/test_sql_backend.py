@@ -0,0 +1,55 @@
+# Backend SQL (himalaya.sql_backend): DuckDB sobre el Parquet de la instantánea da las mismas
+# tablas de conteos y de paneles que aggregates.count_tables con pandas.
+import os
+
+import pandas as pd
+import pytest
+
+pytest.importorskip('duckdb')
+pytest.importorskip('pyarrow')
+
+from himalaya import snapshot  # noqa: E402
+from himalaya.aggregates import (count_tables, country_tables, duration_tables, route_table,  # noqa: E402
+                                 termination_table)
+from himalaya.sql_backend import sql_count_tables  # noqa: E402
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'input_data')
+
+
+@pytest.fixture(scope='module')
+def snapshot_tables(tmp_path_factory):
+    cache_dir = str(tmp_path_factory.mktemp('snapshots'))
+    df_merged, _, peaks_df, _ = snapshot.load_or_build(DATA_DIR, cache_dir)
+    path = snapshot.table_path(snapshot.input_fingerprint(DATA_DIR), 'df_merged', cache_dir)
+    heights = peaks_df.drop_duplicates('PEAKID').set_index('PEAKID')['HEIGHTM']
+    return df_merged, path, heights
+
+
+def panel_tables(counts, heights):
+    return [route_table(counts, heights), *country_tables(counts), *duration_tables(counts),
+            termination_table(counts)]
+
+
+def assert_identical(pandas_counts, sql_counts, heights):
+    assert set(pandas_counts) == set(sql_counts)
+    for name in pandas_counts:
+        pd.testing.assert_frame_equal(pandas_counts[name], sql_counts[name])
+    for a, b in zip(panel_tables(pandas_counts, heights), panel_tables(sql_counts, heights)):
+        pd.testing.assert_frame_equal(a, b)
+
+
+def test_sql_matches_pandas(snapshot_tables):
+    df_merged, path, heights = snapshot_tables
+    assert_identical(count_tables(df_merged), sql_count_tables(path), heights)
+
+
+def test_sql_matches_pandas_in_year_window(snapshot_tables, tmp_path):
+    # Un subconjunto de años dentro de los datos (2020-2024), escrito como la instantánea
+    df_merged, _, heights = snapshot_tables
+    window = df_merged[df_merged['YEAR_INT'].between(2021, 2023)]
+    assert 0 < len(window) < len(df_merged)
+    path = str(tmp_path / 'df_merged.parquet')
+    window.to_parquet(path, index=False)
+    counts = count_tables(window)
+    assert all(len(table) for table in counts.values())
+    assert_identical(counts, sql_count_tables(path), heights)